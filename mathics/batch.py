@@ -0,0 +1,345 @@
+# -*- coding: utf8 -*-
+
+u"""
+    Mathics: a general-purpose computer algebra system
+    Copyright (C) 2011-2013 The Mathics Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Evaluation of many independent inputs in a pool of processes.
+
+    >>> from mathics.batch import BatchPool
+    >>> with BatchPool(timeout=10) as pool:
+    ...     for record in pool.imap(['1 + 2', 'x = 5; x^2']):
+    ...         print record['results'][-1]['result']
+    3
+    25
+
+Every input is evaluated with fresh user definitions, so inputs cannot
+see each other's definitions, and an input that fails, times out or kills
+its process only affects its own record.
+"""
+
+import sys
+import json
+import time
+import Queue
+import argparse
+import threading
+import traceback
+import multiprocessing
+
+from mathics.core.definitions import Definitions
+from mathics.core.expression import Integer
+from mathics.core.evaluation import Evaluation
+from mathics.main import wait_for_line
+
+
+def evaluate(definitions, input, timeout, format):
+    """
+    Evaluates input with empty user definitions and returns the record
+    sent back for it.
+    """
+
+    definitions.reset_user_definitions()
+    definitions.set_ownvalue('$Line', Integer(0))
+    record = {'input': input, 'results': [], 'timeout': False, 'error': None}
+    try:
+        evaluation = Evaluation(definitions=definitions, format=format)
+        evaluation.evaluate_input(input, timeout)
+        record['results'] = [result.get_data()
+                             for result in evaluation.results]
+        record['timeout'] = evaluation.timeout
+    except Exception:
+        info = traceback.format_exception(*sys.exc_info())
+        record['error'] = ''.join(info)
+    return record
+
+
+def serve(connection, definitions, format):
+    "Main loop of a batch process."
+
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        index, input, timeout = request
+        record = evaluate(definitions, input, timeout, format)
+        record['index'] = index
+        connection.send(record)
+
+
+class BatchWorker(object):
+    def __init__(self, definitions, format):
+        self.definitions = definitions
+        self.format = format
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=serve, args=(child_connection, self.definitions,
+                                self.format))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except IOError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
+
+    def restart(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+        self.start()
+
+    def interrupt(self):
+        """
+        Stops the evaluation in progress, if any, by terminating the
+        process. The thread waiting for its record restarts the process.
+        """
+
+        self.process.terminate()
+
+    def ensure_alive(self):
+        if not self.process.is_alive():
+            self.restart()
+
+    def evaluate(self, index, input, timeout, deadline):
+        """
+        Returns the record of input. Evaluations that have not finished
+        after deadline seconds are stopped by restarting the process.
+        """
+
+        try:
+            self.connection.send((index, input, timeout))
+            if (deadline is not None and
+                    not self.connection.poll(deadline)):
+                self.restart()
+                error = 'evaluation process did not respond in time'
+                return {'index': index, 'input': input, 'results': [],
+                        'timeout': True, 'error': error}
+            return self.connection.recv()
+        except (EOFError, IOError):
+            # the process died, e.g. because it ran out of memory
+            self.restart()
+            return {'index': index, 'input': input, 'results': [],
+                    'timeout': False,
+                    'error': 'evaluation process terminated'}
+
+
+class BatchPool(object):
+    """
+    Evaluates independent inputs in processes forked after the builtin
+    definitions have been loaded, so that each process starts with warm
+    builtins.
+
+    Each input is aborted after timeout seconds, like a query in the
+    console; a process that does not answer within timeout plus grace
+    seconds is restarted.
+    """
+
+    def __init__(self, processes=None, timeout=None, format='text', grace=5,
+                 definitions=None):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if definitions is None:
+            definitions = Definitions(add_builtin=True)
+        self.definitions = definitions
+        self.count = processes
+        self.timeout = timeout
+        self.format = format
+        self.grace = grace
+        self.workers = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def start(self):
+        if self.workers:
+            return
+        self.workers = [BatchWorker(self.definitions, self.format)
+                        for index in range(self.count)]
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def imap(self, inputs, ordered=True):
+        """
+        Evaluates every input of the iterable inputs and yields a record
+        for each one: a dictionary with the input, its index in inputs,
+        the data of its results (see Result.get_data), whether it timed
+        out, and the traceback of an error that stopped its evaluation
+        (or None).
+
+        Records are yielded in the order of inputs or, if ordered is
+        False, as soon as they are completed. inputs is consumed lazily;
+        an exception raised by it is raised here once the records of the
+        inputs before it have been yielded. Evaluations still in progress
+        when the caller stops iterating early are aborted.
+        """
+
+        self.start()
+        if self.timeout is None:
+            deadline = None
+        else:
+            deadline = self.timeout + self.grace
+        items = enumerate(inputs)
+        lock = threading.Lock()
+        records = Queue.Queue()
+        stopped = threading.Event()
+        input_error = []
+
+        def feed(worker):
+            try:
+                while not stopped.is_set():
+                    with lock:
+                        if stopped.is_set():
+                            break
+                        try:
+                            index, input = next(items)
+                        except StopIteration:
+                            break
+                        except Exception:
+                            input_error.append(sys.exc_info())
+                            stopped.set()
+                            break
+                    records.put(worker.evaluate(
+                        index, input, self.timeout, deadline))
+            finally:
+                records.put(None)
+
+        threads = [threading.Thread(target=feed, args=(worker,))
+                   for worker in self.workers]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        pending = {}
+        next_index = 0
+        running = len(threads)
+        try:
+            while running:
+                record = records.get()
+                if record is None:
+                    running -= 1
+                elif not ordered:
+                    yield record
+                else:
+                    pending[record['index']] = record
+                    while next_index in pending:
+                        yield pending.pop(next_index)
+                        next_index += 1
+        finally:
+            stopped.set()
+            if running:
+                # the caller stopped early: don't wait for the evaluations
+                for worker in self.workers:
+                    worker.interrupt()
+            for thread in threads:
+                thread.join()
+            if running:
+                for worker in self.workers:
+                    worker.ensure_alive()
+        if input_error:
+            error_type, error, error_traceback = input_error[0]
+            raise error_type, error, error_traceback
+
+    def map(self, inputs):
+        "Returns the records of all inputs, in order."
+
+        return list(self.imap(inputs))
+
+
+def read_inputs(input_file):
+    """
+    Yields the inputs in input_file: lines are joined while brackets are
+    unbalanced or they end with an operator, as in the console.
+    """
+
+    total_input = ''
+    for line in input_file:
+        line = line.decode('utf-8')
+        if not total_input and not line.strip():
+            continue
+        total_input += line
+        if wait_for_line(total_input):
+            continue
+        yield total_input.rstrip('\n')
+        total_input = ''
+    if total_input.strip():
+        yield total_input.rstrip('\n')
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        prog='mathicsbatch',
+        usage='%(prog)s [options] [FILE]',
+        description="""Evaluates the inputs in FILE (or the standard input)
+            independently of each other, in parallel, and writes one JSON
+            record per input to the standard output.""")
+
+    argparser.add_argument(
+        'FILE', nargs='?', type=argparse.FileType('r'), default=sys.stdin,
+        help='read inputs from FILE')
+    argparser.add_argument(
+        '--processes', '-j', type=int, default=None, metavar='N',
+        help='number of evaluation processes (default: number of CPUs)')
+    argparser.add_argument(
+        '--timeout', '-t', type=float, default=None, metavar='SECONDS',
+        help='abort each input after SECONDS')
+    argparser.add_argument(
+        '--format', '-f', default='text', choices=['text', 'xml', 'tex'],
+        help='format of the results')
+    argparser.add_argument(
+        '--unordered', '-u', action='store_true',
+        help='write records as they are completed')
+
+    args = argparser.parse_args()
+
+    start = time.time()
+    count = 0
+    with BatchPool(args.processes, args.timeout, args.format) as pool:
+        for record in pool.imap(read_inputs(args.FILE),
+                                ordered=not args.unordered):
+            sys.stdout.write(json.dumps(record) + '\n')
+            sys.stdout.flush()
+            count += 1
+    sys.stderr.write('%d inputs evaluated in %.2f seconds\n' % (
+        count, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
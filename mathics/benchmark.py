@@ -50,7 +50,36 @@ BENCHMARKS = {
         'Expand[(a1+a2+a3+a4+a5+a6+a7)^3]'],
     'Matrix': [
         'RandomInteger[{0,1}, {10,10}] . RandomInteger[{0,1}, {10,10}]',
-        'RandomInteger[{0,10}, {10,10}] + RandomInteger[{0,10}, {10,10}]'],
+        'RandomInteger[{0,10}, {10,10}] + RandomInteger[{0,10}, {10,10}]',
+        'Det[RandomReal[1, {10, 10}]]',
+        'Det[RandomReal[1, {50, 50}]]',
+        'Det[RandomReal[1, {200, 200}]]',
+        'Det[RandomInteger[{-9, 9}, {50, 50}]]',
+        'Length[Inverse[RandomReal[1, {10, 10}]]]',
+        'Length[Inverse[RandomReal[1, {50, 50}]]]',
+        'Length[Inverse[RandomReal[1, {200, 200}]]]',
+        'Length[Inverse[RandomInteger[{-9, 9}, {50, 50}]]]',
+        'Length[LinearSolve[RandomReal[1, {10, 10}], RandomReal[1, 10]]]',
+        'Length[LinearSolve[RandomReal[1, {50, 50}], RandomReal[1, 50]]]',
+        'Length[LinearSolve[RandomReal[1, {200, 200}], RandomReal[1, 200]]]',
+        'Length[Eigenvalues[RandomReal[1, {10, 10}]]]',
+        'Length[Eigenvalues[RandomReal[1, {50, 50}]]]',
+        'Length[RandomReal[1, {10, 10}] . RandomReal[1, {10, 10}]]',
+        'Length[RandomReal[1, {100, 100}] . RandomReal[1, {100, 100}]]',
+        'Length[RandomInteger[{-9, 9}, {100, 100}] . '
+        'RandomInteger[{-9, 9}, {100, 100}]]',
+        'Length[RandomReal[1, {200, 200}] . RandomReal[1, 200]]'],
+    'FindRoot': [
+        'FindRoot[Cos[x] == x, {x, 1}]',
+        'FindRoot[Cos[x] == x, {x, 1}, WorkingPrecision -> 50]',
+        'FindRoot[Exp[x] == 2, {x, 0, 1}, Method -> "Brent"]',
+        'Table[FindRoot[Cos[x] == a x, {x, 1}], {a, 1, 20}]'],
+    'Iteration': [
+        'Table[i^2, {i, 10^4}]', 'Table[i, {i, 0, 100, 1/100}]',
+        'Do[i, {i, 10^4}]', 'Table[i j, {i, 100}, {j, 100}]'],
+    'Part': [
+        'a = Table[0, {1000}]; Do[a[[i]] = i, {i, 1000}]',
+        'a = Table[0, {30}, {30}]; Do[a[[i, j]] = i j, {i, 30}, {j, 30}]'],
 }
 
 PARSING_BENCHMARKS = [
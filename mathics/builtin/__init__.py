@@ -20,22 +20,24 @@ u"""
 
 from mathics.builtin import (
     algebra, arithmetic, assignment, attributes, calculus, combinatorial,
-    comparison, control, datentime, diffeqns, evaluation, exptrig, functional,
-    graphics, graphics3d, inout, integer, linalg, lists, logic, numbertheory,
-    numeric, options, patterns, plot, physchemdata, randomnumbers, recurrence,
-    specialfunctions, scoping, strings, structure, system, tensors)
+    comparison, compilation, control, datentime, diffeqns, evaluation,
+    exptrig, functional, graphics, graphics3d, inout, integer, linalg, lists,
+    logic, numbertheory, numeric, options, patterns, plot, physchemdata,
+    randomnumbers, recurrence, specialfunctions, scoping, strings, structure,
+    system, tensors)
 
 from mathics.builtin.base import (
-    Builtin, SympyObject, BoxConstruct, Operator, PatternObject)
+    Builtin, SympyObject, BoxConstruct, Operator, PatternObject, rule_cache)
 
 from mathics.settings import ENABLE_FILES_MODULE
 
 modules = [
     algebra, arithmetic, assignment, attributes, calculus, combinatorial,
-    comparison, control, datentime, diffeqns, evaluation, exptrig, functional,
-    graphics, graphics3d, inout, integer, linalg, lists, logic, numbertheory,
-    numeric, options, patterns, plot, physchemdata, randomnumbers, recurrence,
-    specialfunctions, scoping, strings, structure, system, tensors]
+    comparison, compilation, control, datentime, diffeqns, evaluation,
+    exptrig, functional, graphics, graphics3d, inout, integer, linalg, lists,
+    logic, numbertheory, numeric, options, patterns, plot, physchemdata,
+    randomnumbers, recurrence, specialfunctions, scoping, strings, structure,
+    system, tensors]
 
 if ENABLE_FILES_MODULE:
     from mathics.builtin import files, importexport
@@ -118,12 +120,16 @@ def get_module_doc(module):
 
 
 def contribute(definitions):
+    rule_cache.load()
+
     # let MakeBoxes contribute first
     builtins['System`MakeBoxes'].contribute(definitions)
     for name, item in builtins.items():
         if name != 'System`MakeBoxes':
             item.contribute(definitions)
 
+    rule_cache.save()
+
     from mathics.core.expression import ensure_context
     from mathics.core.parser import all_operator_names
     from mathics.core.definitions import Definition
@@ -1,11 +1,14 @@
 # -*- coding: utf8 -*-
 
 from mathics.builtin.base import Builtin
-from mathics.core.expression import Expression, Integer
+from mathics.core.expression import Expression, Integer, Rational, Number
 from mathics.core.convert import from_sympy
 
 import sympy
 import mpmath
+from fractions import Fraction
+from itertools import imap
+from operator import add
 
 
 def sympy_factor(expr_sympy):
@@ -39,6 +42,170 @@ def cancel(expr):
             return expr
 
 
+class NotPolynomial(Exception):
+    pass
+
+
+# Polynomials are dictionaries mapping monomials to their nonzero
+# coefficients, ints or Fractions. A monomial is the tuple of the exponents
+# of the variables, without trailing zeros.
+
+def monomial_product(m1, m2):
+    if len(m1) < len(m2):
+        m1, m2 = m2, m1
+    n = len(m2)
+    return tuple(imap(add, m1[:n], m2)) + m1[n:]
+
+
+def polynomial_product(p1, p2, evaluation):
+    result = {}
+    for m1, c1 in p1.iteritems():
+        evaluation.check_stopped()
+        evaluation.check_memory()
+        for m2, c2 in p2.iteritems():
+            monomial = monomial_product(m1, m2)
+            result[monomial] = result.get(monomial, 0) + c1 * c2
+    return dict(item for item in result.iteritems() if item[1])
+
+
+def polynomial_power(p, n, evaluation):
+    "Computes p ^ n for n > 0 by repeated squaring."
+
+    result = None
+    while True:
+        if n & 1:
+            result = (p if result is None
+                      else polynomial_product(result, p, evaluation))
+        n >>= 1
+        if not n:
+            return result
+        p = polynomial_product(p, p, evaluation)
+
+
+def to_polynomial(expr, variables, expand_variable, evaluation):
+    """
+    Converts expr to a polynomial in the subexpressions that are not
+    sums, products, positive integer powers or numbers. These variables
+    are expanded with expand_variable and numbered in the dictionary
+    variables.
+
+    Raises NotPolynomial if expr contains inexact or complex numbers, or
+    a product of several negative powers.
+    """
+
+    if isinstance(expr, Integer):
+        return {(): expr.value} if expr.value else {}
+    elif isinstance(expr, Rational):
+        value = expr.value
+        return {(): Fraction(int(value.p), int(value.q))}
+    elif isinstance(expr, Number):
+        raise NotPolynomial()
+    elif expr.has_form('Plus', None):
+        result = {}
+        for leaf in expr.leaves:
+            p = to_polynomial(leaf, variables, expand_variable, evaluation)
+            for monomial, coeff in p.iteritems():
+                result[monomial] = result.get(monomial, 0) + coeff
+        return dict(item for item in result.iteritems() if item[1])
+    elif expr.has_form('Times', None):
+        negative_powers = 0
+        for leaf in expr.leaves:
+            if leaf.has_form('Power', 2):
+                n = leaf.leaves[1].get_int_value()
+                if n is not None and n < 0:
+                    negative_powers += 1
+        if negative_powers > 1:
+            # grouped into one power by Expand
+            raise NotPolynomial()
+        result = {(): 1}
+        for leaf in expr.leaves:
+            result = polynomial_product(result, to_polynomial(
+                leaf, variables, expand_variable, evaluation), evaluation)
+        return result
+    elif expr.has_form('Power', 2):
+        n = expr.leaves[1].get_int_value()
+        if n is not None and n > 0:
+            return polynomial_power(to_polynomial(
+                expr.leaves[0], variables, expand_variable, evaluation), n,
+                evaluation)
+    variable = expand_variable(expr)
+    index = variables.setdefault(variable, len(variables))
+    return {(0,) * index + (1,): 1}
+
+
+def from_polynomial(p, variables, evaluation, evaluated=False):
+    """
+    Returns the sum of the terms of p. If evaluated is True, the sum and
+    its terms are built in the canonical order and marked as evaluated,
+    which is only correct if the variables are symbols without any
+    definitions.
+    """
+
+    # a term and its factors for each monomial
+    evaluation.check_memory(len(p) * (len(variables) + 1))
+
+    def build(head, *leaves):
+        expr = Expression(head, *leaves)
+        if evaluated:
+            if head != 'Power':
+                expr.sort()
+            expr.is_evaluated = True
+        return expr
+
+    names = [None] * len(variables)
+    for variable, index in variables.iteritems():
+        names[index] = variable
+    terms = []
+    for monomial, coeff in p.iteritems():
+        evaluation.check_stopped()
+        if isinstance(coeff, Fraction) and coeff.denominator != 1:
+            factors = [Rational(coeff.numerator, coeff.denominator)]
+        elif coeff != 1:
+            factors = [Integer(coeff)]
+        else:
+            factors = []
+        for variable, exponent in zip(names, monomial):
+            if exponent == 1:
+                factors.append(variable)
+            elif exponent:
+                factors.append(build('Power', variable, Integer(exponent)))
+        if len(factors) == 1:
+            terms.append(factors[0])
+        elif factors:
+            terms.append(build('Times', *factors))
+        else:
+            terms.append(Integer(1))
+    if not terms:
+        return Integer(0)
+    elif len(terms) == 1:
+        return terms[0]
+    return build('Plus', *terms)
+
+
+def expand_polynomial(expr, expand_variable, evaluation):
+    """
+    Expands expr by multiplying out its polynomial structure with integer
+    and rational coefficients. Returns None if expr has no such structure.
+    """
+
+    variables = {}
+    try:
+        p = to_polynomial(expr, variables, expand_variable, evaluation)
+    except NotPolynomial:
+        return None
+    definitions = evaluation.definitions
+    # sums of monomials in plain symbols need not be evaluated again
+    evaluated = not any(
+        name in definitions.user
+        for name in ('System`Plus', 'System`Times', 'System`Power'))
+    for variable in variables:
+        name = variable.get_name()
+        if (not name or name in definitions.user or
+                name in definitions.builtin):
+            evaluated = False
+    return from_polynomial(p, variables, evaluation, evaluated)
+
+
 class Cancel(Builtin):
     """
     <dl>
@@ -247,6 +414,15 @@ class Expand(Builtin):
     #> a(b(c+d)+e) // Expand
      = a b c + a b d + a e
 
+    #> Expand[(x/2 + y/3)^3]
+     = x ^ 3 / 8 + x ^ 2 y / 4 + x y ^ 2 / 6 + y ^ 3 / 27
+    #> Expand[(x + y)^2 - 2 x y - x^2 - y^2]
+     = 0
+    #> Expand[(a + b) (b - a) + a (a - b)]
+     = -a b + b ^ 2
+    #> Expand[(a1 + a2 + a3)^25] // Length
+     = 351
+
     #> (y^2)^(1/2)/(2x+2y)//Expand
      = Sqrt[y ^ 2] / (2 x + 2 y)
 
@@ -259,6 +435,14 @@ class Expand(Builtin):
         'Expand[expr_]'
 
         def expand(expr):
+            if expr.get_head_name() in (
+                    'System`Plus', 'System`Times', 'System`Power'):
+                result = expand_polynomial(expr, expand_leaves, evaluation)
+                if result is not None:
+                    return result
+            return expand_leaves(expr)
+
+        def expand_leaves(expr):
             head_name = expr.get_head_name()
             if head_name in ('System`List', 'System`Rule'):
                 return Expression(
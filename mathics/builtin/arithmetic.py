@@ -10,6 +10,7 @@ from __future__ import with_statement
 
 import sympy
 import mpmath
+from mpmath import libmp
 
 from mathics.builtin.base import (
     Builtin, Predefined, BinaryOperator, PrefixOperator, PostfixOperator, Test,
@@ -21,8 +22,43 @@ from mathics.core.numbers import (
     add, min_prec, dps, sympy2mpmath, mpmath2sympy, SpecialValueError)
 
 from mathics.builtin.lists import _IterationFunction
+from mathics.builtin.numeric import machine_precision
 from mathics.core.convert import from_sympy
 
+# the digits and the binary precision of the sympy Floats of machine reals
+machine_dps = dps(machine_precision)
+machine_mpf_prec = libmp.dps_to_prec(machine_dps)
+
+
+def is_machine_real(item):
+    "Whether item is a Real stored with the digits of machine precision."
+
+    return isinstance(item, Real) and dps(item.prec) == machine_dps
+
+
+def machine_real_values(items):
+    """
+    Returns the mpf tuples of items if all of them are machine reals, and
+    None otherwise.
+    """
+
+    values = []
+    for item in items:
+        if not is_machine_real(item):
+            return None
+        values.append(item.get_mpf())
+    return values
+
+
+def from_machine_value(value, prec=machine_precision):
+    """
+    Returns the Real of the finite mpf tuple value rounded to machine
+    digits, like Real(mpmath2sympy(mpmath.mpf(value)), prec) but without
+    creating the intermediate sympy objects.
+    """
+
+    return Real(libmp.to_str(value, machine_dps), prec)
+
 
 class _MPMathFunction(SympyFunction):
 
@@ -57,12 +93,19 @@ class _MPMathFunction(SympyFunction):
         else:
             prec = min_prec(*args)
             with mpmath.workprec(prec):
-                mpmath_args = [sympy2mpmath(x.to_sympy()) for x in args]
+                mpmath_args = [
+                    mpmath.mpf(x.value) if is_machine_real(x)
+                    else sympy2mpmath(x.to_sympy()) for x in args]
                 if None in mpmath_args:
                     return
                 try:
                     result = self.eval(*mpmath_args)
-                    result = from_sympy(mpmath2sympy(result, prec))
+                    if (dps(prec) == machine_dps and
+                            isinstance(result, mpmath.mpf) and
+                            mpmath.isfinite(result)):
+                        result = from_machine_value(result._mpf_)
+                    else:
+                        result = from_sympy(mpmath2sympy(result, prec))
                 except ValueError, exc:
                     text = str(exc)
                     if text == 'gamma function pole':
@@ -128,6 +171,11 @@ class Plus(BinaryOperator, SympyFunction):
 
     #> Head[3 + 2 I]
      = Complex
+
+    #> 0.1 + 0.2 + 0.3
+     = 0.6
+    #> Head[0.5 - 0.5]
+     = Integer
     """
 
     operator = '+'
@@ -191,6 +239,18 @@ class Plus(BinaryOperator, SympyFunction):
         'Plus[items___]'
 
         items = items.numerify(evaluation).get_sequence()
+
+        values = machine_real_values(items)
+        if values:
+            # sum machine reals with the rounding of the sympy Floats below
+            total = libmp.fzero
+            for value in values:
+                total = libmp.mpf_add(total, value, machine_mpf_prec,
+                                      libmp.round_nearest)
+            if total == libmp.fzero:
+                return Integer(0)
+            return from_machine_value(total, min_prec(*items))
+
         leaves = []
         last_item = last_count = None
 
@@ -441,6 +501,9 @@ class Times(BinaryOperator, SympyFunction):
      = 3*a
     #> 3 * a //OutputForm
      = 3 a
+
+    #> 0.1 * 0.2 * 0.3
+     = 0.006
     """
 
     operator = '*'
@@ -532,6 +595,21 @@ class Times(BinaryOperator, SympyFunction):
         # TODO: Clean this up and optimise it
 
         items = items.numerify(evaluation).get_sequence()
+
+        values = machine_real_values(items)
+        if values:
+            # multiply machine reals with the rounding of the sympy Floats
+            # below, which also give exact results for products 0 and 1
+            product = libmp.fone
+            for value in values:
+                product = libmp.mpf_mul(product, value, machine_mpf_prec,
+                                        libmp.round_nearest)
+            if product == libmp.fzero:
+                return Integer(0)
+            elif product == libmp.fone:
+                return Integer(1)
+            return from_machine_value(product, min_prec(*items))
+
         number = (sympy.Integer(1), sympy.Integer(0))
         leaves = []
 
@@ -3,10 +3,10 @@ import re
 
 from mathics.builtin.base import (
     Builtin, BinaryOperator, PostfixOperator, PrefixOperator)
-from mathics.core.expression import (Expression, Symbol, valid_context_name,
-                                     system_symbols)
+from mathics.core.expression import (Expression, Symbol, Integer,
+                                     valid_context_name, system_symbols)
 from mathics.core.rules import Rule
-from mathics.builtin.lists import walk_parts
+from mathics.builtin.lists import walk_parts, set_part_in_place
 from mathics.builtin.evaluation import set_recursionlimit
 
 from mathics import settings
@@ -284,10 +284,19 @@ class _SetOperator(object):
             if rule is None:
                 evaluation.message(self.get_name(), 'noval', symbol)
                 return False
-            indices = lhs.leaves[1:]
+            indices = [index.evaluate(evaluation) for index in lhs.leaves[1:]]
+            if indices and all(isinstance(index, Integer)
+                               for index in indices):
+                # a single part is changed in place, without copying the
+                # whole value every time
+                value = evaluation.definitions.get_private_ownvalue(name)
+                return set_part_in_place(
+                    value, [index.value for index in indices], rhs,
+                    evaluation)
             result = walk_parts([rule.replace], indices, evaluation, rhs)
             if result:
                 evaluation.definitions.set_ownvalue(name, result)
+                return True
             else:
                 return False
         else:
@@ -652,6 +661,7 @@ class Definition(Builtin):
             evaluation.message('Definition', 'sym', symbol, 1)
             return
         attributes = evaluation.definitions.get_attributes(name)
+        history = evaluation.definitions.history.get_rules(name)
         definition = evaluation.definitions.get_user_definition(
             name, create=False)
         all = evaluation.definitions.get_definition(name)
@@ -664,10 +674,14 @@ class Definition(Builtin):
                         'List',
                         *(Symbol(attribute) for attribute in attributes)))))
 
+        if definition is None and not 'System`ReadProtected' in attributes:
+            # In and Out only have the values kept in the history
+            for rule in history:
+                print_rule(rule)
         if definition is not None and not 'System`ReadProtected' in attributes:
             for rule in definition.ownvalues:
                 print_rule(rule)
-            for rule in definition.downvalues:
+            for rule in history + definition.downvalues:
                 print_rule(rule)
             for rule in definition.subvalues:
                 print_rule(rule)
@@ -796,6 +810,7 @@ class Clear(Builtin):
                     continue
                 definition = evaluation.definitions.get_user_definition(name)
                 self.do_clear(definition)
+                evaluation.definitions.history.clear(name)
 
         return Symbol('Null')
 
@@ -971,8 +986,11 @@ def get_symbol_values(symbol, func_name, position, evaluation):
         definition = evaluation.definitions.get_definition(name)
     else:
         definition = evaluation.definitions.get_user_definition(name)
+    rules = definition.get_values_list(position)
+    if position == 'down':
+        rules = evaluation.definitions.history.get_rules(name) + rules
     result = Expression('List')
-    for rule in definition.get_values_list(position):
+    for rule in rules:
         if isinstance(rule, Rule):
             pattern = rule.pattern
             if pattern.has_form('HoldPattern', 1):
@@ -981,6 +999,8 @@ def get_symbol_values(symbol, func_name, position, evaluation):
                 pattern = Expression('HoldPattern', pattern.expr)
             result.leaves.append(Expression(
                 'RuleDelayed', pattern, rule.replace))
+            # the value is now shared with the result
+            rule.private = False
     return result
 
 
@@ -19,6 +19,10 @@ u"""
 """
 
 import re
+import os
+import sys
+import hashlib
+import cPickle as pickle
 import sympy
 
 from mathics.core.definitions import Definition
@@ -26,6 +30,110 @@ from mathics.core.rules import Rule, BuiltinRule, Pattern
 from mathics.core.expression import (BaseExpression, Expression, Symbol,
                                      String, Integer, ensure_context,
                                      strip_context)
+from mathics.settings import BUILTIN_RULES_CACHE
+
+
+class RuleCache(object):
+    """
+    Parsed patterns and replacements of builtin rules, stored per builtin
+    class in a pickle file. The trees of a class are reused as long as the
+    source of the module defining it is unchanged, so that contributing
+    the builtins only parses rules that have been added or modified.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.stored = None
+        self.parsed = {}
+        self.changed = set()
+        self.source_hashes = {}
+
+    @staticmethod
+    def get_file_hash(filename):
+        # prefer the source, but installations may only ship bytecode
+        if filename.endswith(('.pyc', '.pyo')) and os.path.exists(
+                filename[:-1]):
+            filename = filename[:-1]
+        with open(filename, 'rb') as source_file:
+            return hashlib.md5(source_file.read()).hexdigest()
+
+    def get_version(self):
+        # parsed trees change with the grammar, the parser used, the named
+        # characters and the expression classes
+        from mathics import __version__
+        from mathics.core import parser, characters, expression
+        return (__version__, parser.PARSER,
+                self.get_file_hash(parser.__file__),
+                self.get_file_hash(characters.__file__),
+                self.get_file_hash(expression.__file__))
+
+    def get_source_hash(self, cls):
+        module = cls.__module__
+        source_hash = self.source_hashes.get(module)
+        if source_hash is None:
+            source_hash = self.get_file_hash(sys.modules[module].__file__)
+            self.source_hashes[module] = source_hash
+        return source_hash
+
+    def load(self):
+        self.parsed = {}
+        self.changed = set()
+        if self.stored is not None:
+            return
+        self.stored = {}
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, 'rb') as cache_file:
+                version, stored = pickle.load(cache_file)
+        except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+            return
+        if version == self.get_version():
+            self.stored = stored
+
+    def save(self):
+        if self.filename is None or not self.changed:
+            return
+        for key in self.changed:
+            self.stored[key] = (self.source_hashes[key[0]],
+                                pickle.dumps(self.parsed[key], -1))
+        # forget builtins that have been removed
+        for key in self.stored.keys():
+            if key not in self.parsed:
+                del self.stored[key]
+        self.changed = set()
+        try:
+            directory = os.path.dirname(self.filename)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_filename = self.filename + '.%d' % os.getpid()
+            with open(temp_filename, 'wb') as cache_file:
+                pickle.dump((self.get_version(), self.stored), cache_file, -1)
+            os.rename(temp_filename, self.filename)
+        except (IOError, OSError):
+            pass
+
+    def parse(self, cls, string):
+        from mathics.core.parser import parse_builtin_rule
+
+        key = (cls.__module__, cls.__name__)
+        trees = self.parsed.get(key)
+        if trees is None:
+            source_hash = self.get_source_hash(cls)
+            stored = self.stored.get(key)
+            if stored is not None and stored[0] == source_hash:
+                trees = pickle.loads(stored[1])
+            else:
+                trees = {}
+            self.parsed[key] = trees
+        tree = trees.get(string)
+        if tree is None:
+            tree = trees[string] = parse_builtin_rule(string)
+            self.changed.add(key)
+        return tree
+
+
+rule_cache = RuleCache(BUILTIN_RULES_CACHE)
 
 
 class Builtin(object):
@@ -54,7 +162,7 @@ class Builtin(object):
         super(Builtin, self).__init__()
 
     def contribute(self, definitions):
-        from mathics.core.parser import parse_builtin_rule
+        parse_builtin_rule = self.parse_rule
 
         name = self.get_name()
         rules = []
@@ -173,8 +281,6 @@ class Builtin(object):
         return None
 
     def get_functions(self, prefix='apply'):
-        from mathics.core.parser import parse_builtin_rule
-
         for name in dir(self):
             if name.startswith(prefix):
                 function = getattr(self, name)
@@ -189,12 +295,15 @@ class Builtin(object):
                 else:
                     attrs = []
                 pattern = pattern % {'name': self.get_name()}
-                pattern = parse_builtin_rule(pattern)
+                pattern = self.parse_rule(pattern)
                 if attrs:
                     yield (attrs, pattern), function
                 else:
                     yield (pattern, function)
 
+    def parse_rule(self, string):
+        return rule_cache.parse(self.__class__, string)
+
     def get_option(self, options, name, evaluation, pop=False):
         name = ensure_context(name)
         value = options.pop(name, None) if pop else options.get(name)
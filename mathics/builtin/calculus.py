@@ -5,13 +5,18 @@ Calculus functions
 """
 
 from mathics.builtin.base import Builtin, PostfixOperator, SympyFunction
-from mathics.core.expression import Expression, Integer, Number
+from mathics.core.expression import (Expression, Integer, Number, Real,
+                                     Complex)
 from mathics.core.convert import (
     sympy_symbol_prefix, SympyExpression, from_sympy)
+from mathics.core.numbers import sympy2mpmath, mpmath2sympy
 from mathics.core.rules import Pattern
 from mathics.builtin.scoping import dynamic_scoping
+from mathics.builtin.compilation import compile_expression, CompileError
+from mathics.builtin.numeric import get_precision
 
 import sympy
+import mpmath
 
 
 class D(SympyFunction):
@@ -831,6 +836,136 @@ class Limit(Builtin):
             return from_sympy(result)
 
 
+def from_mpmath(value, prec):
+    "Converts a root computed with mpmath to a number of precision prec."
+
+    if isinstance(value, mpmath.mpc):
+        return Complex(from_mpmath(value.real, prec),
+                       from_mpmath(value.imag, prec))
+    return Real(mpmath2sympy(value, prec), prec)
+
+
+def sympy_derivative(f, x):
+    """
+    Returns the derivative of f with respect to x computed by sympy, or None
+    if sympy cannot differentiate f.
+    """
+
+    f_sympy = f.to_sympy()
+    if f_sympy is None:
+        return None
+    try:
+        return from_sympy(f_sympy.diff(x.to_sympy()))
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+class RootError(Exception):
+    """
+    Stops a root search with the message name of FindRoot; args are the
+    numbers to insert into the message after the variable. After too many
+    iterations, the last value is given.
+    """
+
+    def __init__(self, name, *args):
+        super(RootError, self).__init__(name)
+        self.name = name
+        self.args = args
+
+
+def newton_iteration(f, d, x, tolerance):
+    """
+    Applies Newton's method to the function f with the derivative d,
+    starting at x, until a step is at most tolerance times the result,
+    and returns the root. f and d may compute with floats or with mpmath
+    numbers.
+    """
+
+    for count in xrange(100):
+        d_value = d(x)
+        if d_value == 0:
+            raise RootError('dsing', x)
+        x1 = x - f(x) / d_value
+        if abs(x1 - x) <= tolerance * abs(x1):
+            return x1
+        x = x1
+    raise RootError('maxiter', x)
+
+
+def secant_iteration(f, x0, x1, tolerance):
+    "Like newton_iteration, with the secant method from x0 and x1."
+
+    f0 = f(x0)
+    for count in xrange(100):
+        f1 = f(x1)
+        if f1 == 0:
+            return x1
+        if f1 == f0:
+            raise RootError('dsing', x1)
+        x2 = x1 - f1 * (x1 - x0) / (f1 - f0)
+        if abs(x2 - x1) <= tolerance * abs(x2):
+            return x2
+        x0, f0, x1 = x1, f1, x2
+    raise RootError('maxiter', x1)
+
+
+def brent_iteration(f, a, b, tolerance):
+    """
+    Applies Brent's method to the real function f on the interval from a
+    to b until the interval containing the root is at most about
+    tolerance times the root, and returns the root. f(a) and f(b) must
+    not have the same sign.
+    """
+
+    fa, fb = f(a), f(b)
+    if fa * fb > 0:
+        raise RootError('brack', a, b)
+    c, fc = b, fb
+    d = e = b - a
+    for count in xrange(100):
+        if fb * fc > 0:
+            # the root is between a and b
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tolerance1 = tolerance * (abs(b) + tolerance)
+        middle = (c - b) / 2
+        if abs(middle) <= tolerance1 or fb == 0:
+            return b
+        if abs(e) >= tolerance1 and abs(fa) > abs(fb):
+            # inverse quadratic interpolation, or secant if a == c
+            s = fb / fa
+            if a == c:
+                p = 2 * middle * s
+                q = 1 - s
+            else:
+                q, r = fa / fc, fb / fc
+                p = s * (2 * middle * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * middle * q - abs(tolerance1 * q),
+                           abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = middle
+        else:
+            # bisection
+            d = e = middle
+        a, fa = b, fb
+        if abs(d) > tolerance1:
+            b += d
+        elif middle > 0:
+            b += tolerance1
+        else:
+            b -= tolerance1
+        fb = f(b)
+    raise RootError('maxiter', b)
+
+
 class FindRoot(Builtin):
     r"""
     <dl>
@@ -838,6 +973,9 @@ class FindRoot(Builtin):
         <dd>searches for a numerical root of $f$, starting from '$x$=$x0$'.
     <dt>'FindRoot[$lhs$ == $rhs$, {$x$, $x0$}]'
         <dd>tries to solve the equation '$lhs$ == $rhs$'.
+    <dt>'FindRoot[$f$, {$x$, $x0$, $x1$}]'
+        <dd>searches for a root of $f$ with the secant method, starting
+        from '$x$=$x0$' and '$x$=$x1$'.
     </dl>
 
     'FindRoot' uses Newton\'s method, so the function of interest should have a first derivative.
@@ -848,7 +986,7 @@ class FindRoot(Builtin):
      = {x -> -0.588532743981861077}
 
     >> FindRoot[Sin[x] + Exp[x] == Pi,{x, 0}]
-     = {x -> 0.866815239911458064}
+     = {x -> 0.866815239911458065}
 
     'FindRoot' has attribute 'HoldAll' and effectively uses 'Block' to localize $x$.
     However, in the result $x$ will eventually still be replaced by its value.
@@ -876,41 +1014,233 @@ class FindRoot(Builtin):
      : Encountered a singular derivative at the point x = 0..
      = FindRoot[Sin[x] - x, {x, 0}]
 
+    With two starting values, the secant method is used, which does not
+    need the derivative:
+    >> FindRoot[Cos[x] == x, {x, 0, 1}]
+     = {x -> 0.739085133215160642}
+
+    'Method -> "Brent"' searches for a root between two values at which
+    the function has different signs:
+    >> FindRoot[x ^ 3 == 2, {x, 0, 2}, Method -> "Brent"]
+     = {x -> 1.25992104989487316}
+    >> FindRoot[x ^ 2 == 2, {x, 2, 3}, Method -> "Brent"]
+     : The values of the function at x = 2. and x = 3. do not have different signs.
+     = FindRoot[x ^ 2 - 2, {x, 2, 3}, Method -> Brent]
+
+    Roots can be computed with more digits:
+    >> FindRoot[Cos[x] == x, {x, 1}, WorkingPrecision -> 30]
+     = {x -> 0.739085133215160641655312087674}
+
+    Functions of numbers and elementary functions are compiled, so that
+    the same equation can be solved quickly for many parameters:
+    >> Table[FindRoot[Cos[x] == a x, {x, 1}], {a, 1, 3}]
+     = {{x -> 0.739085133215160642}, {x -> 0.450183611294873573}, {x -> 0.316750828771221172}}
+
     #> FindRoot[2.5==x,{x,0}]
      = {x -> 2.5}
+    #> FindRoot[Cos[x] == x, {x, 0, 1}, Method -> "Brent", WorkingPrecision -> 30]
+     = {x -> 0.739085133215160641655312087674}
+    #> FindRoot[x ^ 2 == 2, {x, 1, 2}, Method -> "Secant", WorkingPrecision -> 40]
+     = {x -> 1.41421356237309504880168872420969807857}
+    #> FindRoot[g[x] == 2, {x, 1, 2}, Method -> "Secant"]
+     : The function value is not a number at x = 1..
+     = FindRoot[g[x] - 2, {x, 1, 2}, Method -> Secant]
+    #> g[x_?NumericQ] := x ^ 2; FindRoot[g[x] == 2, {x, 1, 2}, Method -> "Brent"]
+     = {x -> 1.41421356237309505}
+    #> FindRoot[x ^ 2 == 2, {x, 1}, Method -> "Brent"]
+     : Method -> Brent needs two starting values.
+     = FindRoot[x ^ 2 - 2, {x, 1}, Method -> Brent]
+    #> FindRoot[x ^ 2 == 2, {x, 1}, Method -> "Bisection"]
+     : Value of option Method -> Bisection should be Automatic, "Newton", "Secant" or "Brent".
+     = FindRoot[x ^ 2 - 2, {x, 1}, Method -> Bisection]
     """
 
     attributes = ('HoldAll',)
 
+    options = {
+        'Method': 'Automatic',
+        'WorkingPrecision': 'MachinePrecision',
+    }
+
     messages = {
         'snum': "Value `1` is not a number.",
         'nnum': "The function value is not a number at `1` = `2`.",
         'dsing': "Encountered a singular derivative at the point `1` = `2`.",
         'maxiter': ("The maximum number of iterations was exceeded. "
                     "The result might be inaccurate."),
+        'brack': ("The values of the function at `1` = `2` and `1` = `3` "
+                  "do not have different signs."),
+        'twost': "Method -> `1` needs two starting values.",
+        'bdmthd': ("Value of option Method -> `1` should be Automatic, "
+                   "\"Newton\", \"Secant\" or \"Brent\"."),
     }
 
     rules = {
-        'FindRoot[lhs_ == rhs_, {x_, xs_}]': 'FindRoot[lhs - rhs, {x, xs}]',
+        'FindRoot[lhs_ == rhs_, {x_, xs__}, opts___]':
+        'FindRoot[lhs - rhs, {x, xs}, opts]',
     }
 
-    def apply(self, f, x, x0, evaluation):
-        'FindRoot[f_, {x_, x0_}]'
+    def apply(self, f, x, x0, evaluation, options):
+        'FindRoot[f_, {x_, x0_}, OptionsPattern[FindRoot]]'
 
-        x0 = Expression('N', x0).evaluate(evaluation)
-        if not isinstance(x0, Number):
-            evaluation.message('FindRoot', 'snum', x0)
-            return
+        return self.find_root(f, x, [x0], evaluation, options)
+
+    def apply_two(self, f, x, x0, x1, evaluation, options):
+        'FindRoot[f_, {x_, x0_, x1_}, OptionsPattern[FindRoot]]'
+
+        return self.find_root(f, x, [x0, x1], evaluation, options)
+
+    def find_root(self, f, x, starts, evaluation, options):
         x_name = x.get_name()
         if not x_name:
             evaluation.message('FindRoot', 'sym', x, 2)
             return
-        count = 0
+        method = self.get_option(options, 'Method', evaluation)
+        if method.get_name() == 'System`Automatic':
+            method = 'Newton' if len(starts) == 1 else 'Secant'
+        elif method.get_string_value() in ('Newton', 'Secant', 'Brent'):
+            method = method.get_string_value()
+        else:
+            evaluation.message('FindRoot', 'bdmthd', method)
+            return
+        if method != 'Newton' and len(starts) == 1:
+            evaluation.message('FindRoot', 'twost', method)
+            return
+        precision = self.get_option(options, 'WorkingPrecision', evaluation)
+        prec = get_precision(precision, evaluation)
+        if prec is None:
+            return
 
-        def diff(evaluation):
-            return Expression('D', f, x).evaluate(evaluation)
+        values = []
+        for start in starts:
+            value = Expression('N', start, precision).evaluate(evaluation)
+            if not isinstance(value, Number):
+                evaluation.message('FindRoot', 'snum', value)
+                return
+            values.append(value)
+        real = all(value.get_real_value() is not None for value in values)
+        if method == 'Brent' and not real:
+            evaluation.message('FindRoot', 'brack', x, *values)
+            return
+
+        # insert the values of other symbols, e.g. of Table iterators, so
+        # that f (and its derivative for Newton's method) can be compiled
+        f_value = dynamic_scoping(f.evaluate, {x_name: None}, evaluation)
+        functions = [f_value]
+        if method == 'Newton':
+            # sympy differentiates much faster than D; derivatives it cannot
+            # express in compilable functions are left to the evaluator
+            functions.append(sympy_derivative(f_value, x))
+        machine = precise = None
+        if all(g is not None for g in functions):
+            definitions = evaluation.definitions
+            try:
+                machine = [compile_expression(g, [x_name], definitions)
+                           for g in functions]
+                precise = [compile_expression(g, [x_name], definitions,
+                                              use_mpmath=True)
+                           for g in functions]
+            except CompileError:
+                machine = precise = None
+
+        root = None
+        if machine is not None and real:
+            root = self.find_machine_root(machine, precise, values, method,
+                                          prec)
+        if root is None and method == 'Newton':
+            d = dynamic_scoping(Expression('D', f, x).evaluate,
+                                {x_name: None}, evaluation)
+            return self.find_newton_root(f, x, d, values[0], precision,
+                                         evaluation)
+        elif root is None:
+            with mpmath.workprec(prec):
+                if precise is None:
+                    function = self.get_evaluator_function(
+                        f, x_name, prec, evaluation)
+                else:
+                    function = precise[0]
+                starts = [sympy2mpmath(value.to_sympy(), prec)
+                          for value in values]
+                tolerance = mpmath.ldexp(1, 8 - prec)
+                try:
+                    if method == 'Secant':
+                        root = secant_iteration(function, starts[0],
+                                                starts[1], tolerance)
+                    else:
+                        root = brent_iteration(function, starts[0],
+                                               starts[1], tolerance)
+                except RootError, error:
+                    evaluation.message('FindRoot', error.name, x, *[
+                        from_mpmath(value, prec) for value in error.args])
+                    if error.name != 'maxiter':
+                        return
+                    root = error.args[0]
+                except (ValueError, ZeroDivisionError, OverflowError,
+                        TypeError):
+                    evaluation.message('FindRoot', 'nnum', x, values[0])
+                    return
+                root = from_mpmath(root, prec)
+        return Expression('List', Expression('Rule', x, root))
+
+    def find_machine_root(self, machine, precise, values, method, prec):
+        """
+        Searches for a root with the compiled functions machine (f and, for
+        Newton's method, its derivative) in floats and refines it with the
+        compiled functions precise at the working precision prec. Returns
+        the root, or None if the search in floats does not converge.
+        """
 
-        d = dynamic_scoping(diff, {x_name: None}, evaluation)
+        try:
+            starts = [float(value.get_real_value()) for value in values]
+            if method == 'Newton':
+                root = newton_iteration(machine[0], machine[1], starts[0],
+                                        1e-15)
+            elif method == 'Secant':
+                root = secant_iteration(machine[0], starts[0], starts[1],
+                                        1e-15)
+            else:
+                root = brent_iteration(machine[0], starts[0], starts[1],
+                                       1e-15)
+            with mpmath.workprec(prec):
+                x0 = mpmath.mpf(root)
+                tolerance = mpmath.ldexp(1, 8 - prec)
+                if method == 'Newton':
+                    root = newton_iteration(precise[0], precise[1], x0,
+                                            tolerance)
+                else:
+                    # the secant method converges quickly from close values
+                    x1 = x0 + mpmath.ldexp(max(abs(x0), 1), -40)
+                    root = secant_iteration(precise[0], x0, x1, tolerance)
+                if not isinstance(root, mpmath.mpf):
+                    return None
+                return from_mpmath(root, prec)
+        except (RootError, ValueError, ZeroDivisionError, OverflowError,
+                TypeError):
+            return None
+
+    def get_evaluator_function(self, f, x_name, prec, evaluation):
+        """
+        Returns a function of mpmath numbers that computes f with the
+        evaluator and raises RootError if the value is not a number.
+        """
+
+        def function(value):
+            x_value = from_sympy(mpmath2sympy(value, prec))
+            result = dynamic_scoping(f.evaluate, {x_name: x_value},
+                                     evaluation)
+            if isinstance(result, Number):
+                result = sympy2mpmath(result.to_sympy(), prec)
+                if result is not None:
+                    return result
+            raise RootError('nnum', value)
+
+        return function
+
+    def find_newton_root(self, f, x, d, x0, precision, evaluation):
+        "Applies Newton's method with the evaluator."
+
+        x_name = x.get_name()
+        count = 0
 
         def sub(evaluation):
             d_value = d.evaluate(evaluation)
@@ -931,7 +1261,7 @@ class FindRoot(Builtin):
                 return
             if x1 == x0:
                 break
-            x0 = Expression('N', x1).evaluate(
+            x0 = Expression('N', x1, precision).evaluate(
                 evaluation)       # N required due to bug in sympy arithmetic
             count += 1
         else:
@@ -0,0 +1,616 @@
+# -*- coding: utf8 -*-
+
+"""
+Compilation
+
+Numerical expressions can be compiled to Python functions working on
+machine numbers, which are much faster to evaluate repeatedly than the
+expressions themselves.
+"""
+
+import math
+import mpmath
+import weakref
+
+from mathics.builtin.base import Builtin
+from mathics.builtin.arithmetic import _MPMathFunction
+from mathics.core.expression import (Expression, Integer, Rational, Real,
+                                     String, Symbol, Number)
+
+
+class CompileError(Exception):
+    pass
+
+
+def _real(value):
+    "Rejects the complex results of mpmath.fp functions."
+
+    if isinstance(value, complex):
+        raise ValueError('complex result')
+    return value
+
+
+# names available to compiled code
+compile_namespace = {
+    '_math': math,
+    '_fp': mpmath.fp,
+    '_mp': mpmath.mp,
+    '_real': _real,
+    '_sec': lambda x: 1.0 / math.cos(x),
+    '_csc': lambda x: 1.0 / math.sin(x),
+    '_cot': lambda x: math.cos(x) / math.sin(x),
+    '_sech': lambda x: 1.0 / math.cosh(x),
+    '_csch': lambda x: 1.0 / math.sinh(x),
+    '_coth': lambda x: math.cosh(x) / math.sinh(x),
+}
+
+compile_constants = {
+    'System`Pi': math.pi,
+    'System`E': math.e,
+    'System`GoldenRatio': (1 + math.sqrt(5)) / 2,
+    'System`Degree': math.pi / 180,
+}
+
+mpmath_constants = {
+    'System`Pi': '_mp.pi',
+    'System`E': '_mp.e',
+    'System`GoldenRatio': '_mp.phi',
+    'System`Degree': '_mp.degree',
+}
+
+# functions of one argument, by their Python names
+compile_functions = {
+    'System`Sin': '_math.sin',
+    'System`Cos': '_math.cos',
+    'System`Tan': '_math.tan',
+    'System`Sec': '_sec',
+    'System`Csc': '_csc',
+    'System`Cot': '_cot',
+    'System`ArcSin': '_math.asin',
+    'System`ArcCos': '_math.acos',
+    'System`ArcTan': '_math.atan',
+    'System`Sinh': '_math.sinh',
+    'System`Cosh': '_math.cosh',
+    'System`Tanh': '_math.tanh',
+    'System`Sech': '_sech',
+    'System`Csch': '_csch',
+    'System`Coth': '_coth',
+    'System`ArcSinh': '_math.asinh',
+    'System`ArcCosh': '_math.acosh',
+    'System`ArcTanh': '_math.atanh',
+    'System`Exp': '_math.exp',
+    'System`Log': '_math.log',
+    'System`Sqrt': '_math.sqrt',
+    'System`Abs': 'abs',
+    'System`Floor': '_math.floor',
+    'System`Ceiling': '_math.ceil',
+}
+
+# the names of the same functions in mpmath
+mpmath_functions = {
+    'System`Sin': 'sin',
+    'System`Cos': 'cos',
+    'System`Tan': 'tan',
+    'System`Sec': 'sec',
+    'System`Csc': 'csc',
+    'System`Cot': 'cot',
+    'System`ArcSin': 'asin',
+    'System`ArcCos': 'acos',
+    'System`ArcTan': 'atan',
+    'System`Sinh': 'sinh',
+    'System`Cosh': 'cosh',
+    'System`Tanh': 'tanh',
+    'System`Sech': 'sech',
+    'System`Csch': 'csch',
+    'System`Coth': 'coth',
+    'System`ArcSinh': 'asinh',
+    'System`ArcCosh': 'acosh',
+    'System`ArcTanh': 'atanh',
+    'System`Exp': 'exp',
+    'System`Log': 'log',
+    'System`Sqrt': 'sqrt',
+    'System`Abs': 'fabs',
+    'System`Floor': 'floor',
+    'System`Ceiling': 'ceil',
+}
+
+compile_operators = {
+    'System`Plus': ' + ',
+    'System`Times': ' * ',
+    'System`And': ' and ',
+    'System`Or': ' or ',
+}
+
+compile_comparisons = {
+    'System`Equal': ' == ',
+    'System`Less': ' < ',
+    'System`LessEqual': ' <= ',
+    'System`Greater': ' > ',
+    'System`GreaterEqual': ' >= ',
+}
+
+# heads whose operands must be booleans, because Python's and, or and not
+# would otherwise use the truthiness of numbers
+boolean_operators = ('System`And', 'System`Or', 'System`Not')
+
+# the types of variables that can be compiled, with the text of the message
+# for arguments that do not fit
+compile_types = {
+    'System`Real': 'machine-size real number',
+    'System`Integer': 'machine-size integer',
+}
+
+
+class Compiler(object):
+    """
+    Translates an expression into the source of a Python expression
+    computing it with floats, for given argument names. Raises
+    CompileError for anything that cannot be translated.
+    """
+
+    # the module providing exp, log and atan2
+    module = '_math'
+
+    def __init__(self, arg_names, definitions):
+        self.args = dict((name, '_a%d' % index)
+                         for index, name in enumerate(arg_names))
+        self.definitions = definitions
+
+    def check_builtin(self, name):
+        # functions the user has given definitions of must be evaluated
+        if name in self.definitions.user:
+            raise CompileError('%s has user definitions' % name)
+
+    def compile(self, expr):
+        if isinstance(expr, Symbol):
+            return self.compile_symbol(expr.get_name())
+        elif isinstance(expr, (Integer, Rational, Real)):
+            return self.compile_number(expr)
+        elif expr.is_atom():
+            raise CompileError('cannot compile %s' % expr)
+        head = expr.get_head_name()
+        if not head:
+            raise CompileError('cannot compile %s' % expr)
+        self.check_builtin(head)
+        self.check_booleans(head, expr.leaves)
+        leaves = [self.compile(leaf) for leaf in expr.leaves]
+        return self.compile_function(head, leaves)
+
+    def check_booleans(self, head, leaves):
+        if head in boolean_operators:
+            operands = leaves
+        elif head == 'System`If':
+            operands = leaves[:1]
+        else:
+            if head != 'System`List':
+                for leaf in leaves:
+                    if self.is_boolean(leaf):
+                        raise CompileError('%s of boolean %s' % (head, leaf))
+            return
+        for leaf in operands:
+            if not self.is_boolean(leaf):
+                raise CompileError('%s of non-boolean %s' % (head, leaf))
+
+    def is_boolean(self, expr):
+        "Tests whether expr compiles to a Python bool."
+
+        if expr.get_name() in ('System`True', 'System`False'):
+            return expr.get_name() not in self.args
+        head = expr.get_head_name()
+        if (head in compile_comparisons or head == 'System`Unequal' or
+                head in boolean_operators):
+            return True
+        elif head == 'System`If' and len(expr.leaves) == 3:
+            return all(self.is_boolean(leaf) for leaf in expr.leaves[1:])
+        return False
+
+    def compile_number(self, expr):
+        try:
+            return repr(float(expr.to_sympy()))
+        except OverflowError:
+            raise CompileError('%s is not a machine number' % expr)
+
+    def compile_constant(self, name):
+        return repr(compile_constants[name])
+
+    def compile_symbol(self, name):
+        if name in self.args:
+            return self.args[name]
+        self.check_builtin(name)
+        if name in compile_constants:
+            return self.compile_constant(name)
+        elif name == 'System`True':
+            return 'True'
+        elif name == 'System`False':
+            return 'False'
+        raise CompileError('%s has no machine value' % name)
+
+    def compile_function(self, head, leaves):
+        count = len(leaves)
+        if head in compile_operators and count >= 1:
+            return '(%s)' % compile_operators[head].join(leaves)
+        elif head in compile_comparisons and count >= 2:
+            return '(%s)' % compile_comparisons[head].join(leaves)
+        elif head == 'System`Unequal' and count == 2:
+            return '(%s != %s)' % tuple(leaves)
+        elif head == 'System`Not' and count == 1:
+            return '(not %s)' % tuple(leaves)
+        elif head == 'System`Power' and count == 2:
+            if leaves[0] == self.compile_constant('System`E'):
+                return '%s.exp(%s)' % (self.module, leaves[1])
+            return '(%s ** %s)' % tuple(leaves)
+        elif head == 'System`Subtract' and count == 2:
+            return '(%s - %s)' % tuple(leaves)
+        elif head == 'System`Divide' and count == 2:
+            return '(%s / %s)' % tuple(leaves)
+        elif head == 'System`Minus' and count == 1:
+            return '(-%s)' % tuple(leaves)
+        elif head == 'System`Mod' and count == 2:
+            return '(%s %% %s)' % tuple(leaves)
+        elif head in ('System`Min', 'System`Max') and count >= 1:
+            return '%s(%s)' % (head[7:].lower(), ', '.join(leaves))
+        elif head == 'System`If' and count == 3:
+            return '(%s if %s else %s)' % (leaves[1], leaves[0], leaves[2])
+        elif head == 'System`If' and count == 2:
+            return '(%s if %s else None)' % (leaves[1], leaves[0])
+        elif head == 'System`List':
+            return '[%s]' % ', '.join(leaves)
+        elif head == 'System`N' and count == 1:
+            return leaves[0]
+        elif head == 'System`Log' and count == 2:
+            return '%s.log(%s, %s)' % (self.module, leaves[1], leaves[0])
+        elif head == 'System`ArcTan' and count == 2:
+            return '%s.atan2(%s, %s)' % (self.module, leaves[1], leaves[0])
+        elif head in compile_functions and count == 1:
+            return self.compile_call(head, leaves[0])
+
+        from mathics.builtin import builtins
+
+        builtin = builtins.get(head)
+        if (isinstance(builtin, _MPMathFunction) and
+                builtin.mpmath_name is not None and builtin.nargs == count):
+            return self.compile_mpmath_call(builtin.mpmath_name, leaves)
+        raise CompileError('cannot compile %s' % head)
+
+    def compile_call(self, head, leaf):
+        return '%s(%s)' % (compile_functions[head], leaf)
+
+    def compile_mpmath_call(self, name, leaves):
+        return '_real(_fp.%s(%s))' % (name, ', '.join(leaves))
+
+
+class MPMathCompiler(Compiler):
+    """
+    Like Compiler, but the Python expression computes with mpmath numbers
+    at the working precision of mpmath.mp.
+    """
+
+    module = '_mp'
+
+    def compile_number(self, expr):
+        if isinstance(expr, Integer):
+            return '_mp.mpf(%d)' % expr.value
+        elif isinstance(expr, Rational):
+            value = expr.value
+            return '(_mp.mpf(%d) / %d)' % (value.p, value.q)
+        sign, man, exp, bc = expr.get_mpf()
+        return '_mp.mpf((%d, %d))' % (-man if sign else man, exp)
+
+    def compile_constant(self, name):
+        return mpmath_constants[name]
+
+    def compile_call(self, head, leaf):
+        return '_mp.%s(%s)' % (mpmath_functions[head], leaf)
+
+    def compile_mpmath_call(self, name, leaves):
+        return '_mp.%s(%s)' % (name, ', '.join(leaves))
+
+
+def compile_expression(expr, arg_names, definitions, vectorize=False,
+                       use_mpmath=False):
+    """
+    Returns a Python function of len(arg_names) floats that computes
+    expr. The function raises ValueError, ZeroDivisionError or
+    OverflowError where the result is not a real machine number, and
+    returns None where an If has no value.
+
+    If vectorize is True, the function instead takes a list of points
+    and returns the list of the values at these points. Points are floats
+    for one argument and tuples of floats otherwise.
+
+    If use_mpmath is True, the function computes with mpmath numbers at
+    the working precision of mpmath.mp instead; it may then return
+    complex mpmath numbers.
+
+    Raises CompileError if expr contains anything but numbers,
+    arithmetic, elementary functions, comparisons, logical operators and
+    If.
+    """
+
+    if use_mpmath:
+        compiler = MPMathCompiler(arg_names, definitions)
+    else:
+        compiler = Compiler(arg_names, definitions)
+    args = ', '.join('_a%d' % index for index in range(len(arg_names)))
+    code = compiler.compile(expr)
+    if vectorize:
+        source = 'lambda _points: [%s for %s in _points]' % (code, args)
+    else:
+        source = 'lambda %s: %s' % (args, code)
+    return eval(source, compile_namespace)
+
+
+def get_compile_vars(vars):
+    """
+    Returns the names of the variables given to Compile and the names of
+    their types, or None. Variables without a type are real.
+    """
+
+    if not vars.has_form('List', None):
+        return None
+    names = []
+    types = []
+    for var in vars.leaves:
+        type = 'System`Real'
+        if var.has_form('List', 2):
+            var, spec = var.leaves
+            type = None
+            if spec.has_form('Blank', 1):
+                type = spec.leaves[0].get_name()
+        name = var.get_name()
+        if not name:
+            return None
+        names.append(name)
+        types.append(type)
+    return names, types
+
+
+def get_machine_value(arg, type):
+    "Returns the float value of arg if it is a number of the given type."
+
+    if type == 'System`Integer':
+        if isinstance(arg, Integer) and abs(arg.value) < 2 ** 63:
+            return float(arg.value)
+        return None
+    if not isinstance(arg, Number):
+        return None
+    value = arg.get_real_value()
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except OverflowError:
+        return None
+
+
+class Compile(Builtin):
+    """
+    <dl>
+    <dt>'Compile[{$x1$, $x2$, ...}, $expr$]'
+        <dd>returns a compiled function that evaluates $expr$ for machine
+        numbers $x1$, $x2$, ...
+    <dt>'Compile[{{$x1$, $t1$}, ...}, $expr$]'
+        <dd>assumes that $x1$ matches the pattern $t1$, which may be
+        '_Real' or '_Integer'.
+    </dl>
+
+    >> cf = Compile[{x, y}, x + 2 y]
+     = CompiledFunction[{x, y}, x + 2 y]
+    >> cf[2.5, 4.3]
+     = 11.1
+
+    >> cf = Compile[{{x, _Real}}, Sin[x]]
+     = CompiledFunction[{{x, _Real}}, Sin[x]]
+    >> cf[1.4]
+     = 0.9854497299884601
+
+    Compiled functions work with machine numbers, but also accept
+    arguments of other kinds, which are passed to the evaluator:
+    >> cf[a]
+     : Argument a at position 1 should be a machine-size real number.
+     = Sin[a]
+
+    Results that are not real machine numbers are also left to the
+    evaluator:
+    >> Compile[{x}, Sqrt[x]][-4]
+     : Numerical error encountered; proceeding with uncompiled evaluation.
+     = 2 I
+
+    Expressions that cannot be compiled are always evaluated:
+    >> Compile[{x}, f[x]][2]
+     = f[2]
+
+    #> Compile[{x}, If[x > 0, x, -x]] /@ {-2, 3}
+     = {2., 3.}
+    #> Compile[{x, y}, ArcTan[x, y] + Log[2, y]][1, 4]
+     = 3.3258176636680323
+    #> Compile[x, x]
+     : Variable specification x is not a list of symbols.
+     = Compile[x, x]
+    #> Compile[{{x, _Complex}}, x]
+     : Type _Complex of variable x cannot be compiled.
+     = Compile[{{x, _Complex}}, x]
+
+    Arguments must have the types given for them:
+    #> cf = Compile[{{n, _Integer}, x}, n + x]; cf[2, 0.5]
+     = 2.5
+    #> cf[2.5, 0.5]
+     : Argument 2.5 at position 1 should be a machine-size integer.
+     = 3.
+    #> cf[2 ^ 70, 0.5]
+     : Argument 1180591620717411303424 at position 1 should be a machine-size integer.
+     = 1.1805916207174113*^21
+
+    Logical operators and conditions of 'If' only compile with boolean
+    operands, which are left to the evaluator otherwise:
+    #> Compile[{x}, x > 1 && x][2.]
+     = 2.
+    #> Compile[{x}, x || x > 1][0.]
+     = 0.
+    #> Compile[{x}, (x > 1) + 1][2.]
+     = 1 + True
+    #> Compile[{x}, If[x, 1, 2]][0.5]
+     = If[0.5, 1, 2]
+    #> Compile[{x}, Not[x]][0.]
+     = !0.
+    #> Compile[{x}, If[x > 1 || x < -1, 1, 2]] /@ {-2., 0., 2.}
+     = {1., 2., 1.}
+    #> Compile[{x}, !(x > 1) && True][0.]
+     = True
+    #> Compile[{x}, x * x][10.^300]
+     : Numerical error encountered; proceeding with uncompiled evaluation.
+     = 1.*^600
+
+    #> cf = Compile[{x}, Cos[x]]; cf[0.]
+     = 1.
+    #> Unprotect[Cos]; Cos[0.] = 2.; cf[0.]
+     = 2.
+    #> Cos[0.] =.; Protect[Cos]; cf[0.]
+     = 1.
+    """
+
+    attributes = ('HoldAll',)
+
+    messages = {
+        'invars': "Variable specification `1` is not a list of symbols.",
+        'type': "Type `1` of variable `2` cannot be compiled.",
+    }
+
+    def apply(self, vars, expr, evaluation):
+        'Compile[vars_, expr_]'
+
+        compile_vars = get_compile_vars(vars)
+        if compile_vars is None:
+            evaluation.message('Compile', 'invars', vars)
+            return
+        for var, type in zip(vars.leaves, compile_vars[1]):
+            if type not in compile_types:
+                evaluation.message('Compile', 'type', *reversed(var.leaves))
+                return
+        return Expression('CompiledFunction', vars, expr)
+
+
+class CompiledFunction(Builtin):
+    """
+    <dl>
+    <dt>'CompiledFunction[$vars$, $expr$]'
+        <dd>is a function compiled by 'Compile'.
+    </dl>
+
+    >> CompiledFunction[{x}, x ^ 2][3]
+     = 9.
+    """
+
+    attributes = ('HoldAll',)
+
+    messages = {
+        'cfsa': "Argument `1` at position `2` should be a `3`.",
+        'cfn': ("Numerical error encountered; proceeding with uncompiled "
+                "evaluation."),
+    }
+
+    # compiled functions of each Definitions by the text of vars and expr,
+    # together with the names in expr that had user definitions
+    caches = weakref.WeakKeyDictionary()
+    cache_size = 100
+
+    def get_function(self, names, expr, evaluation):
+        definitions = evaluation.definitions
+        cache = self.caches.setdefault(definitions, {})
+        key = (tuple(names), unicode(expr))
+        entry = cache.get(key)
+        if entry is not None:
+            function, symbols, defined = entry
+            if defined == get_user_names(symbols, definitions):
+                return function
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        try:
+            function = compile_expression(expr, names, definitions)
+        except CompileError:
+            function = None
+        symbols = get_symbol_names(expr)
+        cache[key] = (function, symbols,
+                      get_user_names(symbols, definitions))
+        return function
+
+    def apply(self, vars, expr, args, evaluation):
+        'CompiledFunction[vars_, expr_][args___]'
+
+        compile_vars = get_compile_vars(vars)
+        args = args.get_sequence()
+        if compile_vars is None or len(args) != len(compile_vars[0]):
+            return
+        names, types = compile_vars
+        if not all(type in compile_types for type in types):
+            return
+
+        uncompiled = Expression(Expression('Function', Expression(
+            'List', *[Symbol(name) for name in names]), expr), *args)
+        function = self.get_function(names, expr, evaluation)
+        if function is None:
+            return uncompiled
+        values = []
+        for index, arg in enumerate(args):
+            value = get_machine_value(arg, types[index])
+            if value is None:
+                evaluation.message('CompiledFunction', 'cfsa', arg, index + 1,
+                                   String(compile_types[types[index]]))
+                return uncompiled
+            values.append(value)
+        try:
+            result = function(*values)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            evaluation.message('CompiledFunction', 'cfn')
+            return uncompiled
+        if not is_finite(result):
+            evaluation.message('CompiledFunction', 'cfn')
+            return uncompiled
+        return from_machine(result)
+
+
+def get_symbol_names(expr):
+    "Returns the names of all symbols in expr, including heads."
+
+    names = set()
+
+    def collect(expr):
+        if expr.is_atom():
+            name = expr.get_name()
+            if name:
+                names.add(name)
+        else:
+            collect(expr.head)
+            for leaf in expr.leaves:
+                collect(leaf)
+
+    collect(expr)
+    return frozenset(names)
+
+
+def get_user_names(names, definitions):
+    "Returns those of names that have user definitions."
+
+    return frozenset(name for name in names if name in definitions.user)
+
+
+def is_finite(value):
+    "Tests whether a result of a compiled function has no inf or nan."
+
+    if isinstance(value, list):
+        return all(is_finite(item) for item in value)
+    elif isinstance(value, float):
+        return not (math.isinf(value) or math.isnan(value))
+    return True
+
+
+def from_machine(value):
+    "Converts a result of a compiled function to an expression."
+
+    if value is None:
+        return Symbol('Null')
+    elif isinstance(value, bool):
+        return Symbol('True' if value else 'False')
+    elif isinstance(value, list):
+        return Expression('List', *[from_machine(item) for item in value])
+    return Real(repr(float(value)))
@@ -232,6 +232,7 @@ class Do(_IterationFunction):
     """
 
     allow_loopcontrol = True
+    keep_results = False
 
     def get_result(self, items):
         return Symbol('Null')
@@ -280,12 +280,33 @@ class In(Builtin):
      . In[2] = x = x + 1
      .
      . In[1] = x = 1
+
+    #> DownValues[In][[-1]]
+     = HoldPattern[In[1]] :> (x = 1)
+    #> In[1] =.
+    #> In[1]
+     = In[1]
+    #> In[1] =.
+     : Assignment on In for In[1] not found.
+     = $Failed
+    #> Unprotect[In]; Clear[In]; DownValues[In]
+     = {}
+    #> $HistoryLength = 1;
+    #> y = 5
+     = 5
+    #> {In[12], In[13]}
+     = {In[12], 5}
     """
 
     rules = {
         'In[k_Integer?Negative]': 'In[$Line + k]',
     }
 
+    def apply(self, k, evaluation):
+        'In[k_Integer]'
+
+        return evaluation.definitions.history.get_input(k.get_int_value())
+
 
 class Out(Builtin):
     """
@@ -321,6 +342,25 @@ class Out(Builtin):
      = 11
     #> Out[] + 1
      = 12
+    #> Take[DownValues[Out], 3]
+     = {HoldPattern[%13] :> 12, HoldPattern[%12] :> 11, HoldPattern[%11] :> 10}
+    #> Out[11] =.
+    #> %11
+     = %11
+    #> Out[11] =.
+     : Assignment on Out for %11 not found.
+     = $Failed
+    #> $HistoryLength = 2;
+    #> 20
+     = 20
+    #> 21
+     = 21
+    #> {%%, %%%, %19, %20}
+     = {20, %18, 20, 21}
+    #> Length[DownValues[Out]]
+     = 2
+    #> Unprotect[Out]; Clear[Out]; DownValues[Out]
+     = {}
     """
 
     rules = {
@@ -333,3 +373,8 @@ class Out(Builtin):
         '    f:StandardForm|TraditionalForm|InputForm|OutputForm]':
         r'"%%" <> ToString[k]',
     }
+
+    def apply(self, k, evaluation):
+        'Out[k_Integer]'
+
+        return evaluation.definitions.history.get_output(k.get_int_value())
@@ -1852,7 +1852,7 @@ class Automatic(Builtin):
     graphical options:
 
     >> Cases[Options[Plot], _ :> Automatic]
-     = {Exclusions :> Automatic, ImageSize :> Automatic, MaxRecursion :> Automatic, PlotRange :> Automatic, PlotRangePadding :> Automatic}
+     = {Exclusions :> Automatic, ImageSize :> Automatic, MaxRecursion :> Automatic, Method :> Automatic, PlotRange :> Automatic, PlotRangePadding :> Automatic}
     '''
 
 
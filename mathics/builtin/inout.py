@@ -1112,6 +1112,9 @@ class General(Builtin):
         #'rep': "`1` is not a valid replacement rule.",
         'options': "`1` is not a valid list of option rules.",
         'timeout': "Timeout reached.",
+        'nomem': ("The current computation was aborted because there was "
+                  "insufficient memory available to complete the "
+                  "computation."),
         'syntax': "`1`",
         'invalidargs': "Invalid arguments.",
 
@@ -4,11 +4,16 @@
 Linear algebra
 """
 
+import math
+import sys
 import sympy
+from fractions import Fraction, gcd
 
 from mathics.builtin.base import Builtin
+from mathics.builtin.numeric import machine_precision
 from mathics.core.convert import from_sympy
-from mathics.core.expression import Expression, Integer
+from mathics.core.expression import (Expression, Integer, Rational, Real,
+                                     Complex)
 
 
 def matrix_data(m):
@@ -28,6 +33,474 @@ def to_sympy_matrix(data, **kwargs):
         return None
 
 
+def number_matrix(m):
+    """
+    Returns the entries of the rectangular matrix m as lists of Python
+    numbers, or None if m is not a matrix or has other entries.
+
+    Matrices of Integers and Rationals give Fractions. Matrices with a
+    machine real and otherwise exact or machine numbers give floats (or
+    complex numbers), to be computed with machine arithmetic like
+    compiled functions.
+    """
+
+    def to_exact(item):
+        if isinstance(item, Integer):
+            return Fraction(item.value)
+        elif isinstance(item, Rational):
+            value = item.value
+            return Fraction(int(value.p), int(value.q))
+        return None
+
+    def to_machine(item):
+        if isinstance(item, Complex):
+            real, imag = to_machine(item.real), to_machine(item.imag)
+            if real is None or imag is None:
+                return None
+            return complex(real, imag)
+        if isinstance(item, Real) and item.prec > machine_precision:
+            return None
+        if isinstance(item, (Integer, Rational, Real)):
+            try:
+                value = float(item.to_sympy())
+            except OverflowError:
+                return None
+            # numbers beyond the range of floats are left to sympy
+            if not is_normal(value) or (value == 0 and item.to_sympy() != 0):
+                return None
+            return value
+        return None
+
+    if not m.has_form('List', None) or not m.leaves:
+        return None
+    if not all(row.has_form('List', None) for row in m.leaves):
+        return None
+    data = [row.leaves for row in m.leaves]
+    if not data[0] or any(len(row) != len(data[0]) for row in data):
+        return None
+    rows = [[to_exact(item) for item in row] for row in data]
+    if all(None not in row for row in rows):
+        return rows
+    if not any(is_inexact(item) for row in data for item in row):
+        # e.g. exact complex numbers, which are left to sympy
+        return None
+    rows = [[to_machine(item) for item in row] for row in data]
+    if all(None not in row for row in rows):
+        return rows
+    return None
+
+
+def is_inexact(item):
+    if isinstance(item, Complex):
+        return isinstance(item.real, Real) or isinstance(item.imag, Real)
+    return isinstance(item, Real)
+
+
+def is_square(rows):
+    return rows is not None and len(rows) == len(rows[0])
+
+
+def is_exact(rows):
+    return isinstance(rows[0][0], Fraction)
+
+
+def is_normal(value):
+    """
+    Tests whether the machine number value (or both its parts) is zero or
+    of normal magnitude, which excludes underflow, overflow and nan.
+    """
+
+    if isinstance(value, complex):
+        return is_normal(value.real) and is_normal(value.imag)
+    return value == 0 or sys.float_info.min <= abs(value) <= sys.float_info.max
+
+
+def from_machine_number(value):
+    if isinstance(value, complex):
+        if value.imag == 0:
+            return from_machine_number(value.real)
+        return Complex(from_machine_number(value.real),
+                       from_machine_number(value.imag))
+    # Machine reals have more bits than doubles, so results computed with
+    # doubles only keep the digits of a double that are free of rounding
+    # errors, which are fewer than the digits of other machine reals.
+    return Real('%.*g' % (sys.float_info.dig, value), machine_precision)
+
+
+def from_number(value):
+    "Converts a Fraction or a machine number to an expression."
+
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            return Integer(value.numerator)
+        return Rational(value.numerator, value.denominator)
+    return from_machine_number(value)
+
+
+def from_number_list(values):
+    "Returns a List of values, or None if a machine number is not normal."
+
+    for value in values:
+        if not isinstance(value, Fraction) and not is_normal(value):
+            return None
+    return Expression('List', *[from_number(value) for value in values])
+
+
+def from_number_matrix(rows):
+    rows = [from_number_list(row) for row in rows]
+    if any(row is None for row in rows):
+        return None
+    return Expression('List', *rows)
+
+
+def integer_rows(rows):
+    """
+    Scales every row of Fractions to integers. Returns the new rows and
+    the product of the scale factors.
+    """
+
+    result = []
+    product = 1
+    for row in rows:
+        scale = 1
+        for value in row:
+            scale = scale * value.denominator // gcd(scale, value.denominator)
+        result.append([int(value * scale) for value in row])
+        product *= scale
+    return result, product
+
+
+def bareiss_det(rows):
+    """
+    Returns the determinant of the square integer matrix rows, computed
+    by fraction-free Bareiss elimination; rows is modified.
+    """
+
+    n = len(rows)
+    sign = 1
+    previous = 1
+    for k in range(n - 1):
+        if rows[k][k] == 0:
+            for i in range(k + 1, n):
+                if rows[i][k] != 0:
+                    rows[k], rows[i] = rows[i], rows[k]
+                    sign = -sign
+                    break
+            else:
+                return 0
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        for row in rows[k + 1:]:
+            factor = row[k]
+            for j in range(k + 1, n):
+                row[j] = (pivot * row[j] - factor * pivot_row[j]) // previous
+        previous = pivot
+    return sign * rows[n - 1][n - 1]
+
+
+def bareiss_solve(rows, n):
+    """
+    Solves the system given by the integer matrix rows, whose first n
+    columns are a square matrix and whose other columns are right-hand
+    sides, by fraction-free Gauss-Jordan elimination. Returns the rows of
+    the solutions as Fractions, or None if the matrix is singular; rows
+    is modified.
+    """
+
+    columns = len(rows[0])
+    previous = 1
+    for k in range(n):
+        if rows[k][k] == 0:
+            for i in range(k + 1, n):
+                if rows[i][k] != 0:
+                    rows[k], rows[i] = rows[i], rows[k]
+                    break
+            else:
+                return None
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        for i, row in enumerate(rows):
+            if i == k:
+                continue
+            factor = row[k]
+            for j in range(k + 1, columns):
+                row[j] = (pivot * row[j] - factor * pivot_row[j]) // previous
+            row[k] = 0
+            if i < k:
+                # the diagonal of eliminated rows is the current pivot
+                row[i] = pivot
+        previous = pivot
+    return [[Fraction(value, previous) for value in row[n:]] for row in rows]
+
+
+def pivot_tolerance(rows, n):
+    """
+    Returns the magnitude up to which a pivot in the first n columns of
+    rows counts as zero, relative to the largest entry there.
+    """
+
+    largest = max(abs(value) for row in rows for value in row[:n])
+    return sys.float_info.epsilon * n * largest
+
+
+def machine_det(rows):
+    """
+    Returns the determinant of the square matrix rows of machine numbers,
+    computed by LU decomposition with partial pivoting, or None if the
+    matrix is numerically singular or an intermediate result is not
+    normal; rows is modified.
+    """
+
+    n = len(rows)
+    tolerance = pivot_tolerance(rows, n)
+    det = 1.0
+    for k in range(n):
+        index = max(range(k, n), key=lambda i: abs(rows[i][k]))
+        if abs(rows[index][k]) <= tolerance:
+            return None
+        if index != k:
+            rows[k], rows[index] = rows[index], rows[k]
+            det = -det
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        det *= pivot
+        if det == 0 or not is_normal(det):
+            return None
+        for row in rows[k + 1:]:
+            factor = row[k] / pivot
+            if factor:
+                for j in range(k + 1, n):
+                    row[j] -= factor * pivot_row[j]
+                if not all(is_normal(value) for value in row[k + 1:n]):
+                    return None
+    return det
+
+
+def machine_solve(rows, n):
+    """
+    Like bareiss_solve, for a matrix of machine numbers: uses Gauss-Jordan
+    elimination with partial pivoting. Pivots within pivot_tolerance
+    count as zero, and intermediate results that are not normal give
+    None.
+    """
+
+    columns = len(rows[0])
+    tolerance = pivot_tolerance(rows, n)
+    for k in range(n):
+        index = max(range(k, n), key=lambda i: abs(rows[i][k]))
+        if abs(rows[index][k]) <= tolerance:
+            return None
+        rows[k], rows[index] = rows[index], rows[k]
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        for j in range(k, columns):
+            pivot_row[j] /= pivot
+        if not all(is_normal(value) for value in pivot_row[k:]):
+            return None
+        for i, row in enumerate(rows):
+            factor = row[k]
+            if i != k and factor:
+                for j in range(k, columns):
+                    row[j] -= factor * pivot_row[j]
+                if not all(is_normal(value) for value in row[k:]):
+                    return None
+    return [row[n:] for row in rows]
+
+
+def solve_numbers(rows, n):
+    "Calls bareiss_solve or machine_solve."
+
+    if is_exact(rows):
+        return bareiss_solve(integer_rows(rows)[0], n)
+    return machine_solve(rows, n)
+
+
+def hessenberg(a, n):
+    """
+    Reduces the real matrix a, indexed from 1 to n, to upper Hessenberg
+    form by elimination with pivoting (elmhes in Numerical Recipes).
+    """
+
+    for m in range(2, n):
+        x = 0.0
+        i = m
+        for j in range(m, n + 1):
+            if abs(a[j][m - 1]) > abs(x):
+                x = a[j][m - 1]
+                i = j
+        if i != m:
+            a[i], a[m] = a[m], a[i]
+            a[i][:m - 1], a[m][:m - 1] = a[m][:m - 1], a[i][:m - 1]
+            for j in range(1, n + 1):
+                a[j][i], a[j][m] = a[j][m], a[j][i]
+        if x:
+            for i in range(m + 1, n + 1):
+                y = a[i][m - 1]
+                if y:
+                    y /= x
+                    a[i][m - 1] = y
+                    row_m, row_i = a[m], a[i]
+                    for j in range(m, n + 1):
+                        row_i[j] -= y * row_m[j]
+                    for j in range(1, n + 1):
+                        a[j][m] += y * a[j][i]
+    for i in range(3, n + 1):
+        for j in range(1, i - 1):
+            a[i][j] = 0.0
+
+
+def hessenberg_eigenvalues(a, n):
+    """
+    Returns the eigenvalues of the upper Hessenberg matrix a, indexed from
+    1 to n, computed by the shifted QR algorithm (hqr in Numerical
+    Recipes), or None if it does not converge; a is destroyed.
+    """
+
+    def sign(x, y):
+        return abs(x) if y >= 0 else -abs(x)
+
+    values = []
+    norm = 0.0
+    for i in range(1, n + 1):
+        for j in range(max(i - 1, 1), n + 1):
+            norm += abs(a[i][j])
+    nn = n
+    t = 0.0
+    x = y = w = 0.0
+    while nn >= 1:
+        its = 0
+        while True:
+            l = nn
+            while l >= 2:
+                s = abs(a[l - 1][l - 1]) + abs(a[l][l])
+                if s == 0.0:
+                    s = norm
+                if abs(a[l][l - 1]) + s == s:
+                    a[l][l - 1] = 0.0
+                    break
+                l -= 1
+            x = a[nn][nn]
+            if l == nn:
+                values.append(x + t)
+                nn -= 1
+            else:
+                y = a[nn - 1][nn - 1]
+                w = a[nn][nn - 1] * a[nn - 1][nn]
+                if l == nn - 1:
+                    p = 0.5 * (y - x)
+                    q = p * p + w
+                    z = math.sqrt(abs(q))
+                    x += t
+                    if q >= 0.0:
+                        z = p + sign(z, p)
+                        values.append(x + z)
+                        values.append(x - w / z if z else x + z)
+                    else:
+                        values.append(complex(x + p, z))
+                        values.append(complex(x + p, -z))
+                    nn -= 2
+                else:
+                    if its == 30:
+                        return None
+                    if its == 10 or its == 20:
+                        t += x
+                        for i in range(1, nn + 1):
+                            a[i][i] -= x
+                        s = abs(a[nn][nn - 1]) + abs(a[nn - 1][nn - 2])
+                        y = x = 0.75 * s
+                        w = -0.4375 * s * s
+                    its += 1
+                    m = nn - 2
+                    while m >= l:
+                        z = a[m][m]
+                        r = x - z
+                        s = y - z
+                        p = (r * s - w) / a[m + 1][m] + a[m][m + 1]
+                        q = a[m + 1][m + 1] - z - r - s
+                        r = a[m + 2][m + 1]
+                        s = abs(p) + abs(q) + abs(r)
+                        p /= s
+                        q /= s
+                        r /= s
+                        if m == l:
+                            break
+                        u = abs(a[m][m - 1]) * (abs(q) + abs(r))
+                        v = abs(p) * (abs(a[m - 1][m - 1]) + abs(z) +
+                                      abs(a[m + 1][m + 1]))
+                        if u + v == v:
+                            break
+                        m -= 1
+                    for i in range(m + 2, nn + 1):
+                        a[i][i - 2] = 0.0
+                        if i != m + 2:
+                            a[i][i - 3] = 0.0
+                    for k in range(m, nn):
+                        if k != m:
+                            p = a[k][k - 1]
+                            q = a[k + 1][k - 1]
+                            r = 0.0
+                            if k != nn - 1:
+                                r = a[k + 2][k - 1]
+                            x = abs(p) + abs(q) + abs(r)
+                            if x != 0.0:
+                                p /= x
+                                q /= x
+                                r /= x
+                        s = sign(math.sqrt(p * p + q * q + r * r), p)
+                        if s != 0.0:
+                            if k == m:
+                                if l != m:
+                                    a[k][k - 1] = -a[k][k - 1]
+                            else:
+                                a[k][k - 1] = -s * x
+                            p += s
+                            x = p / s
+                            y = q / s
+                            z = r / s
+                            q /= p
+                            r /= p
+                            for j in range(k, nn + 1):
+                                p = a[k][j] + q * a[k + 1][j]
+                                if k != nn - 1:
+                                    p += r * a[k + 2][j]
+                                    a[k + 2][j] -= p * z
+                                a[k + 1][j] -= p * y
+                                a[k][j] -= p * x
+                            for i in range(l, min(nn, k + 3) + 1):
+                                p = x * a[i][k] + y * a[i][k + 1]
+                                if k != nn - 1:
+                                    p += z * a[i][k + 2]
+                                    a[i][k + 2] -= p * r
+                                a[i][k + 1] -= p * q
+                                a[i][k] -= p
+            if l >= nn - 1:
+                break
+    return values
+
+
+def machine_eigenvalues(rows):
+    """
+    Returns the eigenvalues of the real square matrix rows, or None if
+    they cannot be computed with machine numbers.
+    """
+
+    n = len(rows)
+    if any(isinstance(value, complex) for row in rows for value in row):
+        return None
+    # scaling the largest entry to about 1 by a power of two keeps the
+    # squares of entries from underflowing or overflowing
+    largest = max(abs(value) for row in rows for value in row)
+    exponent = math.frexp(largest)[1] if largest else 0
+    a = [[0.0] * (n + 1)] + [[0.0] + [math.ldexp(value, -exponent)
+                                      for value in row] for row in rows]
+    hessenberg(a, n)
+    values = hessenberg_eigenvalues(a, n)
+    if values is None:
+        return None
+    scale = math.ldexp(1.0, exponent)
+    return [value * scale for value in values]
+
+
 class Det(Builtin):
     u"""
     <dl>
@@ -41,11 +514,46 @@ class Det(Builtin):
     Symbolic determinant:
     >> Det[{{a, b, c}, {d, e, f}, {g, h, i}}]
      = a e i - a f h - b d i + b f g + c d h - c e g
+
+    #> Det[{{1., 2.}, {3., 4.}}]
+     = -2.
+
+    Numerical determinants of machine-precision matrices are computed
+    with hardware floating point, and keep only the digits of its results
+    that are free of rounding errors:
+    >> Det[{{1., 2.}, {3., 4.}} / 3]
+     = -0.222222222222222
+    >> -2. / 9
+     = -0.222222222222222222
+
+    Matrices with numbers beyond the range of hardware floating point are
+    computed with arbitrary precision:
+    #> Det[{{1.*^-200, 0.}, {0., 1.*^-200}}]
+     = 1.*^-400
+    #> Det[{{1.*^200, 0.}, {0., 1.*^200}}]
+     = 1.*^400
+    #> Det[{{1.*^-320, 0.}, {0., 1.}}]
+     = 1.*^-320
+    #> Det[N[{{1, 2, 3}, {4, 5, 6}, {7, 8, 9}}]]
+     = 0
+    #> Det[{{1/2, 3}, {2, 7/3}}]
+     = -29 / 6
     """
 
     def apply(self, m, evaluation):
         'Det[m_]'
 
+        rows = number_matrix(m)
+        if is_square(rows):
+            if is_exact(rows):
+                rows, scale = integer_rows(rows)
+                return from_number(Fraction(bareiss_det(rows), scale))
+            det = machine_det(rows)
+            if det is not None:
+                det = from_number_list([det])
+                if det is not None:
+                    return det.leaves[0]
+
         matrix = to_sympy_matrix(m)
         if matrix is None or matrix.cols != matrix.rows or matrix.cols == 0:
             return evaluation.message('Det', 'matsq', m)
@@ -68,6 +576,17 @@ class Inverse(Builtin):
 
     >> Inverse[{{1, 0, 0}, {0, Sqrt[3]/2, 1/2}, {0,-1 / 2, Sqrt[3]/2}}]
     = {{1, 0, 0}, {0, Sqrt[3] / 2, -1 / 2}, {0, 1 / 2, Sqrt[3] / 2}}
+
+    #> Inverse[{{1., 2.}, {3., 4.}}]
+     = {{-2., 1.}, {1.5, -0.5}}
+    #> Inverse[{{1., 2.}, {2., 4.}}]
+     : The matrix {{1., 2.}, {2., 4.}} is singular.
+     = Inverse[{{1., 2.}, {2., 4.}}]
+    #> Inverse[{{3., 0}, {0, 7.}}]
+     = {{0.333333333333333, 0.}, {0., 0.142857142857143}}
+    #> Inverse[N[{{1, 2, 3}, {4, 5, 6}, {7, 8, 9}}]]
+     : The matrix {{1., 2., 3.}, {4., 5., 6.}, {7., 8., 9.}} is singular.
+     = Inverse[{{1., 2., 3.}, {4., 5., 6.}, {7., 8., 9.}}]
     """
 
     messages = {
@@ -77,6 +596,22 @@ class Inverse(Builtin):
     def apply(self, m, evaluation):
         'Inverse[m_]'
 
+        rows = number_matrix(m)
+        if is_square(rows):
+            n = len(rows)
+            one, zero = (Fraction(1), Fraction(0)) if is_exact(rows) else (
+                1.0, 0.0)
+            system = [row + [one if i == j else zero for j in range(n)]
+                      for i, row in enumerate(rows)]
+            inverse = solve_numbers(system, n)
+            if inverse is None:
+                if is_exact(rows):
+                    return evaluation.message('Inverse', 'sing', m)
+            else:
+                inverse = from_number_matrix(inverse)
+                if inverse is not None:
+                    return inverse
+
         matrix = to_sympy_matrix(m)
         if matrix is None or matrix.cols != matrix.rows or matrix.cols == 0:
             return evaluation.message('Inverse', 'matsq', m)
@@ -105,6 +640,13 @@ class LinearSolve(Builtin):
     >> LinearSolve[{{1, 2, 3}, {4, 5, 6}, {7, 8, 9}}, {1, -2, 3}]
      : Linear equation encountered that has no solution.
      = LinearSolve[{{1, 2, 3}, {4, 5, 6}, {7, 8, 9}}, {1, -2, 3}]
+
+    #> LinearSolve[{{1., 2.}, {3., 4.}}, {1, 1}]
+     = {-1., 1.}
+    #> LinearSolve[{{3., 1.}, {1., 2.}}, {1, 0}]
+     = {0.4, -0.2}
+    #> LinearSolve[N[{{1, 2, 3}, {4, 5, 6}, {7, 8, 9}}], {1, 1, 1}]
+     = {-1., 1., 0}
     """
 
     messages = {
@@ -123,6 +665,17 @@ class LinearSolve(Builtin):
             return
         if len(b.leaves) != len(matrix):
             return evaluation.message('LinearSolve', 'lslc')
+
+        rows = number_matrix(Expression(
+            'List', *[Expression('List', *(row.leaves + [value]))
+                      for row, value in zip(m.leaves, b.leaves)]))
+        if rows is not None and len(rows[0]) == len(rows) + 1:
+            solution = solve_numbers(rows, len(rows))
+            if solution is not None:
+                solution = from_number_list([row[0] for row in solution])
+                if solution is not None:
+                    return solution
+
         system = [mm + [v] for mm, v in zip(matrix, b.leaves)]
         system = to_sympy_matrix(system)
         if system is None:
@@ -242,11 +795,34 @@ class Eigenvalues(Builtin):
 
     >> Eigenvalues[{{7, 1}, {-4, 3}}]
      = {5, 5}
+
+    #> Eigenvalues[{{2., 1.}, {1., 2.}}]
+     = {3., 1.}
+    #> Eigenvalues[{{0., 1.}, {-1., 0.}}]
+     = {0. + 1. I, 0. - 1. I}
+    #> Eigenvalues[{{5., 2.}, {2., 2.}}]
+     = {6., 1.}
+    #> Eigenvalues[N[{{1, 2}, {2, 3}}]]
+     = {4.23606797749979, -0.23606797749979}
+    #> Eigenvalues[{{1.*^-170, 1.*^-170}, {1.*^-170, 1.*^-170}}]
+     = {2.*^-170, 0.}
+    #> Eigenvalues[{{1.*^170, 1.*^170}, {1.*^170, 1.*^170}}]
+     = {2.*^170, 0.}
     """
 
     def apply(self, m, evaluation):
         'Eigenvalues[m_]'
 
+        rows = number_matrix(m)
+        if is_square(rows) and not is_exact(rows):
+            eigenvalues = machine_eigenvalues(rows)
+            if eigenvalues is not None:
+                eigenvalues.sort(key=lambda v: (abs(v), -v.real, v.imag),
+                                 reverse=True)
+                eigenvalues = from_number_list(eigenvalues)
+                if eigenvalues is not None:
+                    return eigenvalues
+
         matrix = to_sympy_matrix(m)
         if matrix is None or matrix.cols != matrix.rows or matrix.cols == 0:
             return evaluation.message('Eigenvalues', 'matsq', m)
@@ -7,14 +7,18 @@ List functions
 from mathics.builtin.base import (
     Builtin, Test, InvalidLevelspecError,
     PartError, PartDepthError, PartRangeError, Predefined, SympyFunction)
-from mathics.builtin.scoping import dynamic_scoping
-from mathics.core.expression import Expression, String, Symbol, Integer, Number
+from mathics.builtin.scoping import dynamic_scoping, IteratorScope
+from mathics.core.expression import (
+    Expression, String, Symbol, Integer, Rational, Number)
 from mathics.core.evaluation import BreakInterrupt, ContinueInterrupt
 from mathics.core.rules import Pattern
 from mathics.core.convert import from_sympy
 from mathics.builtin.algebra import cancel
 
 import sympy
+import math
+import operator
+from fractions import Fraction
 
 
 class List(Builtin):
@@ -233,6 +237,63 @@ def set_part(list, indices, new):
     rec(list, indices)
 
 
+def find_part(expr, indices, evaluation):
+    """
+    Returns the part of expr at the Python integers indices and the
+    expression containing it. Returns (None, None) after a message if
+    there is no such part.
+    """
+
+    parent = None
+    for index in indices:
+        if expr.is_atom():
+            evaluation.message('Part', 'partd')
+            return None, None
+        try:
+            if index > 0:
+                part = expr.leaves[index - 1]
+            elif index == 0:
+                part = expr.head
+            else:
+                part = expr.leaves[index]
+        except IndexError:
+            evaluation.message('Part', 'partw', index, expr)
+            return None, None
+        parent, expr = expr, part
+    return expr, parent
+
+
+def set_part_in_place(expr, indices, new, evaluation):
+    """
+    Assigns new to the part of expr at the Python integers indices like
+    walk_parts: a list of the same length as the part is assigned leaf by
+    leaf. expr is changed in place, so it must not be shared with other
+    expressions; parts of new are copied for the same reason. Returns
+    False after a message if there is no such part.
+    """
+
+    def assign(parent, index, part, new):
+        if (part.is_atom() or not new.has_form('List', None) or
+                len(part.leaves) != len(new.leaves)):
+            new = new.copy()
+            if index > 0:
+                parent.leaves[index - 1] = new
+            elif index == 0:
+                parent.head = new
+            else:
+                parent.leaves[index] = new
+        else:
+            for index, (leaf, new_leaf) in enumerate(zip(part.leaves,
+                                                         new.leaves)):
+                assign(part, index + 1, leaf, new_leaf)
+
+    part, parent = find_part(expr, indices, evaluation)
+    if part is None:
+        return False
+    assign(parent, indices[-1], part, new)
+    return True
+
+
 def walk_parts(list_of_list, indices, evaluation, assign_list=None):
     list = list_of_list[0]
 
@@ -650,6 +711,18 @@ class Part(Builtin):
 
     #> a = {2,3,4}; i = 1; a[[i]] = 0; a
      = {0, 3, 4}
+
+    #> a = Table[0, {5}]; Do[a[[i]] = i^2, {i, 5}]; a
+     = {1, 4, 9, 16, 25}
+    #> b = (a = {1, 2, 3}); c = a; a[[1]] = x; {a, b, c}
+     = {{x, 2, 3}, {1, 2, 3}, {1, 2, 3}}
+    #> a = {{1, 2}, {3, 4}}; v = {0, 0}; a[[1]] = v; a[[1, 1]] = 5; {a, v}
+     = {{{5, 0}, {3, 4}}, {0, 0}}
+    #> a = {1, 2}; o = OwnValues[a]; a[[1]] = 3; {a, o}
+     = {{3, 2}, {HoldPattern[a] :> {1, 2}}}
+    #> a = {1, 2}; a[[3]] = 0
+     : Part 3 of {1, 2} does not exist.
+     = 0
     """
 
     attributes = ('NHoldRest', 'ReadProtected')
@@ -673,6 +746,11 @@ class Part(Builtin):
 
         indices = i.get_sequence()
 
+        if indices and all(isinstance(index, Integer) for index in indices):
+            part, parent = find_part(
+                list, [index.value for index in indices], evaluation)
+            return part
+
         result = walk_parts([list], indices, evaluation)
         if result:
             return result
@@ -1227,6 +1305,8 @@ class Range(Builtin):
         imin = imin.value
         imax = imax.value
         di = di.value
+        if di > 0 and imax >= imin:
+            evaluation.check_memory(int((imax - imin) / di) + 1)
         index = imin
         result = []
         while index <= imax:
@@ -1236,6 +1316,70 @@ class Range(Builtin):
         return Expression('List', *result)
 
 
+def get_iteration_count(imin, imax, di):
+    "Returns how often an iterator from imin to imax in steps di runs."
+
+    imin = imin.get_real_value()
+    imax = imax.get_real_value()
+    di = di.get_real_value()
+    if imin is None or imax is None or not di or (imax - imin) / di < 0:
+        return None
+    return int((imax - imin) / di) + 1
+
+
+def to_fraction(expr):
+    "Returns the value of an Integer or Rational as a Fraction, or None."
+
+    if isinstance(expr, Integer):
+        return Fraction(expr.value)
+    if isinstance(expr, Rational):
+        return Fraction(int(expr.value.p), int(expr.value.q))
+    return None
+
+
+def exact_iterator_values(imin, imax, di):
+    """
+    Returns a generator of the values from imin to imax in steps di if
+    these are Integers or Rationals and di is positive, or else None.
+    """
+
+    imin, imax, di = [to_fraction(value) for value in (imin, imax, di)]
+    if imin is None or imax is None or di is None or di <= 0:
+        return None
+
+    def values(index):
+        while index <= imax:
+            if index.denominator == 1:
+                yield Integer(index.numerator)
+            else:
+                yield Rational(index.numerator, index.denominator)
+            index += di
+
+    return values(imin)
+
+
+def get_iterator_count(spec, evaluation):
+    """
+    Returns how often the iterator spec runs, if this is known without
+    evaluating anything but numeric bounds.
+    """
+
+    if spec.has_form('List', 2) and spec.leaves[1].has_form('List', None):
+        return len(spec.leaves[1].leaves)
+    if spec.has_form('List', 1):
+        bounds = [Integer(1), spec.leaves[0], Integer(1)]
+    elif spec.has_form('List', 2, 3, 4):
+        bounds = (spec.leaves[1:] + [Integer(1), Integer(1)])[:3]
+        if len(spec.leaves) == 2:
+            bounds = [Integer(1)] + bounds[:2]
+    else:
+        return None
+    if not all(bound.is_atom() or bound.is_numeric() for bound in bounds):
+        return None
+    return get_iteration_count(
+        *[bound.evaluate(evaluation) for bound in bounds])
+
+
 class _IterationFunction(Builtin):
     """
     >> Sum[k, {k, Range[5]}]
@@ -1250,10 +1394,18 @@ class _IterationFunction(Builtin):
 
     allow_loopcontrol = False
     throw_iterb = True
+    # whether get_result needs the values of all iterations
+    keep_results = True
 
     def get_result(self, items):
         pass
 
+    def reserve(self, count, evaluation):
+        "Checks that the results of count iterations fit into memory."
+
+        if self.keep_results and count:
+            evaluation.check_memory(count)
+
     def apply_range(self, expr, i, imax, evaluation):
         '%(name)s[expr_, {i_Symbol, imax_}]'
 
@@ -1273,11 +1425,15 @@ class _IterationFunction(Builtin):
             if self.throw_iterb:
                 evaluation.message(self.get_name(), 'iterb')
             return
+        if imax > 0:
+            self.reserve(int(math.ceil(imax)), evaluation)
         result = []
         while index < imax:
             evaluation.check_stopped()
             try:
-                result.append(expr.evaluate(evaluation))
+                item = expr.evaluate(evaluation)
+                if self.keep_results:
+                    result.append(item)
             except ContinueInterrupt:
                 if self.allow_loopcontrol:
                     pass
@@ -1311,6 +1467,11 @@ class _IterationFunction(Builtin):
         imax = imax.evaluate(evaluation)
         di = di.evaluate(evaluation)
 
+        self.reserve(get_iteration_count(index, imax, di), evaluation)
+        values = exact_iterator_values(index, imax, di)
+        if values is not None:
+            return self.iterate(expr, i, values, evaluation)
+
         result = []
         while True:
             cont = Expression('LessEqual', index, imax).evaluate(evaluation)
@@ -1325,7 +1486,8 @@ class _IterationFunction(Builtin):
             try:
                 item = dynamic_scoping(
                     expr.evaluate, {i.name: index}, evaluation)
-                result.append(item)
+                if self.keep_results:
+                    result.append(item)
             except ContinueInterrupt:
                 if self.allow_loopcontrol:
                     pass
@@ -1343,29 +1505,41 @@ class _IterationFunction(Builtin):
         '%(name)s[expr_, {i_Symbol, {items___}}]'
 
         items = items.evaluate(evaluation).get_sequence()
+        return self.iterate(expr, i, items, evaluation)
+
+    def iterate(self, expr, i, values, evaluation):
+        "Evaluates expr with i set to each of values in turn."
+
         result = []
-        for item in items:
-            evaluation.check_stopped()
-            try:
-                item = dynamic_scoping(
-                    expr.evaluate, {i.name: item}, evaluation)
-                result.append(item)
-            except ContinueInterrupt:
-                if self.allow_loopcontrol:
-                    pass
-                else:
-                    raise
-            except BreakInterrupt:
-                if self.allow_loopcontrol:
-                    break
-                else:
-                    raise
+        with IteratorScope(i.name, evaluation) as scope:
+            for value in values:
+                evaluation.check_stopped()
+                scope.bind(value)
+                try:
+                    item = expr.evaluate(evaluation)
+                    if self.keep_results:
+                        result.append(item)
+                except ContinueInterrupt:
+                    if self.allow_loopcontrol:
+                        pass
+                    else:
+                        raise
+                except BreakInterrupt:
+                    if self.allow_loopcontrol:
+                        break
+                    else:
+                        raise
         return self.get_result(result)
 
     def apply_multi(self, expr, first, sequ, evaluation):
         '%(name)s[expr_, first_, sequ__]'
 
         sequ = sequ.get_sequence()
+        counts = [get_iterator_count(spec, evaluation)
+                  for spec in [first] + sequ]
+        self.reserve(
+            reduce(operator.mul, (count for count in counts if count), 1),
+            evaluation)
         name = self.get_name()
         return Expression(name, Expression(name, expr, *sequ), first)
 
@@ -1440,6 +1614,9 @@ class Array(Builtin):
             origins[index] = value
 
         dims = zip(dims, origins)
+        evaluation.check_memory(
+            reduce(operator.mul, (count for count, origin in dims), 1) *
+            (len(dims) + 1))
 
         def rec(rest_dims, current):
             evaluation.check_stopped()
@@ -1481,6 +1658,20 @@ class Table(_IterationFunction):
      = {0}
     #> Table[x, {x, -0.2, 3.9}]
      = {-0.2, 0.8, 1.8, 2.8, 3.8}
+    #> Table[x, {x, 1/2, 2, 1/2}]
+     = {1 / 2, 1, 3 / 2, 2}
+    #> Table[x, {x, 3, 1, -1}]
+     = {}
+    #> x = 7; {Table[x, {x, 3}], x}
+     = {{1, 2, 3}, 7}
+    #> Table[x = 0; x, {x, 3}]
+     = {0, 0, 0}
+    #> Table[a = Attributes[x]; SetAttributes[x, Flat]; a, {x, {1, 2}}]
+     = {{}, {}}
+    #> Attributes[x]
+     = {}
+    #> Table[Table[x, {x, 2}], {x, 3}]
+     = {{1, 2}, {1, 2}, {1, 2}}
     """
 
     def get_result(self, items):
@@ -1651,6 +1842,7 @@ class Tuples(Builtin):
             evaluation.message('Tuples', 'intnn')
             return
         items = expr.leaves
+        evaluation.check_memory(len(items) ** n * (n + 1))
 
         def iterate(n_rest):
             evaluation.check_stopped()
@@ -1675,6 +1867,9 @@ class Tuples(Builtin):
                 evaluation.message('Tuples', 'normal')
                 return
             items.append(expr.leaves)
+        evaluation.check_memory(
+            reduce(operator.mul, (len(leaves) for leaves in items), 1) *
+            (len(items) + 1))
 
         return Expression('List', *(Expression('List', *leaves)
                                     for leaves in get_tuples(items)))
@@ -7,13 +7,19 @@ Plotting
 from math import sin, cos, pi, sqrt, isnan, isinf
 import numbers
 import itertools
+import cPickle as pickle
+import multiprocessing
 
+from mathics import settings
 from mathics.core.expression import (Expression, Real, NumberError, Symbol,
                                      String, from_python)
+from mathics.core.definitions import Definitions
+from mathics.core.evaluation import Evaluation
 from mathics.builtin.base import Builtin
 from mathics.builtin.scoping import dynamic_scoping
 from mathics.builtin.options import options_to_rules
 from mathics.builtin.numeric import chop
+from mathics.builtin.compilation import compile_expression, CompileError
 
 
 class ColorDataFunction(Builtin):
@@ -85,16 +91,24 @@ def extract_pyreal(value):
 def quiet_evaluate(expr, vars, evaluation, expect_list=False):
     """ Evaluates expr with given dynamic scoping values
     without producing arithmetic error messages. """
+    value = quiet_evaluate_expression(expr, vars, evaluation)
+    return extract_plot_value(value, expect_list)
+
+
+def quiet_evaluate_expression(expr, vars, evaluation):
     expr = Expression('N', expr)
     quiet_expr = Expression('Quiet', expr, Expression(
         'List', Expression('MessageName', Symbol('Power'), String('infy'))))
-    value = dynamic_scoping(quiet_expr.evaluate, vars, evaluation)
+    return dynamic_scoping(quiet_expr.evaluate, vars, evaluation)
+
+
+def extract_plot_value(value, expect_list=False):
     if expect_list:
         if value.has_form('List', None):
-            value = (extract_pyreal(item) for item in value.leaves)
+            value = [extract_pyreal(item) for item in value.leaves]
             if any(item is None for item in value):
                 return None
-            return list(value)  # force generator evaluation
+            return value
         else:
             return None
     else:
@@ -104,6 +118,267 @@ def quiet_evaluate(expr, vars, evaluation, expect_list=False):
         return value
 
 
+def extract_machine_real(value):
+    if isinstance(value, bool) or not isinstance(value, (float, int, long)):
+        return None
+    if isinf(value) or isnan(value):
+        return None
+    if -1e-10 < value < 1e-10:
+        # as chop does
+        return 0.0
+    return float(value)
+
+
+def get_quiet_function(expr, names, evaluation, expect_list=False):
+    """ Returns a function of the values of the variables names that
+    returns what quiet_evaluate returns for expr. expr is compiled if
+    possible; points at which the compiled code fails are left to
+    quiet_evaluate. """
+
+    def evaluate(*values):
+        vars = dict((name, Real(value)) for name, value in zip(names, values))
+        return quiet_evaluate(expr, vars, evaluation, expect_list)
+
+    try:
+        compiled = compile_expression(expr, names, evaluation.definitions)
+    except CompileError:
+        return evaluate
+
+    def compiled_evaluate(*values):
+        try:
+            value = compiled(*values)
+        except (ValueError, ZeroDivisionError, OverflowError, TypeError):
+            return evaluate(*values)
+        return extract_machine_value(value, expect_list)
+
+    return compiled_evaluate
+
+
+def extract_machine_value(value, expect_list=False):
+    if expect_list:
+        if not isinstance(value, list):
+            return None
+        value = [extract_machine_real(item) for item in value]
+        if any(item is None for item in value):
+            return None
+        return value
+    return extract_machine_real(value)
+
+
+def is_listable(expr, names, definitions):
+    """ Tests whether evaluating expr for lists of values of the variables
+    names gives the lists of the values of expr, because every function in
+    it is Listable. """
+
+    if expr.is_atom():
+        name = expr.get_name()
+        return (not name or name in names or
+                not definitions.get_ownvalues(name) or
+                'System`Constant' in definitions.get_attributes(name))
+    head = expr.get_head_name()
+    if (not head or head in definitions.user or
+            'System`Listable' not in definitions.get_attributes(head)):
+        return False
+    return all(is_listable(leaf, names, definitions) for leaf in expr.leaves)
+
+
+def get_quiet_batch_function(expr, names, evaluation, expect_list=False,
+                             parallel=False):
+    """ Returns a function that maps a list of points to the list of what
+    quiet_evaluate returns for expr at these points, where points are
+    values of the variable for a single name and tuples of values of the
+    variables names otherwise. Whole lists are evaluated at once by
+    compiled code or, for expressions of Listable functions, by a single
+    evaluation on lists. If parallel is True, expressions that cannot be
+    compiled are evaluated by the processes of sampling_pool. """
+
+    function = get_quiet_function(expr, names, evaluation, expect_list)
+    try:
+        compiled = compile_expression(
+            expr, names, evaluation.definitions, vectorize=True)
+    except CompileError:
+        compiled = None
+    listable = (compiled is None and not expect_list and
+                is_listable(expr, names, evaluation.definitions))
+
+    def evaluate(points):
+        if compiled is not None:
+            try:
+                results = compiled(points)
+            except (ValueError, ZeroDivisionError, OverflowError, TypeError):
+                # find the points that need the evaluator one by one
+                pass
+            else:
+                return [extract_machine_value(result, expect_list)
+                        for result in results]
+        elif listable and points:
+            if len(names) == 1:
+                columns = [points]
+            else:
+                columns = zip(*points)
+            vars = dict((name, Expression('List', *[Real(value)
+                                                    for value in column]))
+                        for name, column in zip(names, columns))
+            results = quiet_evaluate_expression(expr, vars, evaluation)
+            if results.has_form('List', len(points)):
+                return [extract_plot_value(result)
+                        for result in results.leaves]
+        if len(names) == 1:
+            return [function(point) for point in points]
+        return [function(*point) for point in points]
+
+    if parallel and compiled is None:
+        user_definitions = pickle.dumps(
+            evaluation.definitions.user, pickle.HIGHEST_PROTOCOL)
+
+        def parallel_evaluate(points):
+            if len(points) > parallel_chunk_size:
+                results = sampling_pool.evaluate(
+                    user_definitions, expr, names, points, expect_list,
+                    evaluation)
+                if results is not None:
+                    return results
+            return evaluate(points)
+
+        return parallel_evaluate
+    return evaluate
+
+
+# number of points evaluated by each task of parallel sampling. It does
+# not depend on the number of processes, so that the same points are
+# evaluated in the same way whatever the number of processes.
+parallel_chunk_size = 16
+
+
+def sample_chunk(task):
+    "Evaluates a chunk of points in a process of sampling_pool."
+
+    user_definitions, deadline, expr, names, points, expect_list = task
+    definitions = sampling_pool.get_worker_definitions(user_definitions)
+    evaluation = Evaluation(definitions=definitions)
+    evaluation.deadline = deadline
+    return get_quiet_batch_function(
+        expr, names, evaluation, expect_list)(points)
+
+
+class SamplingPool(object):
+    """ Processes that evaluate plotted functions at chunks of points in
+    parallel, for plots with Method -> "Parallel". They are forked when
+    first needed, with the builtin definitions of the plotting process,
+    and receive its user definitions with every task.
+
+    settings.PLOT_PROCESSES gives the number of processes (None for the
+    number of CPUs). Processes that cannot have children, such as the
+    evaluation workers of the web server, sample plots themselves. """
+
+    def __init__(self):
+        self.pool = None
+        self.processes = None
+        self.builtin = None
+        self.worker_definitions = (None, None)
+
+    def get_pool(self, definitions):
+        processes = settings.PLOT_PROCESSES or multiprocessing.cpu_count()
+        if self.pool is not None and (
+                self.processes != processes or
+                self.builtin is not definitions.builtin):
+            self.close()
+        if self.pool is None:
+            # the forked processes find the builtin definitions here
+            self.builtin = definitions.builtin
+            self.processes = processes
+            try:
+                self.pool = multiprocessing.Pool(processes)
+            except (AssertionError, OSError):
+                # e.g. daemonic processes are not allowed to have children
+                return None
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def get_worker_definitions(self, user_definitions):
+        # consecutive tasks mostly come from the same plot
+        if self.worker_definitions[0] != user_definitions:
+            definitions = Definitions()
+            definitions.builtin = self.builtin
+            definitions.user = pickle.loads(user_definitions)
+            self.worker_definitions = (user_definitions, definitions)
+        return self.worker_definitions[1]
+
+    def evaluate(self, user_definitions, expr, names, points, expect_list,
+                 evaluation):
+        """ Returns the values of expr at points, evaluated in chunks by
+        the processes, or None if there are no processes. """
+
+        pool = self.get_pool(evaluation.definitions)
+        if pool is None:
+            return None
+        tasks = [(user_definitions, evaluation.deadline, expr, names,
+                  points[start:start + parallel_chunk_size], expect_list)
+                 for start in range(0, len(points), parallel_chunk_size)]
+        results = pool.map_async(sample_chunk, tasks)
+        try:
+            while True:
+                try:
+                    chunks = results.get(0.1)
+                    break
+                except multiprocessing.TimeoutError:
+                    evaluation.check_stopped()
+        except BaseException:
+            # stop evaluating the remaining chunks
+            self.close()
+            raise
+        return [value for chunk in chunks for value in chunk]
+
+
+sampling_pool = SamplingPool()
+
+
+def is_parallel(method):
+    """ Tests whether the value of the Method option of a plot asks for
+    parallel sampling. """
+
+    if method.get_name() == 'System`Automatic':
+        return settings.PARALLEL_PLOT
+    return method.get_string_value() == 'Parallel'
+
+
+class PointCache(object):
+    """ Converts points of machine numbers to lists of Reals, creating
+    every coordinate and point only once, as vertices and mesh lines of
+    surfaces share them. """
+
+    def __init__(self):
+        self.reals = {}
+        self.points = {}
+
+    def real(self, value):
+        result = self.reals.get(value)
+        if result is None:
+            result = self.reals[value] = Real(value)
+        return result
+
+    def __call__(self, point):
+        result = self.points.get(point)
+        if result is None:
+            result = self.points[point] = Expression(
+                'List', *[self.real(value) for value in point])
+        return result
+
+
+def evaluated(expr):
+    """ Marks a graphics primitive built from machine numbers as
+    evaluated, so that evaluating and formatting the graphics does not go
+    through all its points again. """
+
+    expr.is_evaluated = True
+    return expr
+
+
 def zero_to_one(value):
     if value == 0:
         return 1
@@ -175,6 +450,7 @@ class _Plot(Builtin):
         'PlotRange': 'Automatic',
         'PlotPoints': 'None',
         'Exclusions': 'Automatic',
+        'Method': 'Automatic',
     })
 
     messages = {
@@ -263,6 +539,9 @@ class _Plot(Builtin):
         if not (isinstance(plotpoints, int) and plotpoints >= 2):
             return evaluation.message(self.get_name(), 'ppts', plotpoints)
 
+        # Method Option
+        parallel = is_parallel(self.get_option(options, 'Method', evaluation))
+
         # MaxRecursion Option
         max_recursion_limit = 15
         maxrecursion_option = self.get_option(
@@ -354,14 +633,14 @@ class _Plot(Builtin):
         mesh_points = []
         graphics = []           # list of resulting graphics primitives
         for index, f in enumerate(functions):
+            f = self.get_function(f, x_name, evaluation, parallel)
             points = []
             xvalues = []  # x value for each point in points
             tmp_mesh_points = []  # For this function only
             continuous = False
             d = (stop - start) / (plotpoints - 1)
-            for i in xrange(plotpoints):
-                x_value = start + i * d
-                point = self.eval_f(f, x_name, x_value, evaluation)
+            x_values = [start + i * d for i in xrange(plotpoints)]
+            for x_value, point in zip(x_values, self.eval_f(f, x_values)):
                 if point is not None:
                     if continuous:
                         points[-1].append(point)
@@ -418,14 +697,14 @@ class _Plot(Builtin):
             # Cos of the maximum angle between successive line segments
             ang_thresh = cos(pi / 180)
 
+            # In each round, both segments at every sharp corner are
+            # bisected, evaluating all the new points at once.
             for line, line_xvalues in zip(points, xvalues):
                 recursion_count = 0
-                smooth = False
-                while not smooth and recursion_count < maxrecursion:
+                while recursion_count < maxrecursion:
                     recursion_count += 1
-                    smooth = True
-                    i = 2
-                    while i < len(line):
+                    segments = set()
+                    for i in xrange(2, len(line)):
                         vec1 = (xscale * (line[i - 1][0] - line[i - 2][0]),
                                 yscale * (line[i - 1][1] - line[i - 2][1]))
                         vec2 = (xscale * (line[i][0] - line[i - 1][0]),
@@ -437,28 +716,30 @@ class _Plot(Builtin):
                         except ZeroDivisionError:
                             angle = 0.0
                         if abs(angle) < ang_thresh:
-                            smooth = False
-                            incr = 0
-
-                            x_value = 0.5 * (line_xvalues[i - 1] +
-                                             line_xvalues[i])
-
-                            point = self.eval_f(f, x_name, x_value, evaluation)
-                            if point is not None:
-                                line.insert(i, point)
-                                line_xvalues.insert(i, x_value)
-                                incr += 1
-
-                            x_value = 0.5 * (line_xvalues[i - 2] +
-                                             line_xvalues[i - 1])
-                            point = self.eval_f(f, x_name, x_value, evaluation)
-                            if point is not None:
-                                line.insert(i - 1, point)
-                                line_xvalues.insert(i - 1, x_value)
-                                incr += 1
-
-                            i += incr
-                        i += 1
+                            segments.add(i - 2)
+                            segments.add(i - 1)
+                    if not segments:
+                        break
+                    segments = sorted(segments)
+                    new_xvalues = [
+                        0.5 * (line_xvalues[i] + line_xvalues[i + 1])
+                        for i in segments]
+                    new_points = self.eval_f(f, new_xvalues)
+
+                    # merge the new points into the line
+                    merged_line = []
+                    merged_xvalues = []
+                    k = 0
+                    for i in xrange(len(line)):
+                        merged_line.append(line[i])
+                        merged_xvalues.append(line_xvalues[i])
+                        if k < len(segments) and segments[k] == i:
+                            if new_points[k] is not None:
+                                merged_line.append(new_points[k])
+                                merged_xvalues.append(new_xvalues[k])
+                            k += 1
+                    line[:] = merged_line
+                    line_xvalues[:] = merged_xvalues
 
             if exclusions == 'System`None':    # Join all the Lines
                 points = [[(xx, yy) for line in points for xx, yy in line]]
@@ -762,26 +1043,37 @@ class _Plot3D(Builtin):
             max_depth = 0
             evaluation.message(self.get_name(), 'invmaxrec', max_depth, 15)
 
+        # Method Option
+        parallel = is_parallel(self.get_option(options, 'Method', evaluation))
+
         ## Plot the functions
         graphics = []
         for indx, f in enumerate(functions):
             stored = {}
+            function = get_quiet_batch_function(
+                f, [x.get_name(), y.get_name()], evaluation,
+                parallel=parallel)
+
+            def eval_points(points):
+                # evaluates all points that are not stored yet at once
+                new_points = []
+                for point in points:
+                    if point not in stored:
+                        stored[point] = None
+                        new_points.append(point)
+                for point, value in zip(new_points, function(new_points)):
+                    if value is not None:
+                        stored[point] = float(value)
 
             def eval_f(x_value, y_value):
-                value = stored.get((x_value, y_value), False)
-                if value is False:
-                    value = quiet_evaluate(
-                        f, {x.get_name(): Real(x_value),
-                            y.get_name(): Real(y_value)},
-                        evaluation)
-                    # value = dynamic_scoping(
-                    #    f.evaluate, {x: Real(x_value), y: Real(y_value)},
-                    #    evaluation)
-                    # value = chop(value).get_real_value()
-                    if value is not None:
-                        value = float(value)
-                    stored[(x_value, y_value)] = value
-                return value
+                if (x_value, y_value) not in stored:
+                    eval_points([(x_value, y_value)])
+                return stored[(x_value, y_value)]
+
+            def edge_key(x1, y1, x2, y2):
+                if (x2, y2) > (x1, y1):
+                    return ((x1, y1), (x2, y2))
+                return ((x2, y2), (x1, y1))
 
             triangles = []
 
@@ -806,9 +1098,10 @@ class _Plot3D(Builtin):
                         x4, y4 = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
                         x5, y5 = 0.5 * (x2 + x3), 0.5 * (y2 + y3)
                         x6, y6 = 0.5 * (x1 + x3), 0.5 * (y1 + y3)
-                        split_edges.add(((x1, y1), (x2, y2)) if (x2,y2) > (x1,y1) else ((x2,y2), (x1,y1)))
-                        split_edges.add(((x2, y2), (x3, y3)) if (x3,y3) > (x2,y2) else ((x3,y3), (x2,y2)))
-                        split_edges.add(((x1, y1), (x3, y3)) if (x3,y3) > (x1,y1) else ((x3,y3), (x1,y1)))
+                        eval_points([(x4, y4), (x5, y5), (x6, y6)])
+                        split_edges.add(edge_key(x1, y1, x2, y2))
+                        split_edges.add(edge_key(x2, y2, x3, y3))
+                        split_edges.add(edge_key(x1, y1, x3, y3))
                         triangle(x1, y1, x4, y4, x6, y6, depth + 1)
                         triangle(x4, y4, x2, y2, x5, y5, depth + 1)
                         triangle(x6, y6, x5, y5, x3, y3, depth + 1)
@@ -819,6 +1112,11 @@ class _Plot3D(Builtin):
             ## linear (grid) sampling
             numx = plotpoints[0] * 1.0
             numy = plotpoints[1] * 1.0
+            x_grid = [xstart + xi / numx * (xstop - xstart)
+                      for xi in range(plotpoints[0] + 1)]
+            y_grid = [ystart + yi / numy * (ystop - ystart)
+                      for yi in range(plotpoints[1] + 1)]
+            eval_points([(xval, yval) for xval in x_grid for yval in y_grid])
             for xi in range(plotpoints[0]):
                 for yi in range(plotpoints[1]):
                     # Decide which way to break the square grid into triangles
@@ -834,17 +1132,15 @@ class _Plot3D(Builtin):
                     # important too. Use first stategy if 1 or 4 are undefined
                     # and stategy 2 if either 2 or 3 are undefined.
                     #
-                    (x1, x2, x3, x4) = (
-                        xstart + value * (xstop - xstart) for value in
-                        (xi / numx, (xi + 1) / numx, xi / numx, (xi + 1) / numx))
-                    (y1, y2, y3, y4) = (
-                        ystart + value * (ystop - ystart) for value in
-                        (yi / numy, yi / numy, (yi + 1) / numy, (yi + 1) / numy))
-
-                    v1 = eval_f(x1, y1)
-                    v2 = eval_f(x2, y2)
-                    v3 = eval_f(x3, y3)
-                    v4 = eval_f(x4, y4)
+                    x1, x2, x3, x4 = (x_grid[xi], x_grid[xi + 1],
+                                      x_grid[xi], x_grid[xi + 1])
+                    y1, y2, y3, y4 = (y_grid[yi], y_grid[yi],
+                                      y_grid[yi + 1], y_grid[yi + 1])
+
+                    v1 = stored[(x1, y1)]
+                    v2 = stored[(x2, y2)]
+                    v3 = stored[(x3, y3)]
+                    v4 = stored[(x4, y4)]
 
                     if (v1 is None or v4 is None):
                         triangle(x1, y1, x2, y2, x3, y3)
@@ -861,44 +1157,29 @@ class _Plot3D(Builtin):
                             triangle(x4, y4, x3, y3, x2, y2)
 
             ## adaptive resampling
-            # TODO: optimise this
             # Cos of the maximum angle between successive line segments
             ang_thresh = cos(20 * pi / 180)
+
+            def normal(t):
+                v = [t[1][i] - t[0][i] for i in range(3)]
+                w = [t[2][i] - t[0][i] for i in range(3)]
+                return ((v[1] * w[2]) - (v[2] * w[1]),
+                        (v[2] * w[0]) - (v[0] * w[2]),
+                        (v[0] * w[1]) - (v[1] * w[0]))
+
             for depth in range(1, max_depth):
+                # triangles are sorted, so that triangles sharing an edge
+                # list its points in the same order
+                edges = {}
+                for i, t in enumerate(triangles):
+                    for edge in ((t[0], t[1]), (t[1], t[2]), (t[0], t[2])):
+                        edges.setdefault(edge, []).append(i)
+                normals = [normal(t) for t in triangles]
+
                 needs_removal = set([])
-                lent = len(triangles) # number of initial triangles
-                for i1 in range(lent):
-                    for i2 in range(lent):
-                        # find all edge pairings
-                        if i1 == i2:
-                            continue
-                        t1 = triangles[i1]
-                        t2 = triangles[i2]
-
-                        edge_pairing = (
-                            (t1[0], t1[1]) == (t2[0], t2[1]) or
-                            (t1[0], t1[1]) == (t2[1], t2[2]) or
-                            (t1[0], t1[1]) == (t2[0], t2[2]) or
-                            (t1[1], t1[2]) == (t2[0], t2[1]) or
-                            (t1[1], t1[2]) == (t2[1], t2[2]) or
-                            (t1[1], t1[2]) == (t2[0], t2[2]) or
-                            (t1[0], t1[2]) == (t2[0], t2[1]) or
-                            (t1[0], t1[2]) == (t2[1], t2[2]) or
-                            (t1[0], t1[2]) == (t2[0], t2[2]))
-                        if not edge_pairing:
-                            continue
-                        v1 = [t1[1][i] - t1[0][i] for i in range(3)]
-                        w1 = [t1[2][i] - t1[0][i] for i in range(3)]
-                        v2 = [t2[1][i] - t2[0][i] for i in range(3)]
-                        w2 = [t2[2][i] - t2[0][i] for i in range(3)]
-                        n1 = (   # surface normal for t1
-                            (v1[1] * w1[2]) - (v1[2] * w1[1]),
-                            (v1[2] * w1[0]) - (v1[0] * w1[2]),
-                            (v1[0] * w1[1]) - (v1[1] * w1[0]))
-                        n2 = (   # surface normal for t2
-                            (v2[1] * w2[2]) - (v2[2] * w2[1]),
-                            (v2[2] * w2[0]) - (v2[0] * w2[2]),
-                            (v2[0] * w2[1]) - (v2[1] * w2[0]))
+                for edge_triangles in edges.itervalues():
+                    for i1, i2 in itertools.combinations(edge_triangles, 2):
+                        n1, n2 = normals[i1], normals[i2]
                         try:
                             angle = (n1[0] * n2[0] + n1[1] * n2[1] + n1[2] * n2[2]) \
                                 / sqrt((n1[0] ** 2 + n1[1] ** 2 + n1[2] ** 2) *
@@ -906,30 +1187,30 @@ class _Plot3D(Builtin):
                         except ZeroDivisionError:
                             angle = 0.0
                         if abs(angle) < ang_thresh:
-                            for i,t in ((i1,t1), (i2,t2)):
-                                # subdivide
-                                x1, y1 = t[0][0], t[0][1]
-                                x2, y2 = t[1][0], t[1][1]
-                                x3, y3 = t[2][0], t[2][1]
-                                x4, y4 = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
-                                x5, y5 = 0.5 * (x2 + x3), 0.5 * (y2 + y3)
-                                x6, y6 = 0.5 * (x1 + x3), 0.5 * (y1 + y3)
-                                needs_removal.add(i)
-                                split_edges.add(
-                                    ((x1, y1), (x2, y2)) if (x2, y2) > (x1, y1)
-                                    else ((x2,y2), (x1,y1)))
-                                split_edges.add(
-                                    ((x2, y2), (x3, y3)) if (x3, y3) > (x2, y2)
-                                    else ((x3,y3), (x2,y2)))
-                                split_edges.add(
-                                    ((x1, y1), (x3, y3)) if (x3, y3) > (x1, y1)
-                                    else ((x3,y3), (x1,y1)))
-                                triangle(x1, y1, x4, y4, x6, y6, depth=depth)
-                                triangle(x2, y2, x4, y4, x5, y5, depth=depth)
-                                triangle(x3, y3, x5, y5, x6, y6, depth=depth)
-                                triangle(x4, y4, x5, y5, x6, y6, depth=depth)
-                # remove subdivided triangles which have been divided
-                triangles = [t for i,t in enumerate(triangles) if i not in needs_removal]
+                            needs_removal.add(i1)
+                            needs_removal.add(i2)
+
+                # subdivide, evaluating the new points of all triangles at once
+                subdivided = [triangles[i] for i in sorted(needs_removal)]
+                eval_points([(0.5 * (t[j][0] + t[k][0]), 0.5 * (t[j][1] + t[k][1]))
+                             for t in subdivided
+                             for j, k in ((0, 1), (1, 2), (0, 2))])
+                triangles = [t for i, t in enumerate(triangles)
+                             if i not in needs_removal]
+                for t in subdivided:
+                    x1, y1 = t[0][0], t[0][1]
+                    x2, y2 = t[1][0], t[1][1]
+                    x3, y3 = t[2][0], t[2][1]
+                    x4, y4 = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
+                    x5, y5 = 0.5 * (x2 + x3), 0.5 * (y2 + y3)
+                    x6, y6 = 0.5 * (x1 + x3), 0.5 * (y1 + y3)
+                    split_edges.add(edge_key(x1, y1, x2, y2))
+                    split_edges.add(edge_key(x2, y2, x3, y3))
+                    split_edges.add(edge_key(x1, y1, x3, y3))
+                    triangle(x1, y1, x4, y4, x6, y6, depth=depth)
+                    triangle(x2, y2, x4, y4, x5, y5, depth=depth)
+                    triangle(x3, y3, x5, y5, x6, y6, depth=depth)
+                    triangle(x4, y4, x5, y5, x6, y6, depth=depth)
 
             ## fix up subdivided edges
             #
@@ -937,12 +1218,12 @@ class _Plot3D(Builtin):
             # depending on how many edges require subdivision we proceede with
             # one of two subdivision strategies
             #
-            # TODO possible optimisation: don't look at every triangle again
-            made_changes = True
-            while made_changes:
-                made_changes = False
+            # split_edges does not change any more, so only the triangles
+            # created by the previous pass need to be looked at again
+            pending, triangles = triangles, []
+            while pending:
                 new_triangles = []
-                for i,t in enumerate(triangles):
+                for t in pending:
                     new_points = []
                     if ((t[0][0], t[0][1]), (t[1][0], t[1][1])) in split_edges:
                         new_points.append([0,1])
@@ -952,8 +1233,8 @@ class _Plot3D(Builtin):
                         new_points.append([0,2])
 
                     if len(new_points) == 0:
+                        triangles.append(t)
                         continue
-                    made_changes = True
                     # 'triforce' subdivision
                     #         1
                     #         /\
@@ -983,50 +1264,36 @@ class _Plot3D(Builtin):
                         new_triangles.append(sorted((t[2], (x5, y5, v5), (x6, y6, v6))))
                     if not (v4 is None or v5 is None or v6 is None):
                         new_triangles.append(sorted(((x4, y4, v4), (x5, y5, v5), (x6, y6, v6))))
-                    triangles[i] = None
-
-                triangles.extend(new_triangles)
-                triangles = [t for t in triangles if t is not None]
+                pending = new_triangles
 
             ## add the mesh
             mesh_points = []
             if mesh == 'System`Full':
-                for xi in range(plotpoints[0] + 1):
-                    xval = xstart + xi / numx * (xstop - xstart)
-                    mesh_row = []
-                    for yi in range(plotpoints[1] + 1):
-                        yval = ystart + yi / numy * (ystop - ystart)
-                        z = stored[(xval, yval)]
-                        mesh_row.append((xval, yval, z))
-                    mesh_points.append(mesh_row)
-
-                for yi in range(plotpoints[1] + 1):
-                    yval = ystart + yi / numy * (ystop - ystart)
-                    mesh_col = []
-                    for xi in range(plotpoints[0] + 1):
-                        xval = xstart + xi / numx * (xstop - xstart)
-                        z = stored[(xval, yval)]
-                        mesh_col.append((xval, yval, z))
-                    mesh_points.append(mesh_col)
+                for xval in x_grid:
+                    mesh_points.append([(xval, yval, stored[(xval, yval)])
+                                        for yval in y_grid])
+                for yval in y_grid:
+                    mesh_points.append([(xval, yval, stored[(xval, yval)])
+                                        for xval in x_grid])
 
                 ## handle edge subdivisions
-                made_changes = True
-                while made_changes:
-                    made_changes = False
-                    for mesh_line in mesh_points:
-                        i = 0
-                        while i < len(mesh_line)-1:
-                            x1, y1, v1 = mesh_line[i]
-                            x2, y2, v2 = mesh_line[i+1]
-                            key = ((x1, y1), (x2, y2)) if (x2, y2) > (x1, y1) else ((x2, y2), (x1, y1))
-                            if key in split_edges:
+                def split_mesh_line(mesh_line):
+                    result = [mesh_line[0]]
+                    for point in mesh_line[1:]:
+                        stack = [point]
+                        while stack:
+                            x1, y1, v1 = result[-1]
+                            x2, y2, v2 = stack[-1]
+                            if edge_key(x1, y1, x2, y2) in split_edges:
                                 x3 = 0.5 * (x1 + x2)
                                 y3 = 0.5 * (y1 + y2)
-                                v3 = stored[(x3, y3)]
-                                mesh_line.insert(i+1, (x3, y3, v3))
-                                made_changes = True
-                                i += 1
-                            i += 1
+                                stack.append((x3, y3, stored[(x3, y3)]))
+                            else:
+                                result.append(stack.pop())
+                    return result
+
+                mesh_points = [split_mesh_line(mesh_line)
+                               for mesh_line in mesh_points]
 
                 # handle missing regions
                 old_meshpoints, mesh_points = mesh_points, []
@@ -1085,6 +1352,13 @@ class Plot(_Plot):
     >> Plot[3, {x, 0, 1}]
      = -Graphics-
 
+    Functions that are slow to evaluate can be sampled by several
+    processes in parallel:
+    >> g[x_] := Sum[Sin[k x] / k, {k, 5}]
+    >> Plot[g[x], {x, 0, 10}, Method -> "Parallel"]
+     = -Graphics-
+    #> Clear[g]
+
     #> Plot[1 / x, {x, -1, 1}]
      = -Graphics-
     #> Plot[x, {y, 0, 2}]
@@ -1126,11 +1400,13 @@ class Plot(_Plot):
                 x_range = [start, stop]
         return x_range, y_range
 
-    def eval_f(self, f, x_name, x_value, evaluation):
-        value = quiet_evaluate(f, {x_name: Real(x_value)}, evaluation)
-        if value is None:
-            return None
-        return (x_value, value)
+    def get_function(self, f, x_name, evaluation, parallel):
+        return get_quiet_batch_function(
+            f, [x_name], evaluation, parallel=parallel)
+
+    def eval_f(self, f, x_values):
+        return [None if value is None else (x_value, value)
+                for x_value, value in zip(x_values, f(x_values))]
 
 
 class ParametricPlot(_Plot):
@@ -1184,12 +1460,13 @@ class ParametricPlot(_Plot):
                 x_range, y_range = plotrange
         return x_range, y_range
 
-    def eval_f(self, f, x_name, x_value, evaluation):
-        value = quiet_evaluate(
-            f, {x_name: Real(x_value)}, evaluation, expect_list=True)
-        if value is None or len(value) != 2:
-            return None
-        return value
+    def get_function(self, f, x_name, evaluation, parallel):
+        return get_quiet_batch_function(
+            f, [x_name], evaluation, expect_list=True, parallel=parallel)
+
+    def eval_f(self, f, x_values):
+        return [None if value is None or len(value) != 2 else value
+                for value in f(x_values)]
 
 
 class PolarPlot(_Plot):
@@ -1230,11 +1507,14 @@ class PolarPlot(_Plot):
                 x_range, y_range = plotrange
         return x_range, y_range
 
-    def eval_f(self, f, x_name, x_value, evaluation):
-        value = quiet_evaluate(f, {x_name: Real(x_value)}, evaluation)
-        if value is None:
-            return None
-        return (value * cos(x_value), value * sin(x_value))
+    def get_function(self, f, x_name, evaluation, parallel):
+        return get_quiet_batch_function(
+            f, [x_name], evaluation, parallel=parallel)
+
+    def eval_f(self, f, x_values):
+        return [None if value is None else
+                (value * cos(x_value), value * sin(x_value))
+                for x_value, value in zip(x_values, f(x_values))]
 
 
 class ListPlot(_ListPlot):
@@ -1362,6 +1642,7 @@ class Plot3D(_Plot3D):
         'PlotPoints': 'None',
         'BoxRatios': '{1, 1, 0.4}',
         'MaxRecursion': '2',
+        'Method': 'Automatic',
     })
 
     def get_functions_param(self, functions):
@@ -1375,19 +1656,15 @@ class Plot3D(_Plot3D):
         mesh_option = self.get_option(options, 'Mesh', evaluation)
         mesh = mesh_option.to_python()
 
+        point = PointCache()
         graphics = []
         for p1, p2, p3 in triangles:
-            graphics.append(Expression('Polygon', Expression(
-                'List', Expression('List', *p1), Expression('List', *p2),
-                Expression('List', *p3))))
+            graphics.append(evaluated(Expression('Polygon', Expression(
+                'List', point(p1), point(p2), point(p3)))))
         # Add the Grid
-        for xi in range(len(mesh_points)):
-            line = []
-            for yi in range(len(mesh_points[xi])):
-                line.append(Expression(
-                    'List', mesh_points[xi][yi][0], mesh_points[xi][yi][1],
-                    mesh_points[xi][yi][2]))
-            graphics.append(Expression('Line', Expression('List', *line)))
+        for mesh_line in mesh_points:
+            graphics.append(evaluated(Expression('Line', Expression(
+                'List', *[point(p) for p in mesh_line]))))
         return graphics
 
     def final_graphics(self, graphics, options):
@@ -1432,6 +1709,7 @@ class DensityPlot(_Plot3D):
         'ColorFunctionScaling': 'True',
         'PlotPoints': 'None',
         'MaxRecursion': '2',
+        'Method': 'Automatic',
     })
 
     def get_functions_param(self, functions):
@@ -1483,49 +1761,44 @@ class DensityPlot(_Plot3D):
             color_function_max is not None):
             color_function_range = color_function_max - color_function_min
 
-        colors = {}
+        # Calculate 100 different shades max., all at once.
+        def get_level(v):
+            return int((v - v_min) / v_range * 100 + 0.5)
 
-        def eval_color(x, y, v):
-            v_scaled = (v - v_min) / v_range
+        levels = sorted(set(get_level(v) for p in triangles for x, y, v in p))
+        values = []
+        for level in levels:
+            v_scaled = level / 100.0
             if (color_function_scaling and      # noqa
                 color_function_min is not None and
                 color_function_max is not None):
                 v_color_scaled = color_function_min + \
                     v_scaled * color_function_range
             else:
-                v_color_scaled = v
-
-            # Calculate and store 100 different shades max.
-            v_lookup = int(v_scaled * 100 + 0.5)
-
-            value = colors.get(v_lookup)
-            if value is None:
-                value = Expression(color_func, Real(v_color_scaled))
-                value = value.evaluate(evaluation)
-                colors[v_lookup] = value
-            return value
+                v_color_scaled = v_min + v_scaled * v_range
+            values.append(Expression(color_func, Real(v_color_scaled)))
+        colors = Expression('List', *values).evaluate(evaluation)
+        colors = dict(zip(levels, colors.leaves))
 
+        point = PointCache()
         points = []
         vertex_colors = []
         graphics = []
         for p in triangles:
             points.append(
-                Expression('List', *(Expression('List', *x[:2]) for x in p)))
+                Expression('List', *(point(x[:2]) for x in p)))
             vertex_colors.append(
-                Expression('List', *(eval_color(*x) for x in p)))
+                Expression('List', *(colors[get_level(v)] for x, y, v in p)))
 
-        graphics.append(Expression(
+        graphics.append(evaluated(Expression(
             'Polygon', Expression('List', *points),
             Expression('Rule', Symbol('VertexColors'),
-                       Expression('List', *vertex_colors))))
+                       Expression('List', *vertex_colors)))))
 
         # add mesh
-        for xi in range(len(mesh_points)):
-            line = []
-            for yi in range(len(mesh_points[xi])):
-                line.append(Expression('List', mesh_points[xi][yi][0],
-                            mesh_points[xi][yi][1]))
-            graphics.append(Expression('Line', Expression('List', *line)))
+        for mesh_line in mesh_points:
+            graphics.append(evaluated(Expression('Line', Expression(
+                'List', *[point(p[:2]) for p in mesh_line]))))
 
         return graphics
 
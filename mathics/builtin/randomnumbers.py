@@ -12,53 +12,99 @@ import random
 import cPickle as pickle
 import binascii
 import hashlib
+import operator
 
 from mathics.builtin.base import Builtin
 from mathics.core.expression import (Integer, String, Symbol, Real, Expression,
                                      Complex)
 
 
-def get_random_state():
-    state = random.getstate()
+def get_random_state(generator):
+    state = generator.getstate()
     state = pickle.dumps(state)
     state = binascii.b2a_hex(state)
     state = int(state, 16)
     return state
 
 
-def set_random_state(state):
-    if state is None:
-        random.seed()
-    else:
-        state = hex(state)[2:]  # drop leading "0x"
-        if state.endswith('L'):
-            state = state[:-1]
-        state = binascii.a2b_hex(state)
-        state = pickle.loads(state)
-        random.setstate(state)
+def set_random_state(generator, state):
+    state = hex(state)[2:]  # drop leading "0x"
+    if state.endswith('L'):
+        state = state[:-1]
+    state = binascii.a2b_hex(state)
+    state = pickle.loads(state)
+    generator.setstate(state)
+
+
+def get_random_generator(definitions):
+    """
+    Returns the random generator of definitions. Its state is only
+    converted to the integer $RandomState when that is asked for.
+    """
+
+    generator = definitions.random
+    if generator is None:
+        generator = definitions.random = random.Random()
+        # the state was kept in $RandomState by earlier versions
+        name = 'System`$RandomState'
+        if name in definitions.user:
+            ownvalues = definitions.user[name].ownvalues
+            if ownvalues:
+                state = ownvalues[0].replace.get_int_value()
+                if state is not None:
+                    set_random_state(generator, state)
+            definitions.reset_user_definition(name)
+    return generator
+
+
+def random_array(draw, dimensions):
+    """
+    Returns nested Lists of the given dimensions of the items of the list
+    returned by draw(n) for the total number n of items.
+    """
+
+    count = reduce(operator.mul, dimensions, 1)
+    items = draw(count)
+
+    def build(items, dimensions):
+        if len(dimensions) == 1:
+            return Expression('List', *items)
+        size = len(items) // dimensions[0] if dimensions[0] > 0 else 0
+        return Expression('List', *[
+            build(items[index * size:(index + 1) * size], dimensions[1:])
+            for index in xrange(dimensions[0])])
+
+    return build(items, dimensions)
 
 
 class RandomEnv:
     def __init__(self, evaluation):
         self.evaluation = evaluation
+        self.generator = None
 
     def __enter__(self):
-        state = self.evaluation.get_config_value('$RandomState')
-        set_random_state(state)
+        self.generator = get_random_generator(self.evaluation.definitions)
         return self
 
     def __exit__(self, exit_type, value, traceback):
-        state = get_random_state()
-        self.evaluation.set_config_value('$RandomState', state)
+        pass
 
     def randint(self, a, b):
-        return random.randint(a, b)
+        return self.generator.randint(a, b)
 
     def randreal(self, a, b):
-        return random.uniform(a, b)
+        return self.generator.uniform(a, b)
+
+    def randints(self, a, b, count):
+        randint = self.generator.randint
+        return [randint(a, b) for index in xrange(count)]
+
+    def randreals(self, a, b, count):
+        uniform = self.generator.uniform
+        return [uniform(a, b) for index in xrange(count)]
 
     def seed(self, x=None):
-        random.seed(x)
+        self.generator.seed(x)
 
 
 class RandomState(Builtin):
@@ -92,8 +138,8 @@ class RandomState(Builtin):
     def apply(self, evaluation):
         '$RandomState'
 
-        with RandomEnv(evaluation):
-            return Integer(get_random_state())
+        with RandomEnv(evaluation) as rand:
+            return Integer(get_random_state(rand.generator))
 
 
 class SeedRandom(Builtin):
@@ -220,15 +266,9 @@ class RandomInteger(Builtin):
         result = ns.to_python()
 
         with RandomEnv(evaluation) as rand:
-            def search_product(i):
-                if i == len(result) - 1:
-                        return Expression('List', *[
-                            Integer(rand.randint(rmin, rmax))
-                            for j in xrange(result[i])])
-                else:
-                    return Expression('List', *[
-                        search_product(i + 1) for j in xrange(result[i])])
-            return search_product(0)
+            return random_array(
+                lambda count: [Integer(value) for value in
+                               rand.randints(rmin, rmax, count)], result)
 
 
 class RandomReal(Builtin):
@@ -260,6 +300,12 @@ class RandomReal(Builtin):
      .
      . ...   ...   ...
 
+    Lists of random numbers continue the same sequence as single ones:
+    #> SeedRandom[42]; a = RandomReal[1, {2, 2}]; SeedRandom[42]; a == Table[RandomReal[], {2}, {2}]
+     = True
+    #> RandomReal[1, {2, 0}]
+     = {{}, {}}
+
     #> RandomReal[{0, 1}, {1, -1}]
      : The array dimensions {1, -1} given in position 2 of RandomReal[{0, 1}, {1, -1}] should be a list of non-negative machine-sized integers giving the dimensions for the result.
      = RandomReal[{0, 1}, {1, -1}]
@@ -311,15 +357,10 @@ class RandomReal(Builtin):
         assert all([isinstance(i, int) for i in result])
 
         with RandomEnv(evaluation) as rand:
-            def search_product(i):
-                if i == len(result) - 1:
-                        return Expression('List', *[
-                            Real(rand.randreal(min_value, max_value))
-                            for j in xrange(result[i])])
-                else:
-                    return Expression('List', *[
-                        search_product(i + 1) for j in xrange(result[i])])
-            return search_product(0)
+            return random_array(
+                lambda count: [Real(value) for value in
+                               rand.randreals(min_value, max_value, count)],
+                result)
 
 
 class RandomComplex(Builtin):
@@ -410,14 +451,9 @@ class RandomComplex(Builtin):
             return evaluation.message('RandomComplex', 'array', ns, expr)
 
         with RandomEnv(evaluation) as rand:
-            def search_product(i):
-                if i == len(py_ns) - 1:
-                        return Expression('List', *[
-                            Complex(
-                                rand.randreal(min_value.real, max_value.real),
-                                rand.randreal(min_value.imag, max_value.imag)
-                            ) for j in xrange(py_ns[i])])
-                else:
-                    return Expression('List', *[
-                        search_product(i + 1) for j in xrange(py_ns[i])])
-            return search_product(0)
+            def draw(count):
+                return [Complex(
+                    rand.randreal(min_value.real, max_value.real),
+                    rand.randreal(min_value.imag, max_value.imag))
+                    for index in xrange(count)]
+            return random_array(draw, py_ns)
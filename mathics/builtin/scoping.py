@@ -3,6 +3,7 @@
 from mathics.builtin.base import Builtin, Predefined
 from mathics.core.expression import (Expression, String, Symbol, Integer,
                                      fully_qualified_symbol_name)
+from mathics.core.rules import Rule
 
 
 def get_scoping_vars(var_list, msg_symbol='', evaluation=None):
@@ -52,6 +53,67 @@ def dynamic_scoping(func, vars, evaluation):
     return result
 
 
+class IteratorScope(object):
+    """
+    Binds an iterator variable to one value after the other, with the
+    same effect as calling dynamic_scoping for every value:
+
+        with IteratorScope(name, evaluation) as scope:
+            for value in values:
+                scope.bind(value)
+                ...
+
+    The definition of name is saved and restored only once. Each value
+    replaces the own value of a Definition that is reused as long as
+    the loop body does not change it; otherwise a fresh one is created.
+    """
+
+    def __init__(self, name, evaluation):
+        assert fully_qualified_symbol_name(name)
+        self.name = name
+        self.evaluation = evaluation
+        self.original = None
+        self.definition = None
+        self.attributes = None
+        self.rule = None
+
+    def __enter__(self):
+        definitions = self.evaluation.definitions
+        self.original = definitions.get_user_definition(self.name)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.evaluation.definitions.add_user_definition(
+            self.name, self.original)
+
+    def is_unchanged(self):
+        definition = self.definition
+        return (
+            self.evaluation.definitions.user.get(self.name) is definition and
+            len(definition.ownvalues) == 1 and
+            definition.ownvalues[0] is self.rule and
+            definition.attributes == self.attributes and
+            not (definition.downvalues or definition.subvalues or
+                 definition.upvalues or definition.formatvalues or
+                 definition.messages or definition.options or
+                 definition.nvalues or definition.defaultvalues))
+
+    def bind(self, value):
+        "Sets the iterator to value, which is evaluated first."
+
+        definitions = self.evaluation.definitions
+        if self.definition is None or not self.is_unchanged():
+            definitions.reset_user_definition(self.name)
+            self.definition = definitions.get_user_definition(self.name)
+            self.attributes = set(self.definition.attributes)
+            self.rule = Rule(Symbol(self.name), value)
+        else:
+            self.definition.ownvalues = []
+        value = value.evaluate(self.evaluation)
+        self.rule.replace = value
+        self.definition.ownvalues = [self.rule]
+
+
 class Block(Builtin):
     """
     <dl>
@@ -4,11 +4,19 @@
 Tensor functions
 """
 
+from fractions import gcd
+from itertools import imap
+from operator import mul
+from mpmath import libmp
+
 from mathics.builtin.base import Builtin, BinaryOperator
-from mathics.core.expression import Expression, Symbol, Integer
+from mathics.core.expression import (Expression, Symbol, Integer, Rational,
+                                     Real, Complex)
 from mathics.core.rules import Pattern
 
 from mathics.builtin.lists import get_part
+from mathics.builtin.arithmetic import (
+    is_machine_real, machine_mpf_prec, from_machine_value)
 
 
 class ArrayQ(Builtin):
@@ -108,11 +116,220 @@ def get_dimensions(expr, head=None):
             sub = get_dimensions(leaf, expr.head)
             if sub_dim is None:
                 sub_dim = sub
+            elif sub_dim != sub:
+                sub_dim = []
+                break
+        return [len(expr.leaves)] + (sub_dim or [])
+
+
+def tensor_items(expr, depth):
+    "Returns the items at level depth of the rectangular tensor expr."
+
+    items = [expr]
+    for level in range(depth):
+        items = [leaf for item in items for leaf in item.leaves]
+    return items
+
+
+def number_parts(item):
+    "Returns the real and imaginary part of a Number, or None."
+
+    if isinstance(item, Complex):
+        return item.real, item.imag
+    elif isinstance(item, (Integer, Rational, Real)):
+        return item, None
+    return None
+
+
+def exact_tensor(items):
+    """
+    Returns lists of the integers re and im and the integer d such that
+    the items are (re + I im) / d, or None if an item is not an exact
+    number. im is None if all items are real.
+    """
+
+    fractions = []
+    has_imag = False
+    for item in items:
+        parts = number_parts(item)
+        if parts is None:
+            return None
+        fraction = []
+        for part in parts:
+            if part is None:
+                fraction.append((0, 1))
+            elif isinstance(part, Integer):
+                fraction.append((part.value, 1))
+            elif isinstance(part, Rational):
+                value = part.value
+                fraction.append((int(value.p), int(value.q)))
+            else:
+                return None
+        has_imag = has_imag or parts[1] is not None
+        fractions.append(fraction)
+    d = 1
+    for fraction in fractions:
+        for numerator, denominator in fraction:
+            d = d * denominator // gcd(d, denominator)
+    re = [numerator * (d // denominator)
+          for (numerator, denominator), imag in fractions]
+    if not has_imag:
+        return re, None, d
+    im = [numerator * (d // denominator)
+          for real, (numerator, denominator) in fractions]
+    return re, im, d
+
+
+def machine_tensor(items):
+    """
+    Returns lists of the integers re and im and the integer e such that
+    the items are (re + I im) 2^e, where machine reals are taken as they
+    are stored and Rationals are rounded to machine precision, or None if
+    an item is not an exact or machine number. im is None if all items
+    are real.
+    """
+
+    values = []
+    has_imag = False
+    for item in items:
+        parts = number_parts(item)
+        if parts is None:
+            return None
+        value = []
+        for part in parts:
+            if part is None:
+                value.append(libmp.fzero)
+            elif isinstance(part, Integer):
+                value.append(libmp.from_int(part.value))
+            elif isinstance(part, Rational):
+                value.append(libmp.from_rational(
+                    int(part.value.p), int(part.value.q), machine_mpf_prec,
+                    libmp.round_nearest))
+            elif is_machine_real(part):
+                value.append(part.get_mpf())
             else:
-                if sub_dim != sub:
-                    sub = []
-                    break
-        return [len(expr.leaves)] + sub
+                return None
+        has_imag = has_imag or parts[1] is not None
+        values.append(value)
+    exponents = [part[2] for value in values for part in value if part[1]]
+    e = min(exponents) if exponents else 0
+
+    def to_integer(part):
+        sign, man, exp, bc = part
+        if not man:
+            return 0
+        man <<= exp - e
+        return -man if sign else man
+
+    re = [to_integer(real) for real, imag in values]
+    if not has_imag:
+        return re, None, e
+    im = [to_integer(imag) for real, imag in values]
+    return re, im, e
+
+
+def integer_product(a, b, rows, inner, columns):
+    """
+    Returns the flat list of the product of the rows x inner matrix a and
+    the inner x columns matrix b, given as flat lists of integers.
+    """
+
+    a_rows = [a[i * inner:(i + 1) * inner] for i in xrange(rows)]
+    b_columns = [b[j::columns] for j in xrange(columns)]
+    return [sum(imap(mul, row, column))
+            for row in a_rows for column in b_columns]
+
+
+def complex_product(a, b, rows, inner, columns):
+    """
+    Like integer_product, for matrices given as pairs of lists of the real
+    and imaginary parts; the imaginary parts may be None.
+    """
+
+    a_re, a_im = a
+    b_re, b_im = b
+    re = integer_product(a_re, b_re, rows, inner, columns)
+    if a_im is None and b_im is None:
+        return re, None
+    if a_im is None:
+        im = integer_product(a_re, b_im, rows, inner, columns)
+    elif b_im is None:
+        im = integer_product(a_im, b_re, rows, inner, columns)
+    else:
+        re = [x - y for x, y in zip(
+            re, integer_product(a_im, b_im, rows, inner, columns))]
+        im = [x + y for x, y in zip(
+            integer_product(a_re, b_im, rows, inner, columns),
+            integer_product(a_im, b_re, rows, inner, columns))]
+    return re, im
+
+
+def from_exact_parts(re, im, d):
+    def from_part(numerator):
+        if numerator % d == 0:
+            return Integer(numerator // d)
+        return Rational(numerator, d)
+
+    if not im:
+        return from_part(re)
+    return Complex(from_part(re), from_part(im))
+
+
+def from_machine_parts(re, im, e):
+    def from_part(man):
+        value = libmp.from_man_exp(man, e, machine_mpf_prec,
+                                   libmp.round_nearest)
+        return from_machine_value(value)
+
+    if im is None:
+        # like Plus, which gives 0 for machine reals adding up to zero
+        return from_part(re) if re else Integer(0)
+    return Complex(from_part(re), from_part(im))
+
+
+def number_inner(list1, list2, m, n):
+    """
+    Returns Inner[Times, list1, list2, Plus] for the List tensors list1
+    and list2 of exact or machine numbers with the dimensions m and n, or
+    None if they have other items.
+
+    Products are summed exactly and rounded once: Integers and Rationals
+    give exact results, and machine numbers are turned into integers
+    times a common power of two.
+    """
+
+    dims = m[:-1] + n[1:]
+    if 0 in dims:
+        return None
+    items1 = tensor_items(list1, len(m))
+    items2 = tensor_items(list2, len(n))
+    rows = reduce(mul, m[:-1], 1)
+    inner = n[0]
+    columns = reduce(mul, n[1:], 1)
+
+    tensor1, tensor2 = exact_tensor(items1), exact_tensor(items2)
+    if tensor1 is not None and tensor2 is not None:
+        re, im = complex_product(tensor1[:2], tensor2[:2], rows, inner,
+                                 columns)
+        d = tensor1[2] * tensor2[2]
+        items = [from_exact_parts(x, im[index] if im else 0, d)
+                 for index, x in enumerate(re)]
+    else:
+        tensor1, tensor2 = machine_tensor(items1), machine_tensor(items2)
+        if tensor1 is None or tensor2 is None:
+            return None
+        re, im = complex_product(tensor1[:2], tensor2[:2], rows, inner,
+                                 columns)
+        e = tensor1[2] + tensor2[2]
+        items = [from_machine_parts(x, im[index] if im else None, e)
+                 for index, x in enumerate(re)]
+
+    for dim in reversed(dims[1:]):
+        items = [Expression('List', *items[index:index + dim])
+                 for index in xrange(0, len(items), dim)]
+    if not dims:
+        return items[0]
+    return Expression('List', *items)
 
 
 class Dimensions(Builtin):
@@ -164,6 +381,21 @@ class Dot(BinaryOperator):
      = {{a r + b t, a s + b u}, {c r + d t, c s + d u}}
     >> a . b
      = a . b
+
+    Products of numbers are computed exactly, or in machine precision:
+    >> {{1, I}, {2, 3}} . {{I, 1}, {2, -I}}
+     = {{3 I, 2}, {6 + 2 I, 2 - 3 I}}
+    >> {1.5, 2} . {{1, 2}, {3, 4}}
+     = {7.5, 11.}
+
+    #> {1, 2} . {3/2, 1/3}
+     = 13 / 6
+    #> {0.1, 0.2, 0.3} . {0.4, 0.5, 0.6}
+     = 0.32
+    #> {1.5 I, 1.} . {2 I, 0}
+     = -3. + 0. I
+    #> {} . {}
+     = 0
     """
 
     operator = '.'
@@ -218,6 +450,13 @@ class Inner(Builtin):
         head = list1.head
         inner_dim = n[0]
 
+        if (head.get_name() == 'System`List' and
+                f.get_name() == 'System`Times' and
+                g.get_name() == 'System`Plus'):
+            result = number_inner(list1, list2, m, n)
+            if result is not None:
+                return result
+
         def rec(i_cur, j_cur, i_rest, j_rest):
             evaluation.check_stopped()
             if i_rest:
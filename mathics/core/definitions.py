@@ -22,8 +22,10 @@ import cPickle as pickle
 import os
 import base64
 import re
+from collections import deque
 
-from mathics.core.expression import (Expression, Symbol, String, ensure_context,
+from mathics.core.expression import (Expression, Symbol, String, Integer,
+                                     ensure_context,
                                      fully_qualified_symbol_name)
 from mathics.core.characters import letters, letterlikes
 
@@ -51,11 +53,106 @@ def valuesname(name):
         return name[7:-6].lower()
 
 
+class History(object):
+    """
+    The inputs and results of the most recent lines, i.e. the values of
+    In[n] and Out[n]. They are kept apart from the downvalues of In and
+    Out, so that adding a line and forgetting the oldest one take constant
+    time. Rules are only built when the downvalues are asked for, e.g. by
+    DownValues[Out] or Definition[In].
+    """
+
+    def __init__(self):
+        self.lines = deque()    # (line, entry), oldest first
+        self.entries = {}       # line -> [input, output]
+
+    def get_entry(self, line, create=False):
+        entry = self.entries.get(line)
+        if entry is None and create:
+            # a line number can be used again after $Line has been reset
+            entry = self.entries[line] = [None, None]
+            self.lines.append((line, entry))
+        return entry
+
+    def set_input(self, line, expr):
+        self.get_entry(line, create=True)[0] = expr
+
+    def set_output(self, line, expr):
+        self.get_entry(line, create=True)[1] = expr
+
+    def get_input(self, line):
+        entry = self.entries.get(line)
+        return None if entry is None else entry[0]
+
+    def get_output(self, line):
+        entry = self.entries.get(line)
+        return None if entry is None else entry[1]
+
+    def trim(self, length):
+        "Forgets all but the last length lines."
+
+        while len(self.lines) > length:
+            line, entry = self.lines.popleft()
+            if self.entries.get(line) is entry:
+                del self.entries[line]
+
+    @staticmethod
+    def get_position(name):
+        "Returns the index of the values of In or Out in the entries."
+
+        if name == 'System`In':
+            return 0
+        elif name == 'System`Out':
+            return 1
+        return None
+
+    def unset(self, name, expr):
+        """
+        Forgets the input or result that expr, e.g. Out[3], refers to.
+        Returns whether it was known.
+        """
+
+        position = self.get_position(name)
+        if position is None or not expr.has_form(name, 1):
+            return False
+        entry = self.entries.get(expr.leaves[0].get_int_value())
+        if entry is None or entry[position] is None:
+            return False
+        entry[position] = None
+        return True
+
+    def clear(self, name):
+        "Forgets all inputs (In) or results (Out)."
+
+        position = self.get_position(name)
+        if position is not None:
+            for line, entry in self.lines:
+                entry[position] = None
+
+    def get_rules(self, name):
+        "Returns the rules for In or Out, most recent first."
+
+        from mathics.core.rules import Rule
+
+        position = self.get_position(name)
+        if position is None:
+            return []
+        rules = []
+        for line, entry in reversed(self.lines):
+            value = entry[position]
+            if value is not None and self.entries.get(line) is entry:
+                rules.append(Rule(Expression(name, Integer(line)), value))
+        return rules
+
+
 class Definitions(object):
     def __init__(self, add_builtin=False, builtin_filename=None):
         super(Definitions, self).__init__()
         self.builtin = {}
         self.user = {}
+        self.history = History()
+        # the generator of RandomInteger etc., created when first used
+        self.random = None
 
         if add_builtin:
             from mathics.builtin import modules, contribute
@@ -392,22 +489,41 @@ class Definitions(object):
 
     def set_values(self, name, values, rules):
         pos = valuesname(values)
-        definition = self.get_user_definition(self.lookup_name(name))
+        name = self.lookup_name(name)
+        definition = self.get_user_definition(name)
         definition.set_values_list(pos, rules)
+        if pos == 'down':
+            # the given rules replace the history of In or Out
+            self.history.clear(name)
 
     def get_options(self, name):
         return self.get_definition(self.lookup_name(name)).options
 
     def reset_user_definitions(self):
         self.user = {}
+        self.history = History()
+        self.random = None
 
     def get_user_definitions(self):
-        return base64.b64encode(
-            pickle.dumps(self.user, protocol=pickle.HIGHEST_PROTOCOL))
+        return base64.b64encode(pickle.dumps(
+            (self.user, self.history, self.random),
+            protocol=pickle.HIGHEST_PROTOCOL))
 
     def set_user_definitions(self, definitions):
+        self.history = History()
+        self.random = None
         if definitions:
-            self.user = pickle.loads(base64.b64decode(definitions))
+            user = pickle.loads(base64.b64decode(definitions))
+            # definitions serialized before the history and the random
+            # generator were kept apart are just the dictionary, or the
+            # dictionary and the history
+            if not isinstance(user, tuple):
+                user = (user,)
+            self.user = user[0]
+            if len(user) > 1:
+                self.history = user[1]
+            if len(user) > 2:
+                self.random = user[2]
         else:
             self.user = {}
 
@@ -424,12 +540,32 @@ class Definitions(object):
         name = self.lookup_name(name)
         self.add_rule(name, Rule(Symbol(name), value))
 
+    def get_private_ownvalue(self, name):
+        """
+        Returns the value of name for changing it in place, or None. The
+        first time, the value is replaced by a copy, so that expressions
+        sharing the old value (e.g. the result of the assignment) do not
+        change.
+        """
+
+        rule = self.get_ownvalue(name)
+        if rule is None:
+            return None
+        if not rule.private:
+            self.set_ownvalue(name, rule.replace.copy())
+            rule = self.get_ownvalue(name)
+            rule.private = True
+        return rule.replace
+
     def set_options(self, name, options):
         definition = self.get_user_definition(self.lookup_name(name))
         definition.options = options
 
     def unset(self, name, expr):
-        definition = self.get_user_definition(self.lookup_name(name))
+        name = self.lookup_name(name)
+        if self.history.unset(name, expr):
+            return True
+        definition = self.get_user_definition(name)
         return definition.remove_rule(expr)
 
 
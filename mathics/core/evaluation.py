@@ -19,7 +19,8 @@ u"""
 """
 
 import sys
-import cPickle as pickle
+import time
+import threading
 import interruptingcow
 
 from mathics import settings
@@ -31,6 +32,45 @@ FORMATS = ['StandardForm', 'FullForm', 'TraditionalForm',
            'MatrixForm', 'TableForm']
 
 
+try:
+    import resource
+    # Python 2 lacks the constant, but Linux supports measuring threads
+    RUSAGE_THREAD = getattr(resource, 'RUSAGE_THREAD',
+                            1 if sys.platform.startswith('linux') else None)
+except ImportError:
+    resource = None
+    RUSAGE_THREAD = None
+
+
+def get_cpu_time():
+    "Returns the CPU time used by the current thread, if possible."
+
+    if RUSAGE_THREAD is not None:
+        usage = resource.getrusage(RUSAGE_THREAD)
+        return usage.ru_utime + usage.ru_stime
+    # elsewhere, the CPU time of the process (or wall time on Windows)
+    return time.clock()
+
+
+def is_main_thread():
+    "Tests whether signals like SIGALRM can interrupt the current thread."
+
+    return threading.current_thread().name == 'MainThread'
+
+
+def get_memory_usage():
+    "Returns the resident memory of the process in bytes, if known."
+
+    if resource is None:
+        return None
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (IOError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize()
+
+
 class EvaluationInterrupt(Exception):
     pass
 
@@ -126,8 +166,17 @@ class Result(object):
 
 
 class Evaluation(object):
+    # number of calls of check_stopped between looking at the clocks, and
+    # number of those between looking at the memory used
+    check_interval = 100
+    memory_check_interval = 10
+
+    # approximate number of bytes taken by a new expression
+    expression_size = 500
+
     def __init__(self, input=None, definitions=None, timeout=None,
-                 out_callback=None, format='text', catch_interrupt=True):
+                 out_callback=None, format='text', catch_interrupt=True,
+                 result_callback=None, cancel_event=None):
         from mathics.core.definitions import Definitions
 
         if definitions is None:
@@ -136,8 +185,18 @@ class Evaluation(object):
         self.recursion_depth = 0
         self.timeout = False
         self.stopped = False
+        self.cancelled = False
+        self.cancel_event = cancel_event
+        self.deadline = None
+        self.cpu_deadline = None
+        self.check_count = 0
+        self.memory_limit = settings.MAX_MEMORY
+        self.memory_baseline = None
+        self.memory_check_count = 0
+        self.memory_exhausted = False
         self.out = []
         self.out_callback = out_callback
+        self.result_callback = result_callback
         self.listeners = {}
         self.options = None
 
@@ -146,36 +205,55 @@ class Evaluation(object):
 
         self.format = format
 
-        queries = []
-        last_parse_error = None
+        self.results = []
+
         if input is not None:
-            from mathics.core.parser import parse, TranslateError
-
-            lines = input.splitlines()
-            query = ''
-            for line in lines:
-                if line:
-                    query += line
-                    try:
-                        expression = parse(query, self.definitions)
-                        if expression is not None:
-                            queries.append(expression)
-                        query = ''
-                        last_parse_error = None
-                    except TranslateError, exc:
-                        last_parse_error = exc
-                else:
-                    query += ' '
+            self.evaluate_input(input, timeout, catch_interrupt)
+
+    def evaluate_input(self, input, timeout=None, catch_interrupt=True,
+                       cpu_timeout=None):
+        """
+        Evaluates the queries in input, which may span several lines.
+        Each Result is appended to self.results and passed to
+        result_callback as soon as it is available.
+
+        Each query is aborted with a timeout message once it has taken
+        more than timeout seconds, or used more than cpu_timeout seconds
+        of CPU time in the evaluating thread. In the main thread, the
+        timeout is enforced with SIGALRM, which also interrupts builtins
+        that run long without calling check_stopped. Other threads cannot
+        receive signals, so there both limits are only checked in
+        check_stopped.
+        """
+
+        from mathics.core.parser import parse, TranslateError
 
-        self.results = []
+        queries = []
+        last_parse_error = None
+        lines = input.splitlines()
+        query = ''
+        for line in lines:
+            if line:
+                query += line
+                try:
+                    expression = parse(query, self.definitions)
+                    if expression is not None:
+                        queries.append(expression)
+                    query = ''
+                    last_parse_error = None
+                except TranslateError, exc:
+                    last_parse_error = exc
+            else:
+                query += ' '
 
         for query in queries:
+            if self.is_cancelled():
+                break
             self.recursion_depth = 0
             self.timeout = False
             self.stopped = False
 
             from mathics.core.expression import Symbol, Expression, Integer
-            from mathics.core.rules import Rule
 
             line_no = self.get_config_value('$Line', 0)
             line_no += 1
@@ -185,15 +263,14 @@ class Evaluation(object):
             if history_length is None or history_length > 100:
                 history_length = 100
 
+            history = self.definitions.history
+
             def evaluate():
                 if history_length > 0:
-                    self.definitions.add_rule('In', Rule(
-                        Expression('In', line_no), query))
+                    history.set_input(line_no, query)
                 result = query.evaluate(self)
                 if history_length > 0:
-                    stored_result = self.get_stored_result(result)
-                    self.definitions.add_rule('Out', Rule(
-                        Expression('Out', line_no), stored_result))
+                    history.set_output(line_no, self.get_stored_result(result))
                 if result != Symbol('Null'):
                     return self.format_output(result)
                 else:
@@ -203,11 +280,15 @@ class Evaluation(object):
                 result = None
                 exc_result = None
                 try:
-                    if timeout is None:
-                        result = evaluate()
-                    else:
-                        with interruptingcow.timeout(timeout, TimeoutInterrupt):
+                    self.set_memory_baseline()
+                    if timeout is not None and is_main_thread():
+                        self.set_deadline(None, cpu_timeout)
+                        with interruptingcow.timeout(timeout,
+                                                     TimeoutInterrupt):
                             result = evaluate()
+                    else:
+                        self.set_deadline(timeout, cpu_timeout)
+                        result = evaluate()
                 except KeyboardInterrupt:
                     if catch_interrupt:
                         exc_result = Symbol('$Aborted')
@@ -231,38 +312,40 @@ class Evaluation(object):
                     self.message('Continue', 'nofdw')
                     exc_result = Expression('Hold', Expression('Continue'))
                 except TimeoutInterrupt:
+                    self.set_deadline(None)
                     self.stopped = False
                     self.timeout = True
                     self.message('General', 'timeout')
                     exc_result = Symbol('$Aborted')
                 except AbortInterrupt:  # , error:
+                    if self.is_cancelled():
+                        break
                     exc_result = Symbol('$Aborted')
                 if exc_result is not None:
                     self.recursion_depth = 0
+                    self.set_deadline(None)
                     result = self.format_output(exc_result)
 
-                self.results.append(Result(self.out, result, line_no))
-                self.out = []
+                self.add_result(Result(self.out, result, line_no))
             finally:
                 self.stop()
 
             history_length = self.get_config_value('$HistoryLength', 100)
             if history_length is None or history_length > 100:
                 history_length = 100
-            line = line_no - history_length
-            while line > 0:
-                unset_in = self.definitions.unset('In', Expression('In', line))
-                unset_out = self.definitions.unset(
-                    'Out', Expression('Out', line))
-                if not (unset_in or unset_out):
-                    break
-                line -= 1
+            history.trim(history_length)
 
         if last_parse_error is not None:
             self.recursion_depth = 0
             self.stopped = False
             self.message('General', 'syntax', unicode(last_parse_error))
-            self.results.append(Result(self.out, None, None))
+            self.add_result(Result(self.out, None, None))
+
+    def add_result(self, result):
+        self.results.append(result)
+        self.out = []
+        if self.result_callback:
+            self.result_callback(result)
 
     def get_stored_result(self, result):
         from mathics.core.expression import Symbol
@@ -273,13 +356,68 @@ class Evaluation(object):
 
         # Prevent too large results from being stored, as this can exceed the
         # DB's max_allowed_packet size
-        data = pickle.dumps(result)
-        if len(data) > 10000:
-            return Symbol('Null')
+        max_nodes = settings.MAX_STORED_NODES
+        max_bytes = settings.MAX_STORED_SIZE
+        if max_nodes is not None or max_bytes is not None:
+            nodes, size = result.get_size(max_nodes, max_bytes)
+            if ((max_nodes is not None and nodes > max_nodes) or
+                    (max_bytes is not None and size > max_bytes)):
+                return Symbol('Null')
         return result
 
+    def set_deadline(self, timeout, cpu_timeout=None):
+        self.deadline = None if timeout is None else time.time() + timeout
+        self.cpu_deadline = (None if cpu_timeout is None
+                             else get_cpu_time() + cpu_timeout)
+        self.check_count = 0
+
+    def set_memory_baseline(self):
+        self.memory_baseline = (None if self.memory_limit is None
+                                else get_memory_usage())
+        self.memory_check_count = 0
+        self.memory_exhausted = False
+
+    def check_memory(self, count=0):
+        """
+        Aborts the evaluation with General::nomem if the memory taken since
+        the query started, plus count expressions that are about to be
+        created, exceeds memory_limit. Builtins creating large lists call
+        this before allocating them.
+
+        The memory taken is the growth of the resident memory of the whole
+        process, so it includes other threads, misses memory that Python
+        reuses after freeing it, and is only known on Linux. Elsewhere,
+        only the estimate for the count expressions is checked.
+        """
+
+        if self.memory_limit is None or self.memory_exhausted:
+            return
+        used = count * self.expression_size
+        usage = get_memory_usage()
+        if usage is not None and self.memory_baseline is not None:
+            used += usage - self.memory_baseline
+        if used > self.memory_limit:
+            # don't check again while the message is formatted
+            self.memory_exhausted = True
+            self.message('General', 'nomem')
+            raise AbortInterrupt
+
     def stop(self):
         self.stopped = True
+        self.set_deadline(None)
+
+    def cancel(self):
+        """
+        Aborts the query being evaluated and skips the remaining ones.
+        Can be called from another thread.
+        """
+
+        self.cancelled = True
+        self.stopped = True
+
+    def is_cancelled(self):
+        return self.cancelled or (self.cancel_event is not None and
+                                  self.cancel_event.is_set())
 
     def format_output(self, expr):
         from mathics.core.expression import Expression, String, BoxError
@@ -385,9 +523,35 @@ class Evaluation(object):
             raise NotImplementedError
 
     def check_stopped(self):
+        """
+        Raises AbortInterrupt if the evaluation has been cancelled, or
+        TimeoutInterrupt if it has been stopped or has run out of time.
+        Called regularly during evaluation.
+        """
+
+        if self.is_cancelled():
+            raise AbortInterrupt
         if self.stopped:
             raise TimeoutInterrupt
 
+        # reading the clocks costs more than the rest of this method, and
+        # measuring the CPU time or the memory used is a system call, so
+        # they are only done now and then
+        self.check_count += 1
+        if self.check_count < self.check_interval:
+            return
+        self.check_count = 0
+        if self.deadline is not None and time.time() > self.deadline:
+            raise TimeoutInterrupt
+        if (self.cpu_deadline is not None and
+                get_cpu_time() > self.cpu_deadline):
+            raise TimeoutInterrupt
+        if self.memory_baseline is not None:
+            self.memory_check_count += 1
+            if self.memory_check_count >= self.memory_check_interval:
+                self.memory_check_count = 0
+                self.check_memory()
+
     def get_config_value(self, name, default=None):
         # Infinity -> None, otherwise returns integer
 
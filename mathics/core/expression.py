@@ -98,6 +98,8 @@ class ExpressionPointer(object):
 
 
 def from_python(arg):
+    if isinstance(arg, BaseExpression):
+        return arg
     number_type = get_type(arg)
     if isinstance(arg, (int, long)) or number_type == 'z':
         return Integer(arg)
@@ -170,6 +172,30 @@ class BaseExpression(object):
     def get_int_value(self):
         return None
 
+    def get_size(self, max_nodes=None, max_bytes=None):
+        """
+        Returns the number of nodes of the expression and an estimate of
+        the number of bytes needed to serialize it. The walk stops as soon
+        as either exceeds its maximum, so checking a result against a
+        limit costs no more than the limit itself.
+        """
+
+        nodes = size = 0
+        stack = [self]
+        while stack:
+            expr = stack.pop()
+            nodes += 1
+            if expr.is_atom():
+                size += expr.get_atom_size()
+            else:
+                size += 24
+                stack.append(expr.head)
+                stack.extend(expr.leaves)
+            if ((max_nodes is not None and nodes > max_nodes) or
+                    (max_bytes is not None and size > max_bytes)):
+                break
+        return nodes, size
+
     def get_real_value(self):
         return None
 
@@ -266,7 +292,7 @@ class BaseExpression(object):
                 if head in formats:
                     expr = expr.do_format(evaluation, form)
                 elif (head != 'System`FullForm' and not expr.is_atom() and
-                      head != 'System`Graphics'):
+                      head not in ('System`Graphics', 'System`Graphics3D')):
                     new_leaves = [leaf.do_format(evaluation, form)
                                   for leaf in expr.leaves]
                     expr = Expression(
@@ -431,6 +457,17 @@ class Monomial(object):
         return 0
 
 
+def has_head(expr, head):
+    "Tests whether the head of expr equals head, as == compares them."
+
+    expr_head = expr.get_head()
+    if isinstance(expr_head, Symbol) and isinstance(head, Symbol):
+        # symbols have equal sort keys exactly when their names are equal,
+        # and comparing the names is much faster
+        return expr_head.name == head.name
+    return expr_head == head
+
+
 class Expression(BaseExpression):
     def __init__(self, head, *leaves, **kwargs):
         super(Expression, self).__init__(**kwargs)
@@ -665,21 +702,25 @@ class Expression(BaseExpression):
                 return False
         return True
 
+    def __hash__(self):
+        # unicode(self) would format every number of large lists
+        return hash(('Expression', self.head) + tuple(self.leaves))
+
     def flatten(self, head, pattern_only=False, callback=None, level=None):
         if level is not None and level <= 0:
             return self
         sub_level = None if level is None else level - 1
         do_flatten = False
         for leaf in self.leaves:
-            if leaf.get_head() == head and (not pattern_only or
-                                            leaf.pattern_sequence):
+            if ((not pattern_only or leaf.pattern_sequence) and
+                    has_head(leaf, head)):
                 do_flatten = True
                 break
         if do_flatten:
             new_leaves = []
             for leaf in self.leaves:
-                if leaf.get_head() == head and (not pattern_only or
-                                                leaf.pattern_sequence):
+                if ((not pattern_only or leaf.pattern_sequence) and
+                        has_head(leaf, head)):
                     new_leaf = leaf.flatten(head, pattern_only, callback,
                                             level=sub_level)
                     if callback is not None:
@@ -999,7 +1040,7 @@ class Expression(BaseExpression):
         if pattern:
             self.leaves.sort(key=lambda e: e.get_sort_key(pattern_sort=True))
         else:
-            self.leaves.sort()
+            self.leaves.sort(key=lambda e: e.get_sort_key())
 
     def filter_leaves(self, head_name):
         # TODO: should use sorting
@@ -1107,7 +1148,7 @@ class Expression(BaseExpression):
         items = []
         dim = None
         for leaf in self.leaves:
-            if leaf.get_head() == head:
+            if has_head(leaf, head):
                 if dim is None:
                     dim = len(leaf.leaves)
                     items = [(items + [leaf]) for leaf in leaf.leaves]
@@ -1191,6 +1232,9 @@ class Atom(BaseExpression):
     def get_atom_name(self):
         return self.__class__.__name__
 
+    def get_atom_size(self):
+        return 16
+
     def __repr__(self):
         return (u'<%s: %s>' % (self.get_atom_name(), self)).encode(
             'unicode_escape')
@@ -1238,6 +1282,9 @@ class Symbol(Atom):
     def do_copy(self):
         return Symbol(self.name)
 
+    def get_atom_size(self):
+        return 16 + len(self.name)
+
     def boxes_to_text(self, **options):
         return str(self.name)
 
@@ -1384,6 +1431,7 @@ class Integer(Number):
         return {'value': self.value}
 
     def __setstate__(self, dict):
+        super(Integer, self).__init__()
         self.value = dict['value']
 
     def boxes_to_text(self, **options):
@@ -1410,6 +1458,9 @@ class Integer(Number):
     def get_int_value(self):
         return self.value
 
+    def get_atom_size(self):
+        return 16 + self.value.bit_length() // 8
+
     def same(self, other):
         return isinstance(other, Integer) and self.value == other.value
 
@@ -1442,6 +1493,7 @@ class Rational(Number):
         return {'value': str(self.value)}
 
     def __setstate__(self, dict):
+        super(Rational, self).__init__()
         self.value = sympy.Rational(dict['value'])
 
     def to_sympy(self, **kwargs):
@@ -1453,6 +1505,11 @@ class Rational(Number):
     def same(self, other):
         return isinstance(other, Rational) and self.value == other.value
 
+    def get_atom_size(self):
+        numerator, denominator = self.value.as_numer_denom()
+        return 16 + (int(numerator).bit_length() +
+                     int(denominator).bit_length()) // 8
+
     def numerator(self):
         return Number.from_mp(self.value.as_numer_denom()[0])
 
@@ -1533,6 +1590,7 @@ class Real(Number):
         return {'value': s, 'prec': p}
 
     def __setstate__(self, dict):
+        super(Real, self).__init__()
         # TODO: Check this
         self.prec = dict['prec']
         self.value = dict['value']
@@ -1603,6 +1661,9 @@ class Real(Number):
     def get_precision(self):
         return self.prec
 
+    def get_atom_size(self):
+        return 16 + self.prec // 8
+
     def get_sort_key(self, pattern_sort=False):
         if pattern_sort:
             return super(Real, self).get_sort_key(True)
@@ -1614,6 +1675,20 @@ class Real(Number):
     def do_copy(self):
         return Real(self.value, self.prec)
 
+    def get_mpf(self):
+        "Returns the mpf tuple of the value (which may be sympy's Zero)."
+        return getattr(self.value, '_mpf_', mpmath.libmp.fzero)
+
+    def __hash__(self):
+        # Reals that agree up to the last seven bits of the lower precision
+        # are equal (see __cmp__), so hash the value rounded as __cmp__
+        # rounds it, at no more than machine precision. Hashing the digits
+        # of unicode(self) is much slower.
+        from mathics.builtin.numeric import machine_precision
+        p = min(self.prec, machine_precision) - 7
+        p = mpmath.libmp.dps_to_prec(dps(p))
+        return hash(('Real', mpmath.libmp.mpf_pos(self.get_mpf(), p, 'n')))
+
     def __cmp__(self, other):
         if isinstance(other, Real):
             # MMA Docs: "Approximate numbers that differ in their last seven
@@ -1714,6 +1789,9 @@ class Complex(Number):
     def get_precision(self):
         return self.prec
 
+    def get_atom_size(self):
+        return 16 + self.real.get_atom_size() + self.imag.get_atom_size()
+
     def do_copy(self):
         return Complex(self.real.do_copy(), self.imag.do_copy())
 
@@ -1773,6 +1851,9 @@ class String(Atom):
     def __str__(self):
         return u'"%s"' % self.value
 
+    def get_atom_size(self):
+        return 16 + len(self.value)
+
     def boxes_to_text(self, show_string_characters=False, **options):
         value = self.value
         if (not show_string_characters and      # nopep8
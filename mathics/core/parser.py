@@ -22,6 +22,8 @@ import ply.lex as lex
 import ply.yacc as yacc
 
 import re
+import threading
+from string import ascii_letters
 from math import log10
 
 from mathics.core.expression import (BaseExpression, Expression, Integer,
@@ -31,6 +33,7 @@ from mathics.core.numbers import dps
 from mathics.core.characters import letters, letterlikes, named_characters
 
 from mathics.builtin.numeric import machine_precision
+from mathics.settings import PARSER
 
 
 class TranslateError(Exception):
@@ -645,43 +648,36 @@ class MathicsScanner:
             **kwargs)
 
         self.precompiled_regex = {
-            'longnames': re.compile(r'(?<!\\)(\\\[[a-zA-Z]+\])'),
-            'oct': re.compile(r'(?<!\\)(\\[0-7]{3})'),
-            'hex': re.compile(
-                r'(?<!\\)(\\\.[0-9a-fA-F]{2}|\\\:[0-9a-fA-F]{4})')
+            'escapes': re.compile(
+                r'(?<!\\)\\(?:\[([a-zA-Z]+)\]|\.([0-9a-fA-F]{2})'
+                r'|\:([0-9a-fA-F]{4})|([0-7]{3}))'),
         }
 
-    def convert_character_codes(self, s):
-        "Converts character codes to characters E.g. \.7A -> z, \:004a -> J"
-        def repl_hex_char(match):
-            return unichr(int(match.group(0)[2:], 16))
-
-        def repl_oct_char(match):
-            return unichr(int(match.group(0)[1:], 8))
-
-        hex_re = self.precompiled_regex['hex']
-        oct_re = self.precompiled_regex['oct']
-
-        s = hex_re.sub(repl_hex_char, s)
-        s = oct_re.sub(repl_oct_char, s)
-
-        return s
-
-    def convert_unicode_longnames(self, s):
-        "Converts unicode longnames to characters. E.g. \[Theta] -> \u03B8"
-
-        def repl_named_char(match):
-            name = match.group(0)[2:-1]
-            char = named_characters.get(name)
-            if char is not None:
-                return char
+    def convert_character_escapes(self, s):
+        r"""
+        Converts unicode longnames and character codes to characters in
+        a single pass, e.g. \[Theta] -> \u03B8, \.7A -> z, \:004a -> J
+        and \172 -> z. Replaced characters are not scanned again.
+        """
+
+        if '\\' not in s:
+            return s
+
+        def repl_char(match):
+            name, hex2, hex4, octal = match.groups()
+            if name is not None:
+                char = named_characters.get(name)
+                if char is not None:
+                    return char
+                else:
+                    # TODO: Syntax::sntufn message
+                    return match.group(0)
+            elif octal is not None:
+                return unichr(int(octal, 8))
             else:
-                # TODO: Syntax::sntufn message
-                return '\\[' + name + ']'
-
-        longnames_re = self.precompiled_regex['longnames']
+                return unichr(int(hex2 or hex4, 16))
 
-        return longnames_re.sub(repl_named_char, s)
+        return self.precompiled_regex['escapes'].sub(repl_char, s)
 
     @staticmethod
     def string_escape(s):
@@ -1499,21 +1495,627 @@ class MathicsParser:
         'box : form FormBox box'
         args[0] = Expression('FormBox', args[3], args[1])
 
+
+class UnsupportedSyntax(Exception):
+    """
+    Raised by PrecedenceParser for input outside the subset of the grammar
+    it handles. parse() then falls back to the PLY grammar, which also
+    produces the appropriate ParseError for invalid input.
+    """
+    pass
+
+
+# Binding levels of the PLY grammar: (level, associativity) for every
+# terminal and %prec pseudo-token, lowest precedence first.
+token_levels = {}
+for level, entry in enumerate(precedence):
+    for name in entry[1:]:
+        token_levels[name] = (level + 1, entry[0])
+
+# Tokens which end the current operand regardless of their precedence.
+terminator_tokens = frozenset([
+    'RawComma', 'RawRightBracket', 'RawRightBrace', 'RawRightParenthesis',
+    '$end'])
+
+# Tokens which can start an expression. Those at the level of Times are
+# multiplied implicitly when they follow a complete expression.
+atom_tokens = frozenset([
+    'blanks', 'blankdefault', 'out', 'slot', 'slotseq', 'string', 'symbol',
+    'number', 'RawLeftBrace', 'RawLeftParenthesis'])
+
+expression_start_tokens = atom_tokens | frozenset([
+    'Minus', 'Plus', 'PlusMinus', 'MinusPlus', 'Not', 'Factorial',
+    'Factorial2', 'Increment', 'Decrement', 'Integral', 'Span', 'Get',
+    'LeftBoxParenthesis', 'InterpretedBox']) | frozenset(prefix_operators)
+
+
+class PrecedenceParser(object):
+    """
+    Precedence climbing parser for the common subset of the grammar.
+
+    Operands are bound using the levels of the PLY precedence table, so
+    the trees are identical to the ones built by MathicsParser. Box
+    syntax and rare constructs (Span, Infix, TagSet, Integral, ...) raise
+    UnsupportedSyntax instead.
+    """
+
+    def __init__(self):
+        self.definitions = None
+        self.types = None
+        self.values = None
+        self.pos = 0
+
+        self.binary = {}
+        self.postfix = {}
+        self.prefix = {}
+
+        for op, names in infix_operators.items():
+            for name in self.token_names(names):
+                self.binary[name] = (
+                    lambda left, right, op=op: Expression(op, left, right))
+
+        for op, names in flat_infix_operators.items():
+            for name in self.token_names(names):
+                self.binary[name] = (
+                    lambda left, right, op=op: self.flat(op, left, right))
+
+        for op, names in innequality_operators.items():
+            for name in self.token_names(names):
+                self.binary[name] = (
+                    lambda left, right, op=op:
+                    self.innequality(op, left, right))
+
+        for op, names in postfix_operators.items():
+            for name in self.token_names(names):
+                self.postfix[name] = (
+                    lambda expr, op=op: Expression(op, expr))
+
+        for op, names in prefix_operators.items():
+            for name in self.token_names(names):
+                self.prefix[name] = (
+                    name, lambda expr, op=op: Expression(op, expr))
+
+        self.binary.update({
+            'Minus': lambda left, right: Expression(
+                'Plus', left, Expression('Times', Integer(-1), right)),
+            'RawSlash': self.divide,
+            'Divide': self.divide,
+            'Times': self.times,
+            'RawStar': self.times,
+            'Prefix': lambda left, right: Expression(left, right),
+            'Postfix': lambda left, right: Expression(right, left),
+            'Apply2': lambda left, right: Expression(
+                'Apply', left, right, Expression('List', Integer(1))),
+            'Set': lambda left, right: Expression('Set', left, right),
+            'SetDelayed': lambda left, right: Expression(
+                'SetDelayed', left, right),
+            'Function': lambda left, right: Expression(
+                'Function', Expression('List', left), right),
+        })
+
+        self.postfix.update({
+            'Derivative': None,     # needs the token value
+            'Unset': lambda expr: Expression('Unset', expr),
+        })
+
+        self.prefix.update({
+            'Minus': ('UMinus', self.negate),
+            'Plus': ('UPlus', lambda expr: expr),
+            'PlusMinus': ('UPlusMinus',
+                          lambda expr: Expression('PlusMinus', expr)),
+            'MinusPlus': ('UMinusPlus',
+                          lambda expr: Expression('MinusPlus', expr)),
+            'Not': ('Not', lambda expr: Expression('Not', expr)),
+            'Factorial': ('Not', lambda expr: Expression('Not', expr)),
+            'Factorial2': ('Not', lambda expr: Expression(
+                'Not', Expression('Not', expr))),
+            'Increment': ('PreIncrement',
+                          lambda expr: Expression('PreIncrement', expr)),
+            'Decrement': ('PreDecrement',
+                          lambda expr: Expression('PreDecrement', expr)),
+        })
+
+        self.special = {
+            'Semicolon': self.parse_compound,
+            'RawLeftBracket': self.parse_call,
+            'MessageName': self.parse_message_name,
+            'Put': self.parse_put,
+            'PutAppend': self.parse_put,
+            'Derivative': self.parse_derivative,
+        }
+        for name in atom_tokens:
+            self.special[name] = self.parse_implicit_times
+
+        self.colon_level = token_levels['RawColon'][0]
+
+    @staticmethod
+    def token_names(names):
+        if isinstance(names, list):
+            return names
+        return [names]
+
+    def user_symbol(self, name):
+        # the context state cannot change while parsing, so each name only
+        # has to be looked up once per input
+        full_name = self.names.get(name)
+        if full_name is None:
+            full_name = self.names[name] = self.definitions.lookup_name(name)
+        return Symbol(full_name)
+
+    def build(self, lexer):
+        """
+        Takes over the master regular expressions of the PLY lexer, so
+        that tokens can be read without creating LexToken objects and
+        calling a rule function for every symbol and integer.
+        """
+        self.lexer = lexer
+        self.states = {}
+        for state in ('INITIAL', 'file'):
+            regexes = []
+            for regex, index in lexer.lexstatere[state]:
+                actions = [None] * len(index)
+                for i, entry in enumerate(index):
+                    if entry is not None and entry[0] is not None:
+                        actions[i] = (self.token_actions.get(
+                            entry[0].__name__, 'call'), entry[0], entry[1])
+                    elif entry is not None:
+                        actions[i] = ('token', None, entry[1])
+                regexes.append((regex, actions))
+            self.states[state] = (regexes, lexer.lexstateignore[state])
+
+        # Shortcuts for the most frequent tokens. The alternatives are
+        # tried in the same order as in the master expression, and no
+        # other token can start with these characters.
+        def alternatives(*names):
+            rules = [getattr(scanner, 't_' + name) for name in names]
+            return '|'.join(
+                '(?P<%s>%s)' % (name, getattr(rule, 'regex', rule.__doc__))
+                for name, rule in zip(names, rules))
+
+        self.symbol_chars = frozenset(ascii_letters + '$_`')
+        self.symbol_regex = re.compile(
+            alternatives('blankdefault', 'blanks', 'symbol'),
+            re.VERBOSE | lexer.lexreflags)
+        self.number_regex = re.compile(
+            alternatives('intRepeated', 'number'),
+            re.VERBOSE | lexer.lexreflags)
+
+    token_actions = {
+        't_symbol': 'token',
+        't_blanks': 'token',
+        't_blankdefault': 'token',
+        't_comment': 'skip',
+        't_number': 'number',
+        't_intRepeated': 'number',
+        't_string': 'string',
+        't_Get': 'file',
+        't_Put': 'file',
+        't_PutAppend': 'file',
+        't_file_filename': 'filename',
+        't_INITIAL_LeftBoxParenthesis': 'unsupported',
+    }
+
+    def tokenize(self, string):
+        types = []
+        values = []
+        regexes, ignore = self.states['INITIAL']
+        initial = regexes
+        symbol_chars = self.symbol_chars
+        symbol_regex = self.symbol_regex
+        number_regex = self.number_regex
+        pos = 0
+        end = len(string)
+        while pos < end:
+            char = string[pos]
+            if char in ignore:
+                pos += 1
+                continue
+            match = None
+            if char in symbol_chars and regexes is initial:
+                match = symbol_regex.match(string, pos)
+                if match is not None:
+                    types.append(match.lastgroup)
+                    values.append(match.group())
+                    pos = match.end()
+                    continue
+            elif char.isdigit() and regexes is initial:
+                match = number_regex.match(string, pos)
+                value = match.group()
+                if value.isdigit():
+                    types.append('number')
+                    values.append(Integer(int(value)))
+                    pos = match.end()
+                    continue
+                match = None
+            if match is None:
+                for regex, actions in regexes:
+                    match = regex.match(string, pos)
+                    if match is not None:
+                        break
+                else:
+                    raise UnsupportedSyntax()   # ScanError from PLY's lexer
+            action, func, tag = actions[match.lastindex]
+            value = match.group()
+            pos = match.end()
+
+            if action == 'token':
+                pass
+            elif action == 'skip':
+                continue
+            elif action == 'number' and value.isdigit():
+                tag, value = 'number', Integer(int(value))
+            elif action == 'string':
+                value = scanner.string_escape(value[1:-1])
+            elif action == 'file':
+                regexes, ignore = self.states['file']
+            elif action == 'unsupported':
+                raise UnsupportedSyntax()
+            else:
+                token = lex.LexToken()
+                token.type, token.value = tag, value
+                token.lexer = self.lexer
+                token = func(token)
+                tag, value = token.type, token.value
+                if action == 'filename':
+                    regexes, ignore = self.states['INITIAL']
+            types.append(tag)
+            values.append(value)
+        types.append('$end')
+        values.append(None)
+        return types, values
+
+    def parse(self, string, definitions):
+        types, values = self.tokenize(string)
+
+        self.definitions = definitions
+        self.names = {}
+        self.types = types
+        self.values = values
+        self.pos = 0
+        try:
+            if types[0] == '$end':
+                return None
+            result = self.parse_expr(0, 'left')
+            if types[self.pos] != '$end':
+                raise UnsupportedSyntax()
+            return result.post_parse()
+        finally:
+            self.definitions = self.names = None
+            self.types = self.values = None
+
+    def expect(self, token_type):
+        if self.types[self.pos] != token_type:
+            raise UnsupportedSyntax()
+        self.pos += 1
+
+    def parse_expr(self, min_level, min_assoc):
+        "Parses an operand of a rule with the given level and associativity"
+
+        # Chains of prefix operators are applied iteratively, innermost
+        # first, so that e.g. '!!!...!x' does not recurse per operator.
+        pending = []
+        while self.types[self.pos] in self.prefix:
+            pending.append(self.prefix[self.types[self.pos]])
+            self.pos += 1
+
+        expr = self.parse_atom()
+        while pending:
+            level_name, builder = pending.pop()
+            level, assoc = token_levels[level_name]
+            expr = builder(self.parse_operators(expr, level, assoc))
+        return self.parse_operators(expr, min_level, min_assoc)
+
+    def parse_operators(self, left, min_level, min_assoc):
+        types = self.types
+        while True:
+            tag = types[self.pos]
+            if tag in terminator_tokens:
+                return left
+            level, assoc = token_levels.get(tag, (None, None))
+            if level is None:
+                raise UnsupportedSyntax()
+            if level < min_level:
+                return left
+            if level == min_level:
+                if min_assoc == 'left':
+                    return left
+                elif min_assoc == 'nonassoc':
+                    raise UnsupportedSyntax()
+
+            if tag in self.binary:
+                self.pos += 1
+                if assoc == 'right':
+                    left = self.parse_right_chain(left, tag, level)
+                else:
+                    right = self.parse_expr(level, assoc)
+                    left = self.binary[tag](left, right)
+            elif tag in self.special:
+                left = self.special[tag](left, level)
+            elif tag in self.postfix:
+                self.pos += 1
+                if tag in self.prefix:
+                    self.check_postfix(level)
+                left = self.postfix[tag](left)
+            else:
+                raise UnsupportedSyntax()
+
+    def check_postfix(self, level):
+        """
+        Operators like '!' and '++' also start an expression, and the
+        grammar reads them as such (multiplying implicitly) if the next
+        token binds tighter than the postfix operator would.
+        """
+        tag = self.types[self.pos]
+        if tag in expression_start_tokens:
+            next_level, assoc = token_levels.get(tag, (None, None))
+            if (next_level is None or next_level > level or
+                    (next_level == level and assoc == 'right')):
+                raise UnsupportedSyntax()
+
+    def parse_right_chain(self, left, tag, level):
+        """
+        Parses 'a op b op c ...' for right associative operators of the
+        same level iteratively and groups it as 'a op (b op (c ...))'.
+        """
+        types = self.types
+        operands = [left, self.parse_expr(level, 'left')]
+        operators = [tag]
+        while True:
+            tag = types[self.pos]
+            if (tag in terminator_tokens or
+                    token_levels.get(tag, (None,))[0] != level):
+                break
+            self.pos += 1
+            if tag in self.binary:
+                operators.append(tag)
+                operands.append(self.parse_expr(level, 'left'))
+            elif self.postfix.get(tag) is not None:
+                operands[-1] = self.parse_operators(
+                    self.postfix[tag](operands[-1]), level, 'left')
+            else:
+                raise UnsupportedSyntax()
+
+        result = operands.pop()
+        while operators:
+            result = self.binary[operators.pop()](operands.pop(), result)
+        return result
+
+    def parse_sequence(self):
+        types = self.types
+        items = []
+        if types[self.pos] in ('RawRightBracket', 'RawRightBrace'):
+            return items
+        while True:
+            if types[self.pos] == 'RawComma':
+                items.append(Symbol('Null'))
+            else:
+                items.append(self.parse_expr(0, 'left'))
+            if types[self.pos] != 'RawComma':
+                return items
+            self.pos += 1
+            if types[self.pos] in ('RawRightBracket', 'RawRightBrace'):
+                items.append(Symbol('Null'))
+                return items
+
+    def parse_atom(self):
+        types, values = self.types, self.values
+        tag = types[self.pos]
+        value = values[self.pos]
+        self.pos += 1
+
+        if tag == 'symbol':
+            if types[self.pos] == 'RawColon':
+                return self.parse_pattern(value)
+            return self.user_symbol(value)
+        elif tag == 'number':
+            return value
+        elif tag == 'string':
+            return String(value)
+        elif tag == 'blanks' or tag == 'blankdefault':
+            if tag == 'blanks':
+                pattern = self.blanks(value)
+            else:
+                pattern = self.blankdefault(value)
+            if types[self.pos] == 'RawColon':
+                self.pos += 1
+                return Expression('Optional', pattern,
+                                  self.parse_expr(self.colon_level, 'right'))
+            return pattern
+        elif tag == 'RawLeftParenthesis':
+            expr = self.parse_expr(0, 'left')
+            self.expect('RawRightParenthesis')
+            expr.parenthesized = True
+            return expr
+        elif tag == 'RawLeftBrace':
+            items = self.parse_sequence()
+            self.expect('RawRightBrace')
+            return Expression('List', *items)
+        elif tag == 'slot':
+            return Expression('Slot', Integer(value))
+        elif tag == 'slotseq':
+            return Expression('SlotSequence', Integer(value))
+        elif tag == 'out':
+            if value == -1:
+                return Expression('Out')
+            return Expression('Out', Integer(value))
+        elif tag == 'Get':
+            if types[self.pos] != 'filename':
+                raise UnsupportedSyntax()
+            self.pos += 1
+            return Expression('Get', values[self.pos - 1])
+        raise UnsupportedSyntax()
+
+    def parse_pattern(self, name):
+        types = self.types
+        self.pos += 1
+        if (types[self.pos] in ('blanks', 'blankdefault') and
+                types[self.pos + 1] == 'RawColon'):
+            raise UnsupportedSyntax()
+        expr = self.parse_expr(self.colon_level, 'right')
+        if expr.get_head_name() == 'System`Pattern':
+            return Expression(
+                'Optional',
+                Expression('Pattern', self.user_symbol(name), expr.leaves[0]),
+                expr.leaves[1])
+        return Expression('Pattern', self.user_symbol(name), expr)
+
+    def blanks(self, value):
+        pieces = value.split('_')
+        name = ('Blank', 'BlankSequence', 'BlankNullSequence')[
+            len(pieces) - 2]
+        if pieces[-1]:
+            blank = Expression(name, self.user_symbol(pieces[-1]))
+        else:
+            blank = Expression(name)
+        if pieces[0]:
+            return Expression('Pattern', self.user_symbol(pieces[0]), blank)
+        return blank
+
+    def blankdefault(self, value):
+        name = value[:-2]
+        if name:
+            return Expression('Optional', Expression(
+                'Pattern', self.user_symbol(name), Expression('Blank')))
+        return Expression('Optional', Expression('Blank'))
+
+    def parse_implicit_times(self, left, level):
+        return self.times(left, self.parse_expr(level, 'left'))
+
+    def parse_compound(self, left, level):
+        self.pos += 1
+        if left.get_head_name() != 'System`CompoundExpression':
+            left = Expression('CompoundExpression', left)
+        if self.types[self.pos] in expression_start_tokens:
+            left.leaves.append(self.parse_expr(level, 'left'))
+        else:
+            left.leaves.append(Symbol('Null'))
+        return left
+
+    def parse_call(self, left, level):
+        if self.types[self.pos + 1] == 'RawLeftBracket':
+            self.pos += 2
+            items = self.parse_sequence()
+            self.expect('RawRightBracket')
+            self.expect('RawRightBracket')
+            return Expression('Part', left, *items)
+        self.pos += 1
+        items = self.parse_sequence()
+        self.expect('RawRightBracket')
+        expr = Expression(left, *items)
+        expr.parenthesized = True  # to handle e.g. Power[a,b]^c correctly
+        return expr
+
+    def parse_message_name(self, left, level):
+        types, values = self.types, self.values
+        self.pos += 1
+        if types[self.pos] not in ('symbol', 'string'):
+            raise UnsupportedSyntax()
+        self.pos += 1
+        return Expression('MessageName', left, String(values[self.pos - 1]))
+
+    def parse_put(self, left, level):
+        head = self.types[self.pos]
+        self.pos += 1
+        if self.types[self.pos] != 'filename':
+            raise UnsupportedSyntax()
+        self.pos += 1
+        return Expression(head, left, self.values[self.pos - 1])
+
+    def parse_derivative(self, left, level):
+        n = len(self.values[self.pos])
+        self.pos += 1
+        if (isinstance(left, Expression) and     # nopep8
+            isinstance(left.head, Expression) and
+            left.head.get_head_name() == 'System`Derivative' and
+            left.head.leaves[0].get_int_value() is not None):
+            n += left.head.leaves[0].get_int_value()
+            left = left.leaves[0]
+        return Expression(Expression('Derivative', Integer(n)), left)
+
+    @staticmethod
+    def flat(op, left, right):
+        op = ensure_context(op)
+        if left.get_head_name() == op:
+            left.leaves.append(right)
+            return left
+        return Expression(op, left, right)
+
+    @staticmethod
+    def innequality(op, left, right):
+        head = left.get_head_name()
+        if head == ensure_context(op):
+            left.leaves.append(right)
+            return left
+        elif head == 'System`Inequality':
+            left.leaves.append(Symbol(op))
+            left.leaves.append(right)
+            return left
+        elif head in [ensure_context(k)
+                      for k in innequality_operators.keys()]:
+            leaves = []
+            for i, leaf in enumerate(left.leaves):
+                if i != 0:
+                    leaves.append(Symbol(head))
+                leaves.append(leaf)
+            leaves.append(Symbol(op))
+            leaves.append(right)
+            return Expression('Inequality', *leaves)
+        return Expression(op, left, right)
+
+    @staticmethod
+    def times(left, right):
+        if left.get_head_name() == 'System`Times':
+            left.leaves.append(right)
+            return left
+        return Expression('Times', left, right)
+
+    @staticmethod
+    def divide(left, right):
+        return Expression('Times', left,
+                          Expression('Power', right, Integer(-1)))
+
+    @staticmethod
+    def negate(expr):
+        if expr.get_head_name() in ['System`Integer', 'System`Real']:
+            expr.value = -expr.value
+            return expr
+        return Expression('Times', Integer(-1), expr)
+
+
 scanner = MathicsScanner()
 scanner.build()
 parser = MathicsParser()
 parser.build()
+precedence_parser = PrecedenceParser()
+precedence_parser.build(scanner.lexer)
+
+# the lexer and the parsers keep state while parsing, and evaluations may
+# run in several threads
+parse_lock = threading.RLock()
 
 
 # Parse input (from the frontend, -e, input files, ToExpression etc).
 # Look up symbols according to the Definitions instance supplied.
 def parse(string, definitions):
-    scanner.lexer.begin('INITIAL')      # Reset the lexer state (known lex bug)
-
-    string = scanner.convert_unicode_longnames(string)
-    string = scanner.convert_character_codes(string)
-
-    return parser.parse(string, definitions)
+    with parse_lock:
+        scanner.lexer.begin('INITIAL')  # Reset the lexer state (known lex bug)
+
+        string = scanner.convert_character_escapes(string)
+
+        if PARSER == 'precedence':
+            try:
+                return precedence_parser.parse(string, definitions)
+            except (UnsupportedSyntax, TranslateError):
+                # rare construct or invalid input: leave it (and error
+                # reporting) to PLY
+                scanner.lexer.begin('INITIAL')
+            except RuntimeError as e:
+                # nesting too deep for the recursive parser
+                if not str(e).startswith('maximum recursion depth'):
+                    raise
+                scanner.lexer.begin('INITIAL')
+
+        return parser.parse(string, definitions)
 
 
 class SystemDefinitions(object):
@@ -134,6 +134,10 @@ class BaseRule(object):
 
 
 class Rule(BaseRule):
+    # True for an own value that no other expression shares, so that it
+    # can be changed in place (see Definitions.get_private_ownvalue)
+    private = False
+
     def __init__(self, pattern, replace, system=False):
         super(Rule, self).__init__(pattern, system=system)
         self.replace = replace
@@ -21,6 +21,7 @@ u"""
 from __future__ import with_statement
 
 import re
+import bisect
 from os import listdir, path
 import pickle
 
@@ -56,6 +57,8 @@ LIST_RE = re.compile(r"(?s)<(?P<tag>ul|ol)>(?P<content>.*?)</(?P=tag)>")
 LIST_ITEM_RE = re.compile(r"(?s)<li>(.*?)(?:</li>|(?=<li>)|$)")
 CONSOLE_RE = re.compile(
     r"(?s)<(?P<tag>con|console)>(?P<content>.*?)</(?P=tag)>")
+SEARCH_TAG_RE = re.compile(r'<[^>]*>')
+SEARCH_WORD_RE = re.compile(r'[$\w]+', re.UNICODE)
 IMG_RE = re.compile(
     r'<img src="(?P<src>.*?)" title="(?P<title>.*?)" label="(?P<label>.*?)">')
 REF_RE = re.compile(r'<ref label="(?P<label>.*?)">')
@@ -569,6 +572,7 @@ class Documentation(DocElement):
         self.title = "Overview"
         self.parts = []
         self.parts_by_slug = {}
+        self.index = None
         dir = settings.DOC_DIR
         files = listdir(dir)
         files.sort()
@@ -678,26 +682,119 @@ class Documentation(DocElement):
     def get_url(self):
         return '/'
 
+    def get_index(self):
+        if self.index is None:
+            self.index = DocIndex(self)
+        return self.index
+
     def search(self, query):
-        query = query.strip()
-        query_parts = [q.strip().lower() for q in query.split()]
+        """
+        Returns (exact, element) for the parts, chapters and sections
+        matching all words of query, best matches first. exact tells
+        whether query is the title or the operator of a section.
+        """
 
-        def matches(text):
-            text = text.lower()
-            return all(q in text for q in query_parts)
+        return self.get_index().search(query)
 
-        result = []
-        for part in self.parts:
-            if matches(part.title):
-                result.append((False, part))
+
+class DocIndex(object):
+    """
+    Inverted index of the documentation, mapping each word of the titles
+    and the text and examples of the sections to the elements containing
+    it. The suffixes of title words are indexed as well, so that a query
+    word matches a title when it occurs anywhere in it, and any query word
+    matches the indexed words it is a prefix of.
+    """
+
+    title_weight = 10
+    title_part_weight = 4
+    text_weight = 1
+    max_text_count = 5
+
+    def __init__(self, documentation):
+        self.elements = []
+        self.postings = {}      # word -> {element number: weight}
+        self.operators = {}
+        for part in documentation.parts:
+            self.add(part, part.title)
             for chapter in part.chapters:
-                if matches(chapter.title):
-                    result.append((False, chapter))
+                self.add(chapter, chapter.title, chapter.doc)
                 for section in chapter.sections:
-                    if matches(section.title):
-                        result.append((section.title == query, section))
-                    elif query == section.operator:
-                        result.append((True, section))
+                    self.add(section, section.title, section.doc)
+                    if section.operator:
+                        self.operators.setdefault(
+                            section.operator, []).append(section)
+        self.words = sorted(self.postings)
+
+    @staticmethod
+    def split(text):
+        return SEARCH_WORD_RE.findall(text.lower())
+
+    @staticmethod
+    def get_text(doc):
+        for item in doc.items:
+            if isinstance(item, DocText):
+                yield SEARCH_TAG_RE.sub(' ', item.text)
+            elif isinstance(item, DocTests):
+                for test in item.tests:
+                    if not test.private:
+                        yield test.test
+
+    def add(self, element, title, doc=None):
+        number = len(self.elements)
+        self.elements.append(element)
+        weights = {}
+        if doc is not None:
+            for text in self.get_text(doc):
+                for word in self.split(text):
+                    weights[word] = min(weights.get(word, 0) + self.text_weight,
+                                        self.max_text_count)
+        for word in self.split(title):
+            for start in range(1, len(word)):
+                weights[word[start:]] = max(weights.get(word[start:], 0),
+                                            self.title_part_weight)
+            weights[word] = self.title_weight
+        for word, weight in weights.iteritems():
+            self.postings.setdefault(word, {})[number] = weight
+
+    def lookup(self, query_word):
+        "Returns the best weight of query_word for each matching element."
+
+        result = {}
+        index = bisect.bisect_left(self.words, query_word)
+        while (index < len(self.words) and
+               self.words[index].startswith(query_word)):
+            word = self.words[index]
+            factor = 1.0 if word == query_word else 0.5
+            for number, weight in self.postings[word].iteritems():
+                weight *= factor
+                if weight > result.get(number, 0):
+                    result[number] = weight
+            index += 1
+        return result
+
+    def search(self, query):
+        query = query.strip()
+        scores = None
+        for query_word in self.split(query):
+            weights = self.lookup(query_word)
+            if scores is None:
+                scores = weights
+            else:
+                scores = dict((number, score + weights[number])
+                              for number, score in scores.iteritems()
+                              if number in weights)
+        operator_sections = self.operators.get(query, [])
+        result = [(True, section) for section in operator_sections]
+        ranked = sorted((scores or {}).iteritems(),
+                        key=lambda (number, score): (-score, number))
+        for number, score in ranked:
+            element = self.elements[number]
+            if element not in operator_sections:
+                result.append((isinstance(element, DocSection) and
+                               element.title == query, element))
+        # exact matches first, the rest by rank
+        result.sort(key=lambda (exact, element): not exact)
         return result
 
 
@@ -108,7 +108,21 @@ http://localhost:%d\nin Firefox, Chrome, or Safari to use Mathics\n""" % port
             from django.core.servers.basehttp import (
                 get_internal_wsgi_application)
             handler = get_internal_wsgi_application()
-        run(addr, port, handler)
+
+        # Load the builtins and start the evaluation processes before
+        # accepting requests. Evaluation happens in these processes, so
+        # requests can be handled in threads. Without them, requests are
+        # handled one at a time: evaluations share global state like the
+        # precision of mpmath, and only the main thread can be interrupted
+        # by the timeout signal.
+        from mathics.web.views import workers
+        if workers is not None:
+            workers.start()
+
+        if settings.DJANGO_VERSION < (1, 4):
+            run(addr, port, handler)
+        else:
+            run(addr, port, handler, threading=workers is not None)
     except socket.error as e:
         # Use helpful error messages instead of ugly tracebacks.
         ERRORS = {
@@ -40,9 +40,29 @@ LOG_QUERIES = False
 TIMEOUT = None
 MAX_RECURSION_DEPTH = 512
 
+# number of bytes the memory of the process may grow by while evaluating a
+# query before it is aborted with General::nomem; None for no limit.
+# The growth is measured from the resident memory of the whole process
+# (Linux only), so it counts other threads too, and misses memory that
+# Python reuses after freeing it. Builtins creating large lists also check
+# an estimate of their size before creating them, on all platforms.
+MAX_MEMORY = None
+
+# results larger than MAX_STORED_SIZE (estimated bytes when serialized) or
+# with more than MAX_STORED_NODES subexpressions are not kept in Out;
+# None removes the limit. The estimate is that of a compact encoding,
+# typically a third to a half of the size of the result pickled as text
+MAX_STORED_SIZE = 10000
+MAX_STORED_NODES = None
+
 # number of bits of precision for inexact calculations
 MACHINE_PRECISION = 64
 
+# parser for input and builtin rules: 'precedence' for the hand-written
+# precedence climbing parser, which falls back to the PLY grammar for box
+# syntax and rare constructs, or 'ply' to always use the PLY grammar
+PARSER = 'precedence'
+
 ADMINS = (
     (u'Admin', 'mail@test.com'),
 )
@@ -61,6 +81,10 @@ DOC_TEX_DATA = ROOT_DIR + 'doc/tex/data'
 DOC_XML_DATA = ROOT_DIR + 'doc/xml/data'
 DOC_LATEX_FILE = ROOT_DIR + 'doc/tex/documentation.tex'
 
+# parsed patterns and replacements of builtin rules, reused at startup for
+# builtin modules whose source is unchanged; set to None to always parse
+BUILTIN_RULES_CACHE = DATA_DIR + 'builtin_rules.pickle'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -70,6 +94,33 @@ DATABASES = {
 
 REQUIRE_LOGIN = False
 
+# the definitions of web sessions are kept in memory and written to
+# KERNEL_DIR when they have not been used for KERNEL_IDLE_TIMEOUT seconds
+# or when more than KERNEL_MAX_COUNT sessions are in memory. Files not read
+# back within KERNEL_FILE_TIMEOUT seconds are deleted (None keeps them).
+KERNEL_DIR = DATA_DIR + 'kernels/'
+KERNEL_IDLE_TIMEOUT = 30 * 60
+KERNEL_MAX_COUNT = 100
+KERNEL_FILE_TIMEOUT = 30 * 24 * 3600
+
+# number of processes evaluating web queries, each session always using the
+# same one; 0 evaluates queries in the server process. A worker whose
+# query runs longer than TIMEOUT plus a few seconds is restarted.
+EVALUATION_WORKERS = 2
+
+# number of processes evaluating the points of plots with
+# Method -> "Parallel"; None for the number of CPUs. With PARALLEL_PLOT set
+# to True, plots of functions that cannot be compiled are sampled in
+# parallel unless they are given another Method.
+PLOT_PROCESSES = None
+PARALLEL_PLOT = False
+
+# rendered documentation pages; the RESULT_CACHE_MAX_COUNT most recently used
+# are kept in memory and all of them in RESULT_CACHE_DIR (None keeps them in
+# memory only) until the builtins, the documentation or the templates change
+RESULT_CACHE_DIR = DATA_DIR + 'results/'
+RESULT_CACHE_MAX_COUNT = 1000
+
 SERVER_EMAIL = 'mathics@localhost'
 
 # Local time zone for this installation. Choices can be found here:
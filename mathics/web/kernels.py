@@ -0,0 +1,209 @@
+# -*- coding: utf8 -*-
+
+u"""
+    Mathics: a general-purpose computer algebra system
+    Copyright (C) 2011-2013 The Mathics Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from mathics.core.definitions import Definitions
+
+
+class Kernel(object):
+    """
+    The definitions of one web session. Queries of a session are
+    evaluated while holding its lock. A kernel is not evicted while pins
+    is positive (see KernelManager.use).
+    """
+
+    def __init__(self, definitions):
+        self.definitions = definitions
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self.pins = 0
+
+    def has_state(self):
+        definitions = self.definitions
+        return bool(definitions.user or definitions.history.lines or
+                    definitions.random is not None)
+
+
+class KernelManager(object):
+    """
+    Keeps the definitions of web sessions in memory, so that a query does
+    not have to restore and serialize everything the user has defined.
+
+    Kernels that have not been used for idle_timeout seconds, or the
+    least recently used ones when there are more than max_count, are
+    serialized to a file in directory. They are read back (and the file
+    removed) when the session sends its next query. Files that have not
+    been read back for file_timeout seconds belong to abandoned sessions
+    and are deleted.
+    """
+
+    id_regex = re.compile(r'^[0-9a-f]{32}$')
+
+    # seconds between two passes deleting expired files
+    cleanup_interval = 3600
+
+    def __init__(self, builtin_definitions, directory, idle_timeout=1800,
+                 max_count=100, file_timeout=30 * 24 * 3600):
+        self.builtin = builtin_definitions.builtin
+        self.directory = directory
+        self.idle_timeout = idle_timeout
+        self.max_count = max_count
+        self.file_timeout = file_timeout
+        self.kernels = OrderedDict()    # least recently used first
+        self.lock = threading.Lock()
+        self.last_cleanup = None
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    @classmethod
+    def is_valid_id(cls, kernel_id):
+        return (isinstance(kernel_id, basestring) and
+                cls.id_regex.match(kernel_id) is not None)
+
+    def get_filename(self, kernel_id):
+        return os.path.join(self.directory, kernel_id)
+
+    @contextmanager
+    def use(self, kernel_id, user_definitions=None):
+        """
+        Gets the kernel with the given id (see get) and holds its lock
+        while the block runs. The kernel is pinned from the moment it is
+        looked up, so that it cannot be evicted before the lock is taken.
+        """
+
+        kernel = self.get(kernel_id, user_definitions, pin=True)
+        try:
+            with kernel.lock:
+                yield kernel
+        finally:
+            self.unpin(kernel)
+
+    def get(self, kernel_id, user_definitions=None, pin=False):
+        """
+        Returns the kernel with the given id. A kernel that is not in
+        memory is restored from its file, or else created from the
+        serialized user_definitions (as returned by
+        Definitions.get_user_definitions). A pinned kernel must be
+        released with unpin.
+        """
+
+        assert self.is_valid_id(kernel_id)
+        with self.lock:
+            kernel = self.kernels.pop(kernel_id, None)
+            if kernel is None:
+                spilled = self.read(kernel_id)
+                if spilled is not None:
+                    user_definitions = spilled
+                definitions = Definitions()
+                definitions.builtin = self.builtin
+                definitions.set_user_definitions(user_definitions)
+                kernel = Kernel(definitions)
+            kernel.last_used = time.time()
+            if pin:
+                kernel.pins += 1
+            self.kernels[kernel_id] = kernel
+            self.evict(keep=kernel_id)
+        self.cleanup()
+        return kernel
+
+    def unpin(self, kernel):
+        with self.lock:
+            kernel.pins -= 1
+
+    def evict(self, keep=None):
+        now = time.time()
+        for kernel_id, kernel in self.kernels.items():
+            if (len(self.kernels) <= self.max_count and
+                    now - kernel.last_used < self.idle_timeout):
+                break
+            if (kernel_id == keep or kernel.pins or
+                    not kernel.lock.acquire(False)):
+                # about to evaluate or still evaluating
+                continue
+            try:
+                del self.kernels[kernel_id]
+                self.spill(kernel_id, kernel)
+            finally:
+                kernel.lock.release()
+
+    def spill(self, kernel_id, kernel):
+        if not kernel.has_state():
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        filename = self.get_filename(kernel_id)
+        with open(filename + '.tmp', 'wb') as kernel_file:
+            kernel_file.write(kernel.definitions.get_user_definitions())
+        os.rename(filename + '.tmp', filename)
+
+    def read(self, kernel_id):
+        filename = self.get_filename(kernel_id)
+        try:
+            with open(filename, 'rb') as kernel_file:
+                user_definitions = kernel_file.read()
+        except IOError:
+            return None
+        os.remove(filename)
+        return user_definitions
+
+    def cleanup(self):
+        """
+        Deletes the files of kernels that have not been used for
+        file_timeout seconds, at most once every cleanup_interval seconds.
+        """
+
+        now = time.time()
+        with self.lock:
+            if (self.file_timeout is None or (
+                    self.last_cleanup is not None and
+                    now - self.last_cleanup < self.cleanup_interval)):
+                return
+            self.last_cleanup = now
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not self.is_valid_id(name):
+                continue
+            filename = self.get_filename(name)
+            try:
+                if now - os.path.getmtime(filename) > self.file_timeout:
+                    os.remove(filename)
+            except OSError:
+                # read back or deleted in the meantime
+                pass
+
+    def spill_all(self):
+        "Serializes all kernels, e.g. when the server shuts down."
+
+        with self.lock:
+            while self.kernels:
+                kernel_id, kernel = self.kernels.popitem()
+                self.spill(kernel_id, kernel)
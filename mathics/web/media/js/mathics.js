@@ -352,15 +352,19 @@ function afterProcessResult(ul, command) {
 	});
 }
 
+function createOutLine(out) {
+	var li = $E('li', {'class': (out.message ? 'message' : 'print')});
+	if (out.message)
+		li.appendChild($T(out.prefix + ': '));
+	li.appendChild(createLine(out.text));
+	return li;
+}
+
 function setResult(ul, results) {
 	results.each(function(result) {
 		var resultUl = $E('ul', {'class': 'out'});
 		result.out.each(function(out) {
-			var li = $E('li', {'class': (out.message ? 'message' : 'print')});
-			if (out.message)
-				li.appendChild($T(out.prefix + ': '));
-			li.appendChild(createLine(out.text));
-			resultUl.appendChild(li);
+			resultUl.appendChild(createOutLine(out));
 		});
 		if (result.result != null) {
 			var li = $E('li', {'class': 'result'}, createLine(result.result));
@@ -375,23 +379,73 @@ function submitQuery(textarea, onfinish) {
 	$('welcomeContainer').fade({duration: 0.5});
 	
 	textarea.li.addClassName('loading');
-	new Ajax.Request('/ajax/query/', {
+	// The server sends one JSON object per line as soon as it is available:
+	// {"out": ...} for messages and printed output, {"result": ...} for
+	// every result and finally {"done": true, ...}.
+	var results = [];
+	var received = 0;
+	var done = false;
+	var resultUl = null;
+	var cleared = false;
+	
+	function processLines(transport) {
+		var text = transport.responseText || '';
+		var end = text.lastIndexOf('\n') + 1;
+		if (end <= received)
+			return;
+		var lines = text.substring(received, end).split('\n');
+		received = end;
+		if (!cleared) {
+			textarea.ul.select('li[class!=request][class!=submitbutton]').invoke('deleteElement');
+			cleared = true;
+		}
+		lines.each(function(line) {
+			if (!line)
+				return;
+			var record = line.evalJSON();
+			if (record.done) {
+				done = true;
+				return;
+			}
+			if (!resultUl) {
+				resultUl = $E('ul', {'class': 'out'});
+				textarea.ul.appendChild($E('li', {'class': 'out'}, resultUl));
+			}
+			if (record.out) {
+				resultUl.appendChild(createOutLine(record.out));
+			} else if (record.result) {
+				results.push(record.result);
+				if (record.result.result != null) {
+					var li = $E('li', {'class': 'result'}, createLine(record.result.result));
+					resultUl.appendChild(li);
+				}
+				resultUl = null;
+			}
+		});
+		afterProcessResult(textarea.ul);
+	}
+	
+	new Ajax.Request('/ajax/query/stream/', {
 		method: 'post',
 		parameters: {
 			query: textarea.value
 		},
+		onInteractive: processLines,
 		onSuccess: function(transport) {
-			textarea.ul.select('li[class!=request][class!=submitbutton]').invoke('deleteElement');
-			if (!transport.responseText) {
+			processLines(transport);
+			if (!done) {
 				// A fatal Python error has occured, e.g. on 4.4329408320439^43214234345
 				// ("Fatal Python error: mp_reallocate failure")
 				// -> print overflow message
-				transport.responseText = '{"results": [{"out": [{"prefix": "General::noserver", "message": true, "tag": "noserver", "symbol": "General", "text": "<math><mrow><mtext>No server running.</mtext></mrow></math>"}]}]}';
+				var noserver = '{"out": [{"prefix": "General::noserver", "message": true, "tag": "noserver", "symbol": "General", "text": "<math><mrow><mtext>No server running.</mtext></mrow></math>"}]}';
+				if (!cleared)
+					textarea.ul.select('li[class!=request][class!=submitbutton]').invoke('deleteElement');
+				var result = noserver.evalJSON();
+				results.push(result);
+				setResult(textarea.ul, [result]);
 			}
-			var response = transport.responseText.evalJSON();
-			setResult(textarea.ul, response.results);
 			textarea.submitted = true;
-			textarea.results = response.results;
+			textarea.results = results;
 			var next = textarea.li.nextSibling;
 			if (next)
 				next.textarea.focus();
@@ -0,0 +1,160 @@
+# -*- coding: utf8 -*-
+
+u"""
+    Mathics: a general-purpose computer algebra system
+    Copyright (C) 2011-2013 The Mathics Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import threading
+import cPickle as pickle
+from collections import OrderedDict
+
+from mathics.builtin.base import RuleCache
+
+
+def get_builtin_fingerprint(packages=('mathics.core.', 'mathics.builtin.'),
+                            paths=()):
+    """
+    Returns a hash of the sources of the core and builtin modules, which
+    changes whenever the builtin definitions (or the way expressions are
+    evaluated and formatted) might have changed. The modules of further
+    packages and the files in paths (files or directories) can be
+    included.
+    """
+
+    from mathics import __version__
+
+    fingerprint = hashlib.md5(__version__)
+    for name, module in sorted(sys.modules.items()):
+        if (module is not None and name.startswith(packages) and
+                getattr(module, '__file__', None)):
+            fingerprint.update(name)
+            fingerprint.update(RuleCache.get_file_hash(module.__file__))
+    for path in paths:
+        filenames = [path]
+        if os.path.isdir(path):
+            filenames = sorted(
+                os.path.join(directory, name)
+                for directory, subdirectories, names in os.walk(path)
+                for name in names)
+        for filename in filenames:
+            if os.path.isfile(filename):
+                fingerprint.update(filename)
+                fingerprint.update(RuleCache.get_file_hash(filename))
+    return fingerprint.hexdigest()
+
+
+class ResultCache(object):
+    """
+    Output that does not depend on any user definitions, like the
+    rendered pages of the documentation, keyed by an input (e.g. the
+    page), the output format and a fingerprint of everything the output
+    depends on.
+
+    The max_count most recently used entries are kept in memory, and all
+    of them in files in a subdirectory of directory named after the
+    fingerprint. Subdirectories of other fingerprints are removed, so the
+    cache is invalidated whenever the builtins change.
+    """
+
+    def __init__(self, fingerprint, directory=None, max_count=1000):
+        self.fingerprint = fingerprint
+        self.directory = None
+        if directory is not None:
+            self.directory = os.path.join(directory, fingerprint)
+            self.remove_stale(directory)
+        self.max_count = max_count
+        self.entries = OrderedDict()    # least recently used first
+        self.lock = threading.Lock()
+
+    def remove_stale(self, directory):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        for name in names:
+            if name != self.fingerprint:
+                shutil.rmtree(os.path.join(directory, name), True)
+
+    def get_key(self, input, format):
+        key = hashlib.sha1(self.fingerprint)
+        key.update(format)
+        key.update('\0')
+        key.update(input.encode('utf8'))
+        return key.hexdigest()
+
+    def get_filename(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, input, format):
+        "Returns the cached data for input, or None."
+
+        key = self.get_key(input, format)
+        with self.lock:
+            data = self.entries.pop(key, None)
+            if data is None:
+                data = self.read(key)
+                if data is None:
+                    return None
+            self.entries[key] = data
+            self.evict()
+        return data
+
+    def set(self, input, format, data, persist=True):
+        """
+        Stores data for input; unless persist is true, only in memory,
+        e.g. for inputs chosen by visitors.
+        """
+
+        key = self.get_key(input, format)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = data
+            self.evict()
+            if persist:
+                self.write(key, data)
+
+    def evict(self):
+        while len(self.entries) > self.max_count:
+            self.entries.popitem(last=False)
+
+    def read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.get_filename(key), 'rb') as result_file:
+                return pickle.load(result_file)
+        except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+
+    def write(self, key, data):
+        if self.directory is None:
+            return
+        filename = self.get_filename(key)
+        try:
+            directory = os.path.dirname(filename)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_filename = filename + '.%d' % os.getpid()
+            with open(temp_filename, 'wb') as result_file:
+                pickle.dump(data, result_file, -1)
+            os.rename(temp_filename, filename)
+        except (IOError, OSError):
+            pass
@@ -24,6 +24,7 @@ urlpatterns = patterns(
     'mathics.web.views',
     ('^$', 'main_view'),
     ('^ajax/query/$', 'query'),
+    ('^ajax/query/stream/$', 'query_stream'),
     ('^ajax/login/$', 'login'),
     ('^ajax/logout/$', 'logout'),
     ('^ajax/save/$', 'save'),
@@ -18,13 +18,18 @@ u"""
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import os
 import sys
+import atexit
 import traceback
+import threading
+import Queue
 
 from django.shortcuts import render_to_response
 from django.template import RequestContext, loader
 from django.http import (HttpResponse, HttpResponseNotFound,
-                         HttpResponseServerError, Http404)
+                         HttpResponseServerError, Http404,
+                         StreamingHttpResponse)
 import json
 from django.conf import settings
 from django.contrib import auth
@@ -32,9 +37,13 @@ from django.contrib.auth.models import User
 
 from mathics.core.parser import parse, TranslateError
 from mathics.core.definitions import Definitions
+from mathics.core.expression import Symbol
 from mathics.core.evaluation import Evaluation, Message, Result
 
 from mathics.web.models import Query, Worksheet
+from mathics.web.kernels import KernelManager
+from mathics.web.workers import WorkerPool, WorkerError, WorkerTimeout
+from mathics.web.results import ResultCache, get_builtin_fingerprint
 from mathics.web.forms import LoginForm, SaveForm
 from mathics.doc import documentation
 from mathics.doc.doc import DocPart, DocChapter, DocSection
@@ -65,6 +74,150 @@ def require_ajax_login(func):
 
 definitions = Definitions(add_builtin=True)
 
+kernel_options = {
+    'directory': settings.KERNEL_DIR,
+    'idle_timeout': settings.KERNEL_IDLE_TIMEOUT,
+    'max_count': settings.KERNEL_MAX_COUNT,
+    'file_timeout': settings.KERNEL_FILE_TIMEOUT,
+}
+if settings.EVALUATION_WORKERS:
+    kernels = None
+    workers = WorkerPool(definitions, settings.EVALUATION_WORKERS,
+                         **kernel_options)
+    atexit.register(workers.stop)
+else:
+    kernels = KernelManager(definitions, **kernel_options)
+    workers = None
+    atexit.register(kernels.spill_all)
+
+pages = ResultCache(
+    get_builtin_fingerprint(
+        packages=('mathics.core.', 'mathics.builtin.', 'mathics.doc.',
+                  'mathics.web.'),
+        paths=(settings.DOC_DIR, settings.DOC_XML_DATA,
+               os.path.join(settings.ROOT_DIR, 'web', 'templates'))),
+    settings.RESULT_CACHE_DIR, settings.RESULT_CACHE_MAX_COUNT)
+
+
+def get_kernel_id(request):
+    kernel_id = request.session.get('kernel')
+    if not KernelManager.is_valid_id(kernel_id):
+        kernel_id = KernelManager.new_id()
+        request.session['kernel'] = kernel_id
+    # sessions from before kernels were kept on the server carry their
+    # serialized definitions
+    user_definitions = request.session.pop('definitions', None)
+    return kernel_id, user_definitions
+
+
+def get_exception_results(exc, info):
+    msg = 'Exception raised: %s\n\n%s' % (exc, info)
+    return [Result([Message('System', 'exception', msg)], None,
+                   None).get_data()]
+
+
+def get_timeout_results():
+    evaluation = Evaluation(definitions=definitions, format='xml')
+    evaluation.message('General', 'timeout')
+    result = evaluation.format_output(Symbol('$Aborted'))
+    return [Result(evaluation.out, result, None).get_data()]
+
+
+def evaluate_query(request, input):
+    """
+    Evaluates input in the kernel of the request's session. Returns the
+    data of the results and whether the evaluation timed out.
+    """
+
+    kernel_id, user_definitions = get_kernel_id(request)
+    if workers is not None:
+        try:
+            return workers.evaluate(kernel_id, user_definitions, input,
+                                    settings.TIMEOUT)
+        except WorkerTimeout:
+            return get_timeout_results(), True
+        except WorkerError, exc:
+            if settings.DEBUG and settings.DISPLAY_EXCEPTIONS:
+                return get_exception_results(
+                    exc, 'in evaluation process'), False
+            raise
+
+    with kernels.use(kernel_id, user_definitions) as kernel:
+        try:
+            evaluation = Evaluation(input, kernel.definitions,
+                                    timeout=settings.TIMEOUT, format='xml')
+        except Exception, exc:
+            if settings.DEBUG and settings.DISPLAY_EXCEPTIONS:
+                info = traceback.format_exception(*sys.exc_info())
+                return get_exception_results(exc, '\n'.join(info)), False
+            raise
+    return [result.get_data() for result in evaluation.results], \
+        evaluation.timeout
+
+
+def stream_query(kernel_id, user_definitions, input):
+    """
+    Evaluates input in the given kernel like evaluate_query, but yields
+    ('out', data) for every message and printed output and ('result',
+    data) for every result as soon as they are available, and finally
+    ('done', timed_out). Closing the generator cancels the evaluation.
+    """
+
+    if workers is not None:
+        records = workers.stream(kernel_id, user_definitions, input,
+                                 settings.TIMEOUT)
+        try:
+            for record in records:
+                yield record
+        except WorkerTimeout:
+            yield 'result', get_timeout_results()[0]
+            yield 'done', True
+        except WorkerError, exc:
+            if settings.DEBUG and settings.DISPLAY_EXCEPTIONS:
+                yield 'result', get_exception_results(
+                    exc, 'in evaluation process')[0]
+                yield 'done', False
+            else:
+                raise
+        finally:
+            records.close()
+        return
+
+    kernel = kernels.get(kernel_id, user_definitions, pin=True)
+    records = Queue.Queue()
+    evaluation = Evaluation(
+        definitions=kernel.definitions, format='xml',
+        out_callback=lambda out: records.put(('out', out.get_data())),
+        result_callback=lambda result: records.put(
+            ('result', result.get_data())))
+
+    def evaluate():
+        try:
+            with kernel.lock:
+                evaluation.evaluate_input(input, settings.TIMEOUT)
+        except Exception, exc:
+            if settings.DEBUG and settings.DISPLAY_EXCEPTIONS:
+                info = traceback.format_exception(*sys.exc_info())
+                records.put(('result', get_exception_results(
+                    exc, '\n'.join(info))[0]))
+            else:
+                traceback.print_exc()
+        finally:
+            kernels.unpin(kernel)
+            records.put(('done', evaluation.timeout))
+
+    thread = threading.Thread(target=evaluate)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            kind, data = records.get()
+            yield kind, data
+            if kind == 'done':
+                break
+    finally:
+        evaluation.cancel()
+
 
 def require_ajax_login(f):
     return f
@@ -94,50 +247,86 @@ def error_500_view(request):
     })))
 
 
-def query(request):
+def get_query_input(request):
     input = request.POST.get('query', '')
     if settings.DEBUG and not input:
         input = request.GET.get('query', '')
+    return input
+
+
+def log_query(request, input):
+    query_log = Query(query=input, error=True,
+                      browser=request.META.get('HTTP_USER_AGENT', ''),
+                      remote_user=request.META.get('REMOTE_USER', ''),
+                      remote_addr=request.META.get('REMOTE_ADDR', ''),
+                      remote_host=request.META.get('REMOTE_HOST', ''),
+                      meta=unicode(request.META),
+                      log='',
+                      )
+    query_log.save()
+    return query_log
+
+
+def log_query_result(query_log, result, timeout):
+    query_log.timeout = timeout
+    query_log.result = unicode(result)  # evaluation.results
+    query_log.error = False
+    query_log.save()
+
+
+def query(request):
+    input = get_query_input(request)
 
     if settings.LOG_QUERIES:
-        query_log = Query(query=input, error=True,
-                          browser=request.META.get('HTTP_USER_AGENT', ''),
-                          remote_user=request.META.get('REMOTE_USER', ''),
-                          remote_addr=request.META.get('REMOTE_ADDR', ''),
-                          remote_host=request.META.get('REMOTE_HOST', ''),
-                          meta=unicode(request.META),
-                          log='',
-                          )
-        query_log.save()
-
-    user_definitions = request.session.get('definitions')
-    definitions.set_user_definitions(user_definitions)
-    try:
-        evaluation = Evaluation(
-            input, definitions, timeout=settings.TIMEOUT, format='xml')
-    except Exception, exc:
-        if settings.DEBUG and settings.DISPLAY_EXCEPTIONS:
-            evaluation = Evaluation()
-            info = traceback.format_exception(*sys.exc_info())
-            info = '\n'.join(info)
-            msg = 'Exception raised: %s\n\n%s' % (exc, info)
-            evaluation.results = [Result([Message(
-                'System', 'exception', msg)], None, None)]
-        else:
-            raise
+        query_log = log_query(request, input)
+
+    results, timeout = evaluate_query(request, input)
     result = {
-        'results': [result.get_data() for result in evaluation.results],
+        'results': results,
     }
-    request.session['definitions'] = definitions.get_user_definitions()
 
     if settings.LOG_QUERIES:
-        query_log.timeout = evaluation.timeout
-        query_log.result = unicode(result)  # evaluation.results
-        query_log.error = False
-        query_log.save()
+        log_query_result(query_log, result, timeout)
 
     return JsonResponse(result)
 
+
+def query_stream(request):
+    """
+    Like query, but sends a line with a JSON object as soon as something
+    is available: {"out": ...} for every message and printed output,
+    {"result": ...} for every result (including its output again) and
+    finally {"done": true, "timeout": ...}. When the client disconnects,
+    the evaluation is cancelled.
+    """
+
+    input = get_query_input(request)
+
+    if settings.LOG_QUERIES:
+        query_log = log_query(request, input)
+
+    # the session is saved before the response is sent
+    kernel_id, user_definitions = get_kernel_id(request)
+    records = stream_query(kernel_id, user_definitions, input)
+
+    def lines():
+        results = []
+        try:
+            for kind, data in records:
+                if kind == 'done':
+                    if settings.LOG_QUERIES:
+                        log_query_result(query_log, {'results': results},
+                                         data)
+                    yield json.dumps({'done': True, 'timeout': data}) + '\n'
+                else:
+                    if kind == 'result':
+                        results.append(data)
+                    yield json.dumps({kind: data}) + '\n'
+        finally:
+            records.close()
+
+    return StreamingHttpResponse(lines(), content_type=JSON_CONTENT_TYPE)
+
 # taken from http://code.activestate.com/recipes/410076/
 
 
@@ -235,9 +424,10 @@ Your password is: %s\n\nYours,\nThe Mathics team""" % password)
 
 def logout(request):
     # Remember user definitions
-    user_definitions = request.session.get('definitions', {})
+    kernel_id = request.session.get('kernel')
     auth.logout(request)
-    request.session['definitions'] = user_definitions
+    if kernel_id is not None:
+        request.session['kernel'] = kernel_id
     return JsonResponse()
 
 
@@ -308,7 +498,27 @@ def get_worksheets(request):
 # auxiliary function
 
 
-def render_doc(request, template_name, context, data=None, ajax=False):
+def render_doc(request, template_name, context, data=None, ajax=False,
+               page=None, persist=True):
+    """
+    Renders a documentation page. Pages only depend on the documentation,
+    so the page rendered for the name page is kept in the page cache (only
+    in memory unless persist is true).
+    """
+
+    format = 'ajax' if ajax else 'html'
+    content = None if page is None else pages.get(page, format)
+    if content is None:
+        content = render_doc_content(
+            request, template_name, context, data, ajax)
+        if page is not None:
+            pages.set(page, format, content, persist)
+    if ajax:
+        return HttpResponse(content, content_type=JSON_CONTENT_TYPE)
+    return HttpResponse(content, content_type=get_content_type(request))
+
+
+def render_doc_content(request, template_name, context, data, ajax):
     object = context.get('object')
     context.update({
         'ajax': ajax,
@@ -325,22 +535,21 @@ def render_doc(request, template_name, context, data=None, ajax=False):
         }
         if data is not None:
             result['data'] = data
-        return JsonResponse(result)
+        return json.dumps(result)
     else:
         context.update({
             'data': data,
         })
-        return render_to_response(
+        return loader.render_to_string(
             'doc/%s' % template_name, context,
-            context_instance=RequestContext(request),
-            content_type=get_content_type(request))
+            context_instance=RequestContext(request))
 
 
 def doc(request, ajax=''):
     return render_doc(request, 'overview.html', {
         'title': u'Documentation',
         'doc': documentation,
-    }, ajax=ajax)
+    }, ajax=ajax, page='overview')
 
 
 def doc_part(request, part, ajax=''):
@@ -351,7 +560,7 @@ def doc_part(request, part, ajax=''):
         'title': part.get_title_html(),
         'part': part,
         'object': part,
-    }, ajax=ajax)
+    }, ajax=ajax, page='part/%s' % part.slug)
 
 
 def doc_chapter(request, part, chapter, ajax=''):
@@ -362,20 +571,20 @@ def doc_chapter(request, part, chapter, ajax=''):
         'title': chapter.get_title_html(),
         'chapter': chapter,
         'object': chapter,
-    }, ajax=ajax)
+    }, ajax=ajax, page='chapter/%s/%s' % (chapter.part.slug, chapter.slug))
 
 
 def doc_section(request, part, chapter, section, ajax=''):
     section = documentation.get_section(part, chapter, section)
     if not section:
         raise Http404
-    data = section.html_data()
     return render_doc(request, 'section.html', {
         'title': section.get_title_html(),
         'title_operator': section.operator,
         'section': section,
         'object': section,
-    }, data=data, ajax=ajax)
+    }, data=section.html_data(), ajax=ajax, page='section/%s/%s/%s' % (
+        section.chapter.part.slug, section.chapter.slug, section.slug))
 
 
 def doc_search(request):
@@ -398,4 +607,4 @@ def doc_search(request):
     return render_doc(request, 'search.html', {
         'title': u"Search documentation",
         'result': result,
-    }, ajax=True)
+    }, ajax=True, page=u'search/%s' % query, persist=False)
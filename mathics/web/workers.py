@@ -0,0 +1,263 @@
+# -*- coding: utf8 -*-
+
+u"""
+    Mathics: a general-purpose computer algebra system
+    Copyright (C) 2011-2013 The Mathics Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import time
+import threading
+import traceback
+import multiprocessing
+
+from mathics.core.evaluation import Evaluation
+from mathics.web.kernels import KernelManager
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerTimeout(WorkerError):
+    pass
+
+
+def watch(control, current):
+    """
+    Cancels the current evaluation of a worker when its serial number is
+    received through control.
+    """
+
+    while True:
+        try:
+            serial = control.recv()
+        except EOFError:
+            break
+        if current.get('serial') == serial:
+            current['evaluation'].cancel()
+
+
+def serve(connection, control, definitions, kernel_options):
+    """
+    Main loop of a worker process: evaluates the queries received through
+    connection in the kernels of their sessions. The results, and the
+    printed output and messages of streamed queries, are sent back as they
+    become available.
+    """
+
+    def out_callback(out):
+        connection.send(('out', out.get_data()))
+
+    def result_callback(result):
+        connection.send(('result', result.get_data()))
+
+    kernels = KernelManager(definitions, **kernel_options)
+    current = {}
+    watcher = threading.Thread(target=watch, args=(control, current))
+    watcher.daemon = True
+    watcher.start()
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        serial, kernel_id, user_definitions, input, timeout, send_out = request
+        try:
+            with kernels.use(kernel_id, user_definitions) as kernel:
+                evaluation = Evaluation(
+                    definitions=kernel.definitions, format='xml',
+                    out_callback=out_callback if send_out else None,
+                    result_callback=result_callback)
+                current.update(serial=serial, evaluation=evaluation)
+                evaluation.evaluate_input(input, timeout)
+            response = ('done', evaluation.timeout)
+        except Exception:
+            info = traceback.format_exception(*sys.exc_info())
+            response = ('exception', '\n'.join(info))
+        current.clear()
+        connection.send(response)
+    kernels.spill_all()
+
+
+class Worker(object):
+    def __init__(self, definitions, kernel_options, grace):
+        self.definitions = definitions
+        self.kernel_options = kernel_options
+        self.grace = grace
+        self.lock = threading.Lock()
+        self.serial = 0
+        self.process = None
+        self.connection = None
+        self.control = None
+
+    def start(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        child_control, self.control = multiprocessing.Pipe(False)
+        self.process = multiprocessing.Process(
+            target=serve, args=(child_connection, child_control,
+                                self.definitions, self.kernel_options))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+        child_control.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except IOError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.close()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.close()
+
+    def close(self):
+        self.connection.close()
+        self.control.close()
+
+    def receive(self, end):
+        try:
+            if end is not None and not self.connection.poll(
+                    max(0, end - time.time())):
+                self.kill()
+                self.start()
+                raise WorkerTimeout()
+            return self.connection.recv()
+        except (EOFError, IOError):
+            # the worker died, e.g. because it ran out of memory
+            self.kill()
+            self.start()
+            raise WorkerError('evaluation process terminated')
+
+    def evaluate(self, request, deadline):
+        """
+        Sends request to the worker and yields the records it sends back,
+        up to the final 'done' or 'exception' record. If the caller stops
+        iterating early, the evaluation is cancelled.
+        """
+
+        with self.lock:
+            if self.process is None or not self.process.is_alive():
+                self.start()
+            self.serial += 1
+            end = None if deadline is None else time.time() + deadline
+            finished = False
+            try:
+                self.connection.send((self.serial,) + request)
+                while not finished:
+                    kind, data = self.receive(end)
+                    finished = kind in ('done', 'exception')
+                    if kind == 'result' and deadline is not None:
+                        # the timeout applies to each query of the input
+                        end = time.time() + deadline
+                    yield kind, data
+            except GeneratorExit:
+                if finished:
+                    raise
+                # skip the output produced until the cancellation is noticed
+                self.control.send(self.serial)
+                end = time.time() + self.grace
+                try:
+                    while self.receive(end)[0] not in ('done', 'exception'):
+                        pass
+                except WorkerError:
+                    pass
+                raise
+
+
+class WorkerPool(object):
+    """
+    Evaluates web queries in a number of pre-started processes, each
+    forked from the server after the builtin definitions have been
+    loaded. Every session is always sent to the same worker, which keeps
+    the session's kernel (see mathics.web.kernels).
+
+    A query that takes longer than the timeout plus a grace period is
+    stopped by restarting its worker; the in-memory kernels of that
+    worker are lost.
+    """
+
+    def __init__(self, definitions, count, grace=5, **kernel_options):
+        self.definitions = definitions
+        self.count = count
+        self.grace = grace
+        self.kernel_options = kernel_options
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.workers:
+                return
+            self.workers = [Worker(self.definitions, self.kernel_options,
+                                   self.grace)
+                            for index in range(self.count)]
+            for worker in self.workers:
+                worker.start()
+
+    def stop(self):
+        with self.lock:
+            for worker in self.workers:
+                worker.stop()
+            self.workers = []
+
+    def get_worker(self, kernel_id):
+        self.start()
+        return self.workers[int(kernel_id, 16) % len(self.workers)]
+
+    def evaluate(self, kernel_id, user_definitions, input, timeout):
+        """
+        Evaluates input in the given kernel and returns the data of the
+        results and whether the evaluation timed out. Raises WorkerTimeout
+        when the worker had to be stopped and WorkerError when evaluating
+        raised an exception or the worker died.
+        """
+
+        results = []
+        for kind, data in self.stream(kernel_id, user_definitions, input,
+                                      timeout, send_out=False):
+            if kind == 'result':
+                results.append(data)
+            elif kind == 'done':
+                return results, data
+
+    def stream(self, kernel_id, user_definitions, input, timeout,
+               send_out=True):
+        """
+        Like evaluate, but yields ('out', data) for every message and
+        printed output, ('result', data) for every result, and finally
+        ('done', timed_out). Closing the generator cancels the evaluation.
+        """
+
+        worker = self.get_worker(kernel_id)
+        deadline = None if timeout is None else timeout + self.grace
+        request = (kernel_id, user_definitions, input, timeout, send_out)
+        records = worker.evaluate(request, deadline)
+        try:
+            for kind, data in records:
+                if kind == 'exception':
+                    raise WorkerError(data)
+                yield kind, data
+        finally:
+            records.close()
@@ -187,6 +187,7 @@ setup(
         'console_scripts': [
             'mathics = mathics.main:main',
             'mathicsserver = mathics.server:main',
+            'mathicsbatch = mathics.batch:main',
         ],
     },
 
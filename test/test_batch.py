@@ -0,0 +1,84 @@
+import sys
+from StringIO import StringIO
+
+from mathics.batch import BatchPool, read_inputs
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class BatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = BatchPool(processes=2, timeout=2, grace=2)
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.stop()
+
+    def get_results(self, record):
+        return [result['result'] for result in record['results']]
+
+    def testOrder(self):
+        inputs = ['%d^2' % i for i in range(20)]
+        records = self.pool.map(inputs)
+        self.assertEqual([record['index'] for record in records], range(20))
+        self.assertEqual([self.get_results(record) for record in records],
+                         [[unicode(i ** 2)] for i in range(20)])
+
+    def testUnordered(self):
+        inputs = ['Pause[0.5]; 1', '2', '3']
+        records = list(self.pool.imap(inputs, ordered=False))
+        self.assertEqual(sorted(record['index'] for record in records),
+                         [0, 1, 2])
+        self.assertEqual(records[-1]['index'], 0)
+
+    def testIsolation(self):
+        records = self.pool.map(['x = 1', 'x', 'x'])
+        self.assertEqual([self.get_results(record) for record in records],
+                         [[u'1'], [u'x'], [u'x']])
+        self.assertEqual([record['results'][0]['line'] for record in records],
+                         [1, 1, 1])
+
+    def testTimeout(self):
+        records = self.pool.map(['While[True]', '1 + 1'])
+        self.assertTrue(records[0]['timeout'])
+        self.assertEqual(self.get_results(records[0]), [u'$Aborted'])
+        self.assertEqual(self.get_results(records[1]), [u'2'])
+
+    def testMessages(self):
+        record, = self.pool.map(['Print["a"]; 1/0'])
+        self.assertEqual([out['text'] for out in record['results'][0]['out']],
+                         [u'a', u'Infinite expression (division by zero) '
+                          'encountered.'])
+        self.assertIsNone(record['error'])
+
+    def testEarlyClose(self):
+        pool = BatchPool(processes=2, timeout=None)
+        with pool:
+            records = pool.imap(['1', 'While[True]', 'While[True]'])
+            self.assertEqual(self.get_results(next(records)), [u'1'])
+            records.close()
+            record, = pool.map(['2 + 2'])
+            self.assertEqual(self.get_results(record), [u'4'])
+            self.assertIsNone(record['error'])
+
+    def testInputError(self):
+        def inputs():
+            yield '1'
+            yield '2'
+            raise ValueError('bad input')
+
+        records = []
+        with self.assertRaises(ValueError):
+            for record in self.pool.imap(inputs()):
+                records.append(self.get_results(record))
+        self.assertEqual(records, [[u'1'], [u'2']])
+
+    def testReadInputs(self):
+        input_file = StringIO('1 + 2\n\nf[x_] :=\n  x^2\n{1,\n 2}')
+        self.assertEqual(list(read_inputs(input_file)),
+                         [u'1 + 2', u'f[x_] :=\n  x^2', u'{1,\n 2}'])
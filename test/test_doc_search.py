@@ -0,0 +1,104 @@
+import sys
+
+from mathics.doc import documentation
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+def title_search(query):
+    """
+    The search before the index: elements whose titles contain all words
+    of query, and sections whose operator is query.
+    """
+
+    query = query.strip()
+    query_parts = [q.strip().lower() for q in query.split()]
+
+    def matches(text):
+        text = text.lower()
+        return all(q in text for q in query_parts)
+
+    result = []
+    for part in documentation.parts:
+        if matches(part.title):
+            result.append((False, part))
+        for chapter in part.chapters:
+            if matches(chapter.title):
+                result.append((False, chapter))
+            for section in chapter.sections:
+                if matches(section.title):
+                    result.append((section.title == query, section))
+                elif query == section.operator:
+                    result.append((True, section))
+    return result
+
+
+def titles(result):
+    return [element.title for exact, element in result]
+
+
+class DocSearchTests(unittest.TestCase):
+    queries = ['Plus', 'plus', 'Integrate', 'integ', 'grate', 'Sin',
+               'list', 'Lists', 'string join', 'matrix', '+', '@@', '//',
+               'N', 'q', 'Plot3D']
+
+    def testTitleMatches(self):
+        # everything the title search finds is still found
+        for query in self.queries:
+            result = documentation.search(query)
+            for exact, element in title_search(query):
+                self.assertIn((exact, element), result, (query, element))
+
+    def testExactFirst(self):
+        for query in self.queries:
+            result = documentation.search(query)
+            exact = [(is_exact, element) for is_exact, element in result
+                     if is_exact]
+            expected = [(is_exact, element)
+                        for is_exact, element in title_search(query)
+                        if is_exact]
+            self.assertEqual(sorted(titles(exact)), sorted(titles(expected)),
+                             query)
+            self.assertEqual(result[:len(exact)], exact)
+
+    def testOperator(self):
+        result = documentation.search('+')
+        self.assertIn('Plus', titles(result[:2]))
+        self.assertTrue(result[0][0])
+
+    def testTitlesBeforeText(self):
+        result = documentation.search('Plus')
+        self.assertEqual(result[0], (True, result[0][1]))
+        self.assertEqual(result[0][1].title, 'Plus')
+        ranked = titles(result)
+        # titles containing the word come before sections only using it
+        self.assertLess(ranked.index('PrePlus'), ranked.index('Dice'))
+        self.assertLess(ranked.index('DatePlus'), ranked.index('Dice'))
+
+    def testPrefix(self):
+        ranked = titles(documentation.search('integ'))
+        for title in ('Integer', 'Integrate', 'IntegerDigits'):
+            self.assertIn(title, ranked)
+
+    def testSuffix(self):
+        self.assertEqual(titles(documentation.search('grate')),
+                         ['Integrate'])
+        self.assertIn('FactorInteger', titles(documentation.search('integer')))
+
+    def testText(self):
+        # words of the text are found, unlike with the title search
+        result = documentation.search('Pochhammer')
+        self.assertTrue(len(result) >= len(title_search('Pochhammer')))
+        self.assertEqual(documentation.search('nosuchword'), [])
+
+    def testAllWords(self):
+        ranked = titles(documentation.search('string join'))
+        self.assertIn('StringJoin', ranked)
+        self.assertNotIn('Join', ranked)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+import sys
+import time
+import threading
+
+import mathics.core.evaluation
+from mathics import settings
+from mathics.core.definitions import Definitions
+from mathics.core.evaluation import Evaluation
+from mathics.core.expression import Expression, Integer, Symbol, String
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+definitions = None
+
+
+def setUpModule():
+    global definitions
+    definitions = Definitions(add_builtin=True)
+
+
+def evaluate(input, **kwargs):
+    evaluation = Evaluation(input, definitions, format='text', **kwargs)
+    return [result.result for result in evaluation.results]
+
+
+def integers(count):
+    return Expression('List', *[Integer(i) for i in range(count)])
+
+
+class GetSizeTests(unittest.TestCase):
+    def testNodes(self):
+        expr = Expression('f', Symbol('x'), Integer(1))
+        self.assertEqual(expr.get_size()[0], 4)
+        self.assertEqual(Integer(1).get_size()[0], 1)
+        self.assertEqual(integers(100).get_size()[0], 102)
+
+    def testBytes(self):
+        self.assertGreater(String('a' * 1000).get_size()[1], 1000)
+        self.assertGreater(Integer(2 ** 8000).get_size()[1], 1000)
+        self.assertGreater(integers(200).get_size()[1],
+                           integers(100).get_size()[1])
+
+    def testLimits(self):
+        # the walk stops right after a limit is exceeded
+        expr = integers(10 ** 5)
+        start = time.time()
+        nodes, size = expr.get_size(max_nodes=10)
+        self.assertEqual(nodes, 11)
+        nodes, size = expr.get_size(max_bytes=100)
+        self.assertGreater(size, 100)
+        self.assertLess(nodes, 10)
+        self.assertLess(time.time() - start, 0.1)
+
+
+class StoredResultTests(unittest.TestCase):
+    def setUp(self):
+        self.settings = settings.MAX_STORED_SIZE, settings.MAX_STORED_NODES
+
+    def tearDown(self):
+        settings.MAX_STORED_SIZE, settings.MAX_STORED_NODES = self.settings
+
+    def stored(self, expr):
+        return Evaluation(definitions=definitions).get_stored_result(expr)
+
+    def testDefault(self):
+        self.assertTrue(self.stored(integers(100)).same(integers(100)))
+        self.assertTrue(self.stored(integers(10 ** 4)).same(Symbol('Null')))
+
+    def testSize(self):
+        settings.MAX_STORED_SIZE = 100
+        self.assertTrue(self.stored(integers(2)).same(integers(2)))
+        self.assertTrue(self.stored(integers(100)).same(Symbol('Null')))
+        settings.MAX_STORED_SIZE = None
+        self.assertTrue(self.stored(integers(10 ** 4)).same(
+            integers(10 ** 4)))
+
+    def testNodes(self):
+        settings.MAX_STORED_SIZE = None
+        settings.MAX_STORED_NODES = 4
+        self.assertTrue(self.stored(integers(2)).same(integers(2)))
+        self.assertTrue(self.stored(integers(3)).same(Symbol('Null')))
+
+    def testFormat(self):
+        settings.MAX_STORED_SIZE = 100
+        expr = Expression('TraditionalForm', integers(2))
+        self.assertTrue(self.stored(expr).same(integers(2)))
+
+    def testOut(self):
+        settings.MAX_STORED_SIZE = 100
+        self.assertEqual(evaluate('{1, 2}\n%'), ['{1, 2}', '{1, 2}'])
+        self.assertEqual(evaluate('Range[30]\n%')[1], None)
+
+
+class HistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.definitions = Definitions()
+        self.definitions.builtin = definitions.builtin
+
+    def evaluate(self, input):
+        evaluation = Evaluation(input, self.definitions, format='text')
+        return evaluation.results[-1].result
+
+    def testDefinition(self):
+        self.evaluate('1 + 1')
+        self.assertIn('In[1]', self.evaluate('Definition[In]'))
+        self.assertIn('%1', self.evaluate('Definition[Out]'))
+        self.assertNotIn('System`In', self.definitions.user)
+        self.assertNotIn('System`Out', self.definitions.user)
+
+    def testSerialized(self):
+        self.evaluate('x = 2')
+        self.evaluate('x + 1')
+        restored = Definitions()
+        restored.builtin = definitions.builtin
+        restored.set_user_definitions(
+            self.definitions.get_user_definitions())
+        self.definitions = restored
+        self.assertEqual(self.evaluate('{%, %%, In[1]}'), '{3, 2, 2}')
+
+
+class MemoryTests(unittest.TestCase):
+    def setUp(self):
+        self.max_memory = settings.MAX_MEMORY
+        settings.MAX_MEMORY = 100 * 1024 ** 2
+
+    def tearDown(self):
+        settings.MAX_MEMORY = self.max_memory
+
+    def testRange(self):
+        evaluation = Evaluation(definitions=definitions, format='text')
+        start = time.time()
+        evaluation.evaluate_input('Range[10^8]')
+        result = evaluation.results[0]
+        self.assertEqual(result.result, '$Aborted')
+        self.assertEqual([(out.symbol, out.tag) for out in result.out],
+                         [('General', 'nomem')])
+        self.assertLess(time.time() - start, 5)
+
+    def testUnknownUsage(self):
+        # the estimate is checked even where the process memory is unknown
+        evaluation = Evaluation(definitions=definitions, format='text')
+        original = mathics.core.evaluation.get_memory_usage
+        mathics.core.evaluation.get_memory_usage = lambda: None
+        try:
+            evaluation.evaluate_input('Range[10^8]')
+            evaluation.evaluate_input('Length[Range[10^3]]')
+        finally:
+            mathics.core.evaluation.get_memory_usage = original
+        self.assertEqual([result.result for result in evaluation.results],
+                         ['$Aborted', '1000'])
+
+
+class TimeoutTests(unittest.TestCase):
+    def in_thread(self, function, *args, **kwargs):
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(function(*args, **kwargs)))
+        thread.start()
+        thread.join()
+        return results[0]
+
+    def testMainThread(self):
+        # Pause never calls check_stopped, so only the signal stops it
+        start = time.time()
+        self.assertEqual(evaluate('Pause[10]; 1', timeout=0.5), ['$Aborted'])
+        self.assertLess(time.time() - start, 5)
+
+    def testOtherThread(self):
+        start = time.time()
+        self.assertEqual(self.in_thread(evaluate, 'While[True]; 1',
+                                        timeout=0.5),
+                         ['$Aborted'])
+        self.assertLess(time.time() - start, 5)
+
+    def testExpand(self):
+        # multiplying out the polynomial checks the deadline
+        start = time.time()
+        self.assertEqual(
+            self.in_thread(evaluate, 'Expand[(a + b + c + d) ^ 40]; 1',
+                           timeout=0.5),
+            ['$Aborted'])
+        self.assertLess(time.time() - start, 5)
+
+    def testTimeoutMessage(self):
+        evaluation = Evaluation(definitions=definitions, format='text')
+        evaluation.evaluate_input('While[True]\n1 + 1', timeout=0.5)
+        self.assertTrue(evaluation.results[0].out)
+        self.assertEqual([result.result for result in evaluation.results],
+                         ['$Aborted', '2'])
+
+    def testCPUTimeout(self):
+        evaluation = Evaluation(definitions=definitions, format='text')
+        start = time.time()
+        evaluation.evaluate_input('While[True]', cpu_timeout=0.5)
+        self.assertEqual(evaluation.results[0].result, '$Aborted')
+        self.assertLess(time.time() - start, 5)
+        # waiting takes no CPU time
+        evaluation.evaluate_input('Pause[1]; 1', cpu_timeout=0.5)
+        self.assertEqual(evaluation.results[1].result, '1')
+
+    def testCancelEvent(self):
+        event = threading.Event()
+        timer = threading.Timer(0.5, event.set)
+        timer.start()
+        evaluation = Evaluation(definitions=definitions, format='text',
+                                cancel_event=event)
+        start = time.time()
+        evaluation.evaluate_input('1\nWhile[True]\n2')
+        timer.join()
+        self.assertLess(time.time() - start, 5)
+        # the cancelled query has no result, and the ones after it are
+        # skipped
+        self.assertEqual([result.result for result in evaluation.results],
+                         ['1'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import sys
+import sympy
+from mpmath.libmp import from_man_exp
+
+from mathics.core.definitions import Definitions
+from mathics.core.evaluation import Evaluation
+from mathics.core.expression import (Expression, Symbol, Integer, Real,
+                                     Complex, String, from_python)
+from mathics.core.parser import parse
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+definitions = None
+
+
+def setUpModule():
+    global definitions
+    definitions = Definitions(add_builtin=True)
+
+
+def evaluate(input):
+    evaluation = Evaluation(input, definitions, format='text')
+    return evaluation.results[-1].result
+
+
+def parse_evaluate(input):
+    evaluation = Evaluation(definitions=definitions)
+    return parse(input, definitions).evaluate(evaluation)
+
+
+class HeadComparisonTests(unittest.TestCase):
+    # heads are compared like ==, which also takes numbers of different
+    # types or precisions as equal
+
+    def check(self, input, output):
+        self.assertEqual(evaluate(input), output)
+
+    def testFlatten(self):
+        self.check('Flatten[f[f[a, f[b]], g[f[c]]], Infinity, f]',
+                   'f[a, b, g[f[c]]]')
+        self.check('Flatten[f[x][f[x][a], f[y][b]], Infinity, f[x]]',
+                   'f[x][a, f[y][b]]')
+        self.check('Flatten[2[2[a], 2.[b]], Infinity, 2]', '2[a, b]')
+        self.check(
+            'Flatten[1.[1.[a], 1.00000000000000000001[b]], Infinity, 1.]',
+            '1.[a, b]')
+        self.check('Flatten["f"[f[a], "f"[b]], Infinity, "f"]',
+                   'f[f[a], b]')
+
+    def testFlat(self):
+        self.check('SetAttributes[g, Flat]; g[a, g[b, g[c]], h[g[d]]]',
+                   'g[a, b, c, h[g[d]]]')
+
+    def testThread(self):
+        self.check('Thread[f[g[a, b], g[c, d], h[e]], g]',
+                   'g[f[a, c, h[e]], f[b, d, h[e]]]')
+        self.check('Thread[f[2[a, b], 2.[c, d]], 2]', '2[f[a, c], f[b, d]]')
+
+
+class RealHashTests(unittest.TestCase):
+    def check(self, a, b):
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+
+    def testMachine(self):
+        self.check(Real(0.1 + 0.2), Real(0.3))
+        self.check(Real(0.), Real('0.'))
+        self.check(Real(-2.5), Real('-2.5'))
+
+    def testLastBits(self):
+        # 1 + 3 * 2 ^ -63 at machine precision
+        other = Real(1.)
+        other.value = sympy.Float._new(from_man_exp(2 ** 63 + 3, -63),
+                                       other.prec)
+        self.assertFalse(other.same(Real(1.)))
+        self.check(other, Real(1.))
+
+    def testPrecision(self):
+        self.check(Real('1.0'), Real('1.00000000000000000001'))
+        self.check(Real(0.5), Real('0.5', 100))
+
+    def testDictionary(self):
+        values = {Real(0.3): 'a'}
+        self.assertEqual(values.get(Real(0.1 + 0.2)), 'a')
+
+
+class ExpressionHashTests(unittest.TestCase):
+    def check(self, a, b):
+        self.assertTrue(a.same(b))
+        self.assertEqual(hash(a), hash(b))
+
+    def testEqual(self):
+        self.check(Expression('f', Symbol('x'), Integer(1)),
+                   Expression(Symbol('f'), Symbol('x'), Integer(1)))
+        self.check(parse_evaluate('{1, 2/3, x ^ 2, "s", g[y]}'),
+                   parse_evaluate('{3 - 2, 4/6, x * x, "s", g[y]}'))
+
+    def testReals(self):
+        self.check(Expression('f', Real(0.5), Complex(Real(1.5), Real(2.))),
+                   Expression('f', Real('0.5'), Complex(Real('1.5'),
+                                                        Real('2.'))))
+        self.check(parse_evaluate('{0.1 + 0.2, N[Pi]}'),
+                   parse_evaluate('{0.3, 3.14159265358979324}'))
+
+    def testDictionary(self):
+        values = {parse_evaluate('f[x, {1.5, 2}]'): 'a'}
+        self.assertEqual(values.get(parse_evaluate('f[x, {3/2 * 1., 2}]')),
+                         'a')
+
+    def testFromPython(self):
+        expr = Expression('f', Symbol('x'))
+        self.assertIs(from_python(expr), expr)
+        self.check(from_python([1, 'a', 1.5]),
+                   Expression('List', Integer(1), String('a'), Real(1.5)))
+
+
+class SortTests(unittest.TestCase):
+    def testSameAsComparisons(self):
+        # sorting by the sort keys gives the order of __cmp__
+        leaves = parse_evaluate(
+            'Hold[b, 1.0000000000000000001, a, 2, 1.5, x ^ 2, 1 / 2, "s", '
+            'g[x], 1., 2 I, 1 + x, x * y, -3, y ^ x, "a", 2.5 + I]').leaves
+        for order in (leaves, leaves[::-1]):
+            by_key = sorted(order, key=lambda leaf: leaf.get_sort_key())
+            by_cmp = sorted(order)
+            self.assertEqual([unicode(leaf) for leaf in by_key],
+                             [unicode(leaf) for leaf in by_cmp])
+
+    def testOrderless(self):
+        self.assertEqual(
+            evaluate('SetAttributes[o, Orderless]; '
+                     'o[b, a, 2, 1.5, x ^ 2, 1 / 2, "s", g[x]]'),
+            'o[1 / 2, 1.5, 2, s, a, b, x ^ 2, g[x]]')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from mathics.core.definitions import Definitions
+from mathics.core.evaluation import Evaluation
+from mathics.web.kernels import KernelManager
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+definitions = None
+
+
+def setUpModule():
+    global definitions
+    definitions = Definitions(add_builtin=True)
+
+
+def evaluate(kernel, input):
+    evaluation = Evaluation(input, kernel.definitions, format='text')
+    return evaluation.results[-1].result
+
+
+class KernelManagerTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.kernels = KernelManager(definitions, self.directory,
+                                     max_count=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testState(self):
+        kernel_id = KernelManager.new_id()
+        with self.kernels.use(kernel_id) as kernel:
+            self.assertEqual(evaluate(kernel, 'x = 2'), '2')
+        with self.kernels.use(kernel_id) as kernel:
+            self.assertEqual(evaluate(kernel, 'x + 1'), '3')
+            self.assertEqual(evaluate(kernel, '%'), '3')
+        with self.kernels.use(KernelManager.new_id()) as kernel:
+            self.assertEqual(evaluate(kernel, 'x + 1'), '1 + x')
+
+    def testSpill(self):
+        kernel_id = KernelManager.new_id()
+        with self.kernels.use(kernel_id) as kernel:
+            evaluate(kernel, 'x = 2')
+        for index in range(2):
+            self.kernels.get(KernelManager.new_id())
+        self.assertNotIn(kernel_id, self.kernels.kernels)
+        self.assertTrue(os.path.exists(os.path.join(self.directory,
+                                                    kernel_id)))
+        with self.kernels.use(kernel_id) as kernel:
+            self.assertEqual(evaluate(kernel, 'x + 1'), '3')
+        self.assertFalse(os.path.exists(os.path.join(self.directory,
+                                                     kernel_id)))
+
+    def testEmptyKernelsAreNotSpilled(self):
+        for index in range(3):
+            self.kernels.get(KernelManager.new_id())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def testPinned(self):
+        kernel_id = KernelManager.new_id()
+        kernel = self.kernels.get(kernel_id, pin=True)
+        evaluate(kernel, 'x = 2')
+        for index in range(3):
+            self.kernels.get(KernelManager.new_id())
+        self.assertIs(self.kernels.kernels[kernel_id], kernel)
+        self.kernels.unpin(kernel)
+        for index in range(2):
+            self.kernels.get(KernelManager.new_id())
+        self.assertNotIn(kernel_id, self.kernels.kernels)
+
+    def testUserDefinitions(self):
+        source = Definitions()
+        source.builtin = definitions.builtin
+        Evaluation('y = 5', source)
+        kernel_id = KernelManager.new_id()
+        with self.kernels.use(kernel_id,
+                              source.get_user_definitions()) as kernel:
+            self.assertEqual(evaluate(kernel, 'y'), '5')
+
+    def testCleanup(self):
+        kernel_id = KernelManager.new_id()
+        filename = os.path.join(self.directory, kernel_id)
+        other = os.path.join(self.directory, 'other')
+        for name in (filename, other):
+            with open(name, 'wb') as spilled:
+                spilled.write('')
+        old = time.time() - 2 * self.kernels.file_timeout
+        os.utime(filename, (old, old))
+        os.utime(other, (old, old))
+        self.kernels.cleanup()
+        self.assertFalse(os.path.exists(filename))
+        self.assertTrue(os.path.exists(other))
+
+    def testSpillAll(self):
+        kernel_id = KernelManager.new_id()
+        with self.kernels.use(kernel_id) as kernel:
+            evaluate(kernel, 'x = 2')
+        self.kernels.spill_all()
+        self.assertEqual(self.kernels.kernels, {})
+        self.assertEqual(os.listdir(self.directory), [kernel_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 import sys
 import random
-from mathics.core.parser import parse, ParseError, ScanError
+from mathics.core.parser import (parse, ParseError, ScanError,
+                                 UnsupportedSyntax, precedence_parser)
+from mathics.core.parser import parser as ply_parser
 from mathics.core.expression import (Expression, Real, Integer, String,
                                      Rational, Symbol)
 from mathics.core.definitions import Definitions
@@ -383,6 +385,13 @@ class NumberTests(ParserTests):
         self.check('x1 \\[LeftTee] x2', 'LeftTee[x1, x2]')
         self.check('x1 \\[DoubleLeftTee] x2', 'DoubleLeftTee[x1, x2]')
 
+    def testCharacterCodes(self):
+        self.check('\\.7A', Symbol('Global`z'))
+        self.check('\\:004a', Symbol('Global`J'))
+        self.check('\\172', Symbol('Global`z'))
+        self.check('a\\[Theta]\\.7A', Symbol(u'Global`a\u03b8z'))
+        self.check('"\\\\.7A"', String('\\.7A'))
+
     @unittest.expectedFailure
     def testBoxes(self):
         self.check('\\(1 \\^ 2\\)', 'SuperscriptBox["1", "2"]')
@@ -424,5 +433,59 @@ class NumberTests(ParserTests):
         self.assertRaises(ParseError, parse, '[[x')     # bktmcp
 
 
+class PrecedenceParserTests(ParserTests):
+    """
+    The precedence climbing parser must build the same trees as the PLY
+    grammar, or give up so that the grammar handles the input.
+    """
+
+    def compare(self, string):
+        expected = ply_parser.parse(string, definitions)
+        try:
+            result = precedence_parser.parse(string, definitions)
+        except UnsupportedSyntax:
+            return False
+        self.assertTrue(result.same(expected), string)
+        return True
+
+    def testSame(self):
+        for string in [
+                'a + b - c d / e ^ f ^ g',
+                '-a^b!', 'a!!b', 'a != b > c <= d',
+                'f[x_, y_Integer:1] := x + y /; y > 0',
+                'a = b = c', 'a -> b :> c', 'f @@ g @ x // h',
+                '#1 + #2 &[3, 4]', 'x++ ++y', 'a; b;',
+                'f\'\'[x]', 'a::b::c', 'x[[1, 2]]',
+                '{1, , 2}', 'a := b =.', 'x_.', '<< file']:
+            self.assertTrue(self.compare(string), string)
+
+    def testFallback(self):
+        for string in ['a ;; b', 'x /: f[x] = 1', '\\( a \\)', 'a ~ f ~ b']:
+            self.assertFalse(self.compare(string), string)
+        self.check('a ;; b', Expression('Span', Symbol('Global`a'),
+                                        Symbol('Global`b')))
+
+    def testDeepNesting(self):
+        string = 'f[' * 300 + 'x' + ']' * 300
+        self.assertRaises(RuntimeError, precedence_parser.parse, string,
+                          definitions)
+        expr = parse(string)
+        for _ in range(300):
+            self.assertEqual(expr.get_head_name(), 'Global`f')
+            expr = expr.leaves[0]
+        self.check(expr, Symbol('Global`x'))
+
+    def testOtherRuntimeError(self):
+        def fail(string, definitions):
+            raise RuntimeError('other')
+
+        original = precedence_parser.parse
+        precedence_parser.parse = fail
+        try:
+            self.assertRaises(RuntimeError, parse, 'a + b')
+        finally:
+            precedence_parser.parse = original
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,61 @@
+import sys
+
+from mathics import settings
+from mathics.core.definitions import Definitions
+from mathics.core.evaluation import Evaluation
+from mathics.core.parser import parse
+from mathics.builtin.plot import sampling_pool
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class ParallelPlotTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.processes = settings.PLOT_PROCESSES
+        cls.definitions = Definitions(add_builtin=True)
+        cls.evaluate('f[x_] := If[x > 1, Sin[3 x] / x, Sqrt[x - 1/2]]')
+
+    @classmethod
+    def tearDownClass(cls):
+        settings.PLOT_PROCESSES = cls.processes
+        sampling_pool.close()
+
+    @classmethod
+    def evaluate(cls, input, processes=None):
+        settings.PLOT_PROCESSES = processes
+        evaluation = Evaluation(definitions=cls.definitions)
+        return parse(input, cls.definitions).evaluate(evaluation)
+
+    def check_processes(self, plot):
+        serial = self.evaluate(plot)
+        parallel = plot[:-1] + ', Method -> "Parallel"]'
+        one = self.evaluate(parallel, processes=1)
+        three = self.evaluate(parallel, processes=3)
+        self.assertTrue(serial.leaves[0].same(one.leaves[0]))
+        self.assertTrue(one.same(three))
+
+    def testPlot(self):
+        self.check_processes('Plot[f[x], {x, 0, 4}, MaxRecursion -> 1]')
+
+    def testParametricPlot(self):
+        self.check_processes(
+            'ParametricPlot[{f[t], f[2 t]}, {t, 1, 2}, PlotPoints -> 20]')
+
+    def testPlot3D(self):
+        self.check_processes(
+            'Plot3D[f[x + y], {x, 1, 2}, {y, 1, 2}, PlotPoints -> 5]')
+
+    def testUserDefinitions(self):
+        self.evaluate('h[x_] := x^2')
+        first = self.evaluate('Plot[h[x], {x, 0, 1}, Method -> "Parallel"]')
+        self.evaluate('h[x_] := x^3')
+        second = self.evaluate('Plot[h[x], {x, 0, 1}, Method -> "Parallel"]')
+        self.assertFalse(first.leaves[0].same(second.leaves[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
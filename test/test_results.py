@@ -0,0 +1,103 @@
+import os
+import sys
+import shutil
+import tempfile
+
+from mathics.web.results import ResultCache, get_builtin_fingerprint
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testMemory(self):
+        cache = ResultCache('abc')
+        self.assertIsNone(cache.get(u'Plus', 'html'))
+        cache.set(u'Plus', 'html', 'page')
+        self.assertEqual(cache.get(u'Plus', 'html'), 'page')
+        self.assertIsNone(cache.get(u'Plus', 'json'))
+
+    def testFiles(self):
+        ResultCache('abc', self.directory).set(u'Plus', 'html', 'page')
+        cache = ResultCache('abc', self.directory)
+        self.assertEqual(cache.entries, {})
+        self.assertEqual(cache.get(u'Plus', 'html'), 'page')
+
+    def testNotPersisted(self):
+        cache = ResultCache('abc', self.directory)
+        cache.set(u'search', 'json', 'result', persist=False)
+        self.assertEqual(cache.get(u'search', 'json'), 'result')
+        cache = ResultCache('abc', self.directory)
+        self.assertIsNone(cache.get(u'search', 'json'))
+
+    def testEvict(self):
+        cache = ResultCache('abc', self.directory, max_count=2)
+        for name in (u'a', u'b', u'c'):
+            cache.set(name, 'html', name.upper())
+        self.assertEqual(len(cache.entries), 2)
+        # evicted from memory, but read back from its file
+        self.assertEqual(cache.get(u'a', 'html'), 'A')
+        self.assertEqual(len(cache.entries), 2)
+
+    def testFingerprint(self):
+        ResultCache('abc', self.directory).set(u'Plus', 'html', 'old page')
+        cache = ResultCache('def', self.directory)
+        self.assertIsNone(cache.get(u'Plus', 'html'))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'abc')))
+        cache.set(u'Plus', 'html', 'new page')
+        self.assertEqual(os.listdir(self.directory), ['def'])
+        cache = ResultCache('def', self.directory)
+        self.assertEqual(cache.get(u'Plus', 'html'), 'new page')
+
+    def testUnreadableFile(self):
+        cache = ResultCache('abc', self.directory)
+        cache.set(u'Plus', 'html', 'page')
+        filename = cache.get_filename(cache.get_key(u'Plus', 'html'))
+        with open(filename, 'wb') as result_file:
+            result_file.write('garbage')
+        self.assertIsNone(ResultCache('abc', self.directory).get(
+            u'Plus', 'html'))
+
+
+class FingerprintTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'page.xml')
+        self.write('<page/>')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text):
+        with open(self.filename, 'wb') as page:
+            page.write(text)
+
+    def testStable(self):
+        self.assertEqual(get_builtin_fingerprint(paths=(self.directory,)),
+                         get_builtin_fingerprint(paths=(self.directory,)))
+
+    def testPaths(self):
+        fingerprint = get_builtin_fingerprint(paths=(self.directory,))
+        self.assertNotEqual(fingerprint, get_builtin_fingerprint())
+        self.assertEqual(fingerprint,
+                         get_builtin_fingerprint(paths=(self.filename,)))
+        self.write('<page>changed</page>')
+        self.assertNotEqual(fingerprint,
+                            get_builtin_fingerprint(paths=(self.directory,)))
+
+    def testPackages(self):
+        self.assertNotEqual(
+            get_builtin_fingerprint(),
+            get_builtin_fingerprint(packages=('mathics.core.',)))
+
+
+if __name__ == "__main__":
+    unittest.main()
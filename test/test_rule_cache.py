@@ -0,0 +1,94 @@
+import os
+import sys
+import shutil
+import tempfile
+
+from mathics.builtin.base import RuleCache
+from mathics.core import parser, characters
+from mathics.core.parser import parse_builtin_rule
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class Squares(object):
+    pass
+
+
+class RuleCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'rules.pickle')
+        self.key = (Squares.__module__, Squares.__name__)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def store(self, *strings):
+        cache = RuleCache(self.filename)
+        cache.load()
+        for string in strings:
+            cache.parse(Squares, string)
+        cache.save()
+
+    def load(self):
+        cache = RuleCache(self.filename)
+        cache.load()
+        return cache
+
+    def testReuse(self):
+        self.store('f[x_] := x ^ 2')
+        cache = self.load()
+        self.assertIn(self.key, cache.stored)
+        tree = cache.parse(Squares, 'f[x_] := x ^ 2')
+        self.assertTrue(tree.same(parse_builtin_rule('f[x_] := x ^ 2')))
+        self.assertEqual(cache.changed, set())
+
+    def testNewRule(self):
+        self.store('f[x_] := x ^ 2')
+        cache = self.load()
+        tree = cache.parse(Squares, 'g[x_] := x ^ 3')
+        self.assertTrue(tree.same(parse_builtin_rule('g[x_] := x ^ 3')))
+        self.assertEqual(cache.changed, set([self.key]))
+
+    def testChangedSource(self):
+        self.store('f[x_] := x ^ 2')
+        cache = self.load()
+        cache.stored[self.key] = ('other source', cache.stored[self.key][1])
+        cache.parse(Squares, 'f[x_] := x ^ 2')
+        self.assertEqual(cache.changed, set([self.key]))
+
+    def testRemovedBuiltin(self):
+        self.store('f[x_] := x ^ 2')
+        cache = self.load()
+        cache.changed.add(('other', 'Builtin'))
+        cache.parsed[('other', 'Builtin')] = {}
+        cache.source_hashes['other'] = 'hash'
+        cache.save()
+        self.assertEqual(self.load().stored.keys(), [('other', 'Builtin')])
+
+    def testParserChange(self):
+        self.store('f[x_] := x ^ 2')
+        original = parser.PARSER
+        parser.PARSER = 'ply' if original != 'ply' else 'precedence'
+        try:
+            self.assertEqual(self.load().stored, {})
+        finally:
+            parser.PARSER = original
+        self.assertIn(self.key, self.load().stored)
+
+    def testCharacters(self):
+        version = RuleCache(self.filename).get_version()
+        self.assertIn(RuleCache.get_file_hash(characters.__file__), version)
+
+    def testMissingFile(self):
+        cache = self.load()
+        self.assertEqual(cache.stored, {})
+        cache.save()
+        self.assertFalse(os.path.exists(self.filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from mathics.web.kernels import KernelManager
+from mathics.web.workers import WorkerPool, WorkerError
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+views = None
+
+# prints a line every 0.05 seconds for 10 seconds
+SLOW_INPUT = 'Do[Print[i]; Pause[0.05], {i, 200}]'
+
+
+def setUpModule():
+    global views
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mathics.settings')
+    from mathics.web import views
+
+
+class StreamTests(unittest.TestCase):
+    workers = 0
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original = views.workers, views.kernels
+        if self.workers:
+            views.workers = WorkerPool(views.definitions, self.workers,
+                                       grace=1, directory=self.directory)
+            views.kernels = None
+        else:
+            views.workers = None
+            views.kernels = KernelManager(views.definitions, self.directory)
+        self.kernel_id = KernelManager.new_id()
+
+    def tearDown(self):
+        if views.workers is not None:
+            views.workers.stop()
+        views.workers, views.kernels = self.original
+        shutil.rmtree(self.directory)
+
+    def stream(self, input):
+        return views.stream_query(self.kernel_id, None, input)
+
+    def testRecords(self):
+        records = list(self.stream('x = 2; Print[x]; x + 1'))
+        self.assertEqual([kind for kind, data in records],
+                         ['out', 'result', 'done'])
+        self.assertEqual(records[0][1]['text'], '<math><mn>2</mn></math>')
+        self.assertIn('<mn>3</mn>', records[1][1]['result'])
+        self.assertEqual(records[2], ('done', False))
+
+    def testSeveralResults(self):
+        records = list(self.stream('1\n2'))
+        self.assertEqual([kind for kind, data in records],
+                         ['result', 'result', 'done'])
+
+    def testCancel(self):
+        self.assertEqual(list(self.stream('x = 2'))[-1], ('done', False))
+        start = time.time()
+        records = self.stream(SLOW_INPUT)
+        self.assertEqual(next(records)[0], 'out')
+        records.close()
+        # the kernel is usable again long before the input would end
+        records = list(self.stream('x + 1'))
+        self.assertIn('<mn>3</mn>', records[0][1]['result'])
+        self.assertLess(time.time() - start, 5)
+
+
+class WorkerStreamTests(StreamTests):
+    workers = 1
+
+    def testCancelKeepsWorker(self):
+        list(self.stream('1'))
+        process = views.workers.get_worker(self.kernel_id).process
+        records = self.stream(SLOW_INPUT)
+        next(records)
+        records.close()
+        self.assertIs(views.workers.get_worker(self.kernel_id).process,
+                      process)
+        self.assertTrue(process.is_alive())
+
+
+class WorkerErrorTests(unittest.TestCase):
+    def setUp(self):
+        class FailingPool(object):
+            def stream(self, kernel_id, user_definitions, input, timeout):
+                raise WorkerError('evaluation process terminated')
+                yield
+
+        self.original = views.workers
+        views.workers = FailingPool()
+
+    def tearDown(self):
+        views.workers = self.original
+
+    def testMessage(self):
+        records = list(views.stream_query(KernelManager.new_id(), None, '1'))
+        self.assertEqual(records[-1], ('done', False))
+        text = records[0][1]['out'][0]['text']
+        self.assertTrue(text.startswith(
+            'Exception raised: evaluation process terminated\n\n'
+            'in evaluation process'), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from mathics.core.definitions import Definitions
+from mathics.web.kernels import KernelManager
+from mathics.web.workers import WorkerPool, WorkerError, WorkerTimeout
+
+if sys.version_info[:2] == (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+definitions = None
+
+
+def setUpModule():
+    global definitions
+    definitions = Definitions(add_builtin=True)
+
+
+class WorkerPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pool = WorkerPool(definitions, 1, grace=1,
+                               directory=self.directory)
+        self.kernel_id = KernelManager.new_id()
+
+    def tearDown(self):
+        self.pool.stop()
+        shutil.rmtree(self.directory)
+
+    def evaluate(self, input, timeout=None):
+        return self.pool.evaluate(self.kernel_id, None, input, timeout)
+
+    def testRoundTrip(self):
+        results, timed_out = self.evaluate('x = 2; Print[x]; x + 1')
+        self.assertFalse(timed_out)
+        self.assertEqual(len(results), 1)
+        self.assertIn('<mn>3</mn>', results[0]['result'])
+        self.assertEqual([out['text'] for out in results[0]['out']],
+                         ['<math><mn>2</mn></math>'])
+
+    def testKernelState(self):
+        self.evaluate('x = 2')
+        results, timed_out = self.evaluate('x + 1')
+        self.assertIn('<mn>3</mn>', results[0]['result'])
+
+    def testTimeout(self):
+        start = time.time()
+        results, timed_out = self.evaluate('While[True]', timeout=0.5)
+        self.assertTrue(timed_out)
+        self.assertIn('$Aborted', results[0]['result'])
+        self.assertLess(time.time() - start, 5)
+
+    def testKill(self):
+        self.evaluate('x = 2')
+        worker = self.pool.get_worker(self.kernel_id)
+        process = worker.process
+        records = worker.evaluate(
+            (self.kernel_id, None, 'Pause[30]', None, False), 0.5)
+        start = time.time()
+        self.assertRaises(WorkerTimeout, list, records)
+        self.assertLess(time.time() - start, 5)
+        self.assertFalse(process.is_alive())
+        # the restarted worker has lost the kernel
+        results, timed_out = self.evaluate('x + 1')
+        self.assertIn('<mi>x</mi>', results[0]['result'])
+
+    def testError(self):
+        worker = self.pool.get_worker(self.kernel_id)
+        records = worker.evaluate(('invalid id', None, '1', None, False),
+                                  None)
+        kind, data = list(records)[-1]
+        self.assertEqual(kind, 'exception')
+        self.assertIn('AssertionError', data)
+
+
+class EvaluateQueryTests(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mathics.settings')
+        from django.test.client import RequestFactory
+        from mathics.web import views
+
+        class FailingPool(object):
+            def evaluate(self, kernel_id, user_definitions, input, timeout):
+                raise WorkerError('evaluation process terminated')
+
+        self.views = views
+        self.workers = views.workers
+        views.workers = FailingPool()
+        self.request = RequestFactory().post('/', {'query': '1'})
+        self.request.session = {}
+
+    def tearDown(self):
+        self.views.workers = self.workers
+
+    def testWorkerError(self):
+        results, timed_out = self.views.evaluate_query(self.request, '1')
+        self.assertFalse(timed_out)
+        text = results[0]['out'][0]['text']
+        self.assertTrue(text.startswith(
+            'Exception raised: evaluation process terminated\n\n'
+            'in evaluation process'), text)
+
+
+if __name__ == "__main__":
+    unittest.main()